@@ -1,13 +1,22 @@
 from django.apps import AppConfig
 import json
+import os
 
-CSV_FILE_PATH = "./transit/data/eu_rail_network.csv"
+# absolute, so the same network is found whatever the working directory is
+CSV_FILE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "transit", "data", "eu_rail_network.csv"
+)
 
 class BackendDjangoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'backend_django'
     
     def ready(self):
+        from django.conf import settings
         from transit.services.station_network_manager import StationNetworkManager
-        station_network_manager = StationNetworkManager(CSV_FILE_PATH)
+        station_network_manager = StationNetworkManager(CSV_FILE_PATH, routing_engine=settings.ROUTING_ENGINE)
+        if settings.SEARCH_INSTRUMENTATION:
+            station_network_manager.enable_instrumentation()
+        if settings.PRELOAD_NETWORK:
+            station_network_manager.preload()
         
@@ -0,0 +1,57 @@
+"""
+Throughput of StationNetworkManager.batch_search with 1, 2, 4 and 8 worker processes.
+
+Every run answers the same random (from, to, day) queries with an empty search cache.
+Run from the backend folder:
+    python benchmarks/batch_search_throughput.py [--queries 20000] [--search find_trips]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+django.setup()
+
+from transit.constants import City, DayOfWeek
+from transit.services.batch_search import BATCH_SEARCHES
+from transit.services.station_network_manager import StationNetworkManager
+
+FILE_PATH = "./transit/data/eu_rail_network.csv"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=20_000)
+    parser.add_argument("--search", choices=BATCH_SEARCHES, default="find_trips")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    manager = StationNetworkManager(FILE_PATH)
+    rng = random.Random(342)
+    cities = [city for city in City if manager.getStation(city)]
+    queries = []
+    while len(queries) < args.queries:
+        start_city, end_city = rng.sample(cities, 2)
+        queries.append((start_city, end_city, rng.choice(list(DayOfWeek))))
+
+    print(f"{len(queries)} queries, {args.search}, {os.cpu_count()} CPU(s)")
+    print(f"  {'workers':>8}{'seconds':>10}{'queries/s':>12}{'speedup':>10}")
+    baseline = None
+    for workers in args.workers:
+        manager.clear_search_cache()
+        start = time.perf_counter()
+        manager.batch_search(queries, workers=workers, search=args.search)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"  {workers:>8}{elapsed:>10.2f}{len(queries) / elapsed:>12.0f}{baseline / elapsed:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Latency of the city index (transit/services/city_index.py) used by cities/?q=.
+
+Queries are random prefixes of city labels typed without accents and in random case,
+half of them with one character replaced, which sends them to the fuzzy matcher.
+Run from the backend folder:
+    python benchmarks/city_lookup_latency.py [--queries 20000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transit.constants import City, get_city_from_label, normalize_city_label
+
+start = time.perf_counter()
+from transit.services.city_index import CITY_INDEX
+BUILD_SECONDS = time.perf_counter() - start
+
+
+def make_queries(count: int, rng: random.Random) -> list[str]:
+    labels = [normalize_city_label(city.value) for city in City]
+    queries = []
+    for _ in range(count):
+        label = rng.choice(labels)
+        query = label[:rng.randint(1, len(label))]
+        if len(query) > 3 and rng.random() < 0.5:
+            position = rng.randrange(len(query))
+            query = query[:position] + rng.choice("abcdefghijklmnopqrstuvwxyz") + query[position + 1:]
+        queries.append("".join(c.upper() if rng.random() < 0.3 else c for c in query))
+    return queries
+
+
+def measure(function, queries: list[str]) -> list[float]:
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        function(query)
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=20_000)
+    args = parser.parse_args()
+
+    queries = make_queries(args.queries, random.Random(342))
+    print(f"index built in {BUILD_SECONDS * 1000:.1f} ms, {len(queries)} queries")
+    print(f"  {'lookup':<22}{'p50 us':>9}{'p99 us':>9}{'max us':>9}")
+    for name, function in [
+        ("get_city_from_label", get_city_from_label),
+        ("CityIndex.complete", CITY_INDEX.complete),
+        ("CityIndex.fuzzy", CITY_INDEX.fuzzy),
+        ("CityIndex.suggest", CITY_INDEX.suggest),
+    ]:
+        timings = measure(function, queries)
+        p50 = timings[len(timings) // 2] * 1e6
+        p99 = timings[int(len(timings) * 0.99)] * 1e6
+        print(f"  {name:<22}{p50:>9.1f}{p99:>9.1f}{timings[-1] * 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Memory used by Connection objects on a synthetic 100k-row timetable (timetable_generator.py),
+compared with the previous representation (one __dict__ per connection holding
+two aware datetimes, a timedelta and a set of DayOfWeek members).
+
+Run from the backend folder:
+    python benchmarks/connection_memory.py [--rows 100000]
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+django.setup()
+
+from transit.models.Connection import Connection
+from transit.services.route_loader import connection_from_row
+from transit.services.timetable_generator import generate_timetable
+
+
+class LegacyConnection:
+    """Same attributes, stored the way Connection stored them before it used __slots__."""
+
+    def __init__(self, connection: Connection):
+        self.route_id = connection.route_id
+        self.departure_city = connection.departure_city
+        self.arrival_city = connection.arrival_city
+        self.departure_time = connection.departure_time
+        self.arrival_time = connection.arrival_time
+        self.day_offset = connection.day_offset
+        self.duration = self.arrival_time - self.departure_time
+        self.train_type = connection.train_type
+        self.first_class_price = connection.first_class_price
+        self.second_class_price = connection.second_class_price
+        self.days_of_operation = set(connection.days_of_operation)
+
+
+def measure(build):
+    # memory still allocated once `build` returned, i.e. held by the objects it built
+    gc.collect()
+    tracemalloc.start()
+    objects = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return objects, current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rows = list(generate_timetable(routes=args.rows))
+
+    compact, compact_bytes = measure(lambda: [connection_from_row(row) for row in rows])
+    legacy, legacy_bytes = measure(lambda: [LegacyConnection(connection_from_row(row)) for row in rows])
+
+    print(f"{args.rows} synthetic connections")
+    print(f"  {'representation':<16}{'total MiB':>12}{'bytes/row':>12}")
+    for name, size in (("legacy (dict)", legacy_bytes), ("__slots__", compact_bytes)):
+        print(f"  {name:<16}{size / 2**20:>12.1f}{size / args.rows:>12.0f}")
+    print(f"  saving: {1 - compact_bytes / legacy_bytes:.0%}")
+
+    # keep both alive until both were measured
+    del compact, legacy
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Search work against the leg limit (max_legs), with and without the lower bounds of the
+ReachabilityIndex (transit/services/reachability.py).
+
+The timetable is a synthetic one `--scale` times the size of eu_rail_network.csv. The same
+random (from, to, day) queries are run, with an empty result cache, for every leg limit:
+  dfs            dfs_all_paths without pruning, every trip (`pushed` = partial paths expanded)
+  dfs_bounded    dfs_all_paths(prune=True): fewest legs left, latest useful departure per city
+  best_first     first `--first` trips of iter_best_first pruned with the legs table only
+  a_star         the same with every bound and the travel time left as heuristic, as iter_trips does
+for best_first and a_star `expanded` counts the partial paths taken out of the queue.
+A configuration that took more than `--budget` seconds for all queries is not run again at
+higher leg limits. Run from the backend folder:
+    python benchmarks/leg_limit_expansions.py [--scale 10] [--queries 40] [--legs 3 4 5 6]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from itertools import islice
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+django.setup()
+
+from transit.constants import DayOfWeek
+from transit.services.best_first_search import iter_best_first
+from transit.services.station_network_manager import StationNetworkManager
+from transit.services.timetable_generator import DEFAULT_ROUTES, write_timetable
+
+CONFIGURATIONS = ("dfs", "dfs_bounded", "best_first", "a_star")
+
+
+def run_dfs(manager: StationNetworkManager, query: tuple, max_legs: int, prune: bool) -> tuple[int, int]:
+    # (trips, partial paths pushed), from the search instrumentation
+    manager.search_stats.reset()
+    trips = manager.dfs_all_paths(*query, prune=prune, max_legs=max_legs)
+    return len(trips), manager.search_stats.snapshot()["engines"]["dfs"]["counters"]["pushed"]
+
+
+def run_best_first(manager: StationNetworkManager, query: tuple, max_legs: int, first: int, bounded: bool):
+    # (trips, partial paths expanded) for the first `first` trips
+    network = manager.get_network()
+    reachability = network.reachability
+    end_city, day_of_week = query[1], query[2]
+    expanded = 0
+
+    def get_station(city):
+        nonlocal expanded
+        expanded += 1
+        return network.get_station(city)
+
+    bounds = {"min_legs": reachability.legs_table(end_city, day_of_week)}
+    if bounded:
+        bounds["latest_departures"] = reachability.latest_departure_table(end_city, day_of_week)
+        bounds["min_durations"] = reachability.duration_table(end_city, day_of_week)
+    trips = list(islice(iter_best_first(get_station, *query, max_legs=max_legs, **bounds), first))
+    return len(trips), expanded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=10, help="Timetable size, in multiples of eu_rail_network.csv")
+    parser.add_argument("--queries", type=int, default=40)
+    parser.add_argument("--legs", type=int, nargs="+", default=[3, 4, 5, 6])
+    parser.add_argument("--first", type=int, default=10, help="Trips taken from the best-first searches")
+    parser.add_argument("--budget", type=float, default=60, help="Seconds after which a configuration is dropped")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        csv_path = os.path.join(folder, "timetable.csv")
+        write_timetable(csv_path, routes=DEFAULT_ROUTES * args.scale)
+        # django.setup() loaded eu_rail_network.csv into the singleton, start over with csv_path
+        StationNetworkManager._instance = None
+        manager = StationNetworkManager(csv_path)
+    manager.enable_instrumentation()
+
+    rng = random.Random(342)
+    cities = list(manager.get_network().stations)
+    queries = [(*rng.sample(cities, 2), rng.choice(list(DayOfWeek))) for _ in range(args.queries)]
+    # builds the reachability tables of every destination before anything is timed
+    for start_city, end_city, day_of_week in queries:
+        manager.dfs_all_paths(start_city, end_city, day_of_week, prune=True, max_legs=1)
+
+    runs = {
+        "dfs": lambda query, legs: run_dfs(manager, query, legs, prune=False),
+        "dfs_bounded": lambda query, legs: run_dfs(manager, query, legs, prune=True),
+        "best_first": lambda query, legs: run_best_first(manager, query, legs, args.first, bounded=False),
+        "a_star": lambda query, legs: run_best_first(manager, query, legs, args.first, bounded=True),
+    }
+
+    print(f"{DEFAULT_ROUTES * args.scale} connections, {len(queries)} queries, totals over all queries")
+    print(f"  {'max_legs':>8}  {'search':<13}{'trips':>10}{'expanded':>12}{'seconds':>10}{'p99 ms':>10}")
+    dropped = set()
+    for legs in args.legs:
+        for name in CONFIGURATIONS:
+            if name in dropped:
+                print(f"  {legs:>8}  {name:<13}{'over budget':>42}")
+                continue
+            trips = expanded = 0
+            timings = []
+            for query in queries:
+                manager.clear_search_cache()
+                started = time.perf_counter()
+                found, work = runs[name](query, legs)
+                timings.append(time.perf_counter() - started)
+                trips += found
+                expanded += work
+            timings.sort()
+            p99 = timings[min(int(len(timings) * 0.99), len(timings) - 1)] * 1000
+            print(f"  {legs:>8}  {name:<13}{trips:>10}{expanded:>12}{sum(timings):>10.2f}{p99:>10.1f}")
+            if sum(timings) > args.budget:
+                dropped.add(name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Time of a "where can I go from here" query: one search per destination city, against
+StationNetworkManager.destinations (one sweep for all of them, transit/services/destination_search.py).
+
+The timetable is a synthetic one `--scale` times the size of eu_rail_network.csv. For each
+random (from, day) query the per-destination searches are run, with an empty result cache,
+for every other city, and their earliest arrival, shortest travel time and lowest second
+class price must be those of the destination table.
+  dfs   dfs_all_paths(prune=True) per destination
+  csa   find_trips with the connection scan engine per destination
+Run from the backend folder:
+    python benchmarks/one_to_all_search.py [--scale 10] [--queries 20] [--max-legs 3]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+django.setup()
+
+from transit.constants import DayOfWeek
+from transit.services.station_network_manager import StationNetworkManager
+from transit.services.timetable_generator import DEFAULT_ROUTES, write_timetable
+
+
+def best_values(trips) -> tuple:
+    # (earliest arrival, shortest travel minutes, lowest second class price) of trips
+    return (
+        min(trip.connections[-1].arrival_minutes for trip in trips),
+        int(min(trip.total_travel_duration for trip in trips).total_seconds() // 60),
+        round(min(trip.total_second_class_price for trip in trips), 2),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=10, help="Timetable size, in multiples of eu_rail_network.csv")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--max-legs", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        csv_path = os.path.join(folder, "timetable.csv")
+        write_timetable(csv_path, routes=DEFAULT_ROUTES * args.scale)
+        # django.setup() loaded eu_rail_network.csv into the singleton, start over with csv_path
+        StationNetworkManager._instance = None
+        manager = StationNetworkManager(csv_path)
+
+    rng = random.Random(342)
+    cities = list(manager.get_network().stations)
+    queries = [(rng.choice(cities), rng.choice(list(DayOfWeek))) for _ in range(args.queries)]
+    # builds the reachability tables the pruned searches use before anything is timed
+    reachability = manager.get_reachability()
+    for day_of_week in DayOfWeek:
+        for city in cities:
+            reachability.legs_table(city, day_of_week)
+            reachability.latest_departure_table(city, day_of_week)
+
+    def per_destination(engine):
+        def search(start_city, day_of_week):
+            if engine == "dfs":
+                run = lambda city: manager.dfs_all_paths(start_city, city, day_of_week, prune=True, max_legs=args.max_legs)
+            else:
+                run = lambda city: manager.find_trips(start_city, city, day_of_week, max_legs=args.max_legs)
+            return {city: trips for city in cities if city != start_city and (trips := run(city))}
+        return search
+
+    manager.set_routing_engine("csa")
+    print(f"{DEFAULT_ROUTES * args.scale} connections, {len(cities)} cities, {len(queries)} queries, max_legs {args.max_legs}")
+    print(f"  {'search':<26}{'seconds':>10}{'ms/query':>10}{'destinations':>14}")
+    one_to_all_seconds = 0.0
+    tables = []
+    for start_city, day_of_week in queries:
+        manager.clear_search_cache()
+        started = time.perf_counter()
+        tables.append(manager.destinations(start_city, day_of_week, max_legs=args.max_legs))
+        one_to_all_seconds += time.perf_counter() - started
+    reached = sum(len(table) for table in tables)
+
+    for engine in ("dfs", "csa"):
+        search = per_destination(engine)
+        seconds = 0.0
+        for (start_city, day_of_week), table in zip(queries, tables):
+            manager.clear_search_cache()
+            started = time.perf_counter()
+            found = search(start_city, day_of_week)
+            seconds += time.perf_counter() - started
+            expected = {city: best_values(trips) for city, trips in found.items()}
+            got = {
+                d.city: (d.earliest_arrival, d.fastest_minutes, round(d.cheapest_price, 2)) for d in table
+            }
+            if got != expected:
+                raise AssertionError(f"{engine}: different destinations from {start_city} on {day_of_week.name}")
+        label = f"{engine} per destination"
+        print(f"  {label:<26}{seconds:>10.3f}{seconds / len(queries) * 1000:>10.1f}{reached:>14}")
+    print(f"  {'destinations (one sweep)':<26}{one_to_all_seconds:>10.3f}"
+          f"{one_to_all_seconds / len(queries) * 1000:>10.1f}{reached:>14}")
+
+
+if __name__ == "__main__":
+    main()
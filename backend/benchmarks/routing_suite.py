@@ -0,0 +1,263 @@
+"""
+Load time, memory and search latency on synthetic timetables of 1x, 10x and 100x the
+size of eu_rail_network.csv (transit/services/timetable_generator.py).
+
+For every scale a timetable is generated into a temporary folder and loaded by a fresh
+process, which measures:
+  - load time of StationNetworkManager (CSV parsing and building the indexes)
+  - memory held by the loaded network (tracemalloc) and the peak RSS of the process
+  - search latency percentiles of each engine, with an empty result cache, for
+      random:  random (from, to, day) queries between served cities
+      worst:   pairs of the busiest cities, on the busiest day
+    a query still running after `--query-timeout` seconds is stopped and counted as a
+    timeout (with the timeout as its latency); an engine is skipped for the rest of the
+    pairs after `--max-timeouts` of them
+The results are written as JSON (with the current git commit), and `--compare` prints
+the change against a previous results file. Run from the backend folder:
+    python benchmarks/routing_suite.py [--scales 1 10 100] [--queries 200] [--output results.json]
+    python benchmarks/routing_suite.py --compare benchmarks/results/routing-<commit>.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import resource
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+django.setup()
+
+from transit.constants import DayOfWeek
+from transit.services.rail_network import RailNetwork
+from transit.services.route_loader import read_csv
+from transit.services.station_network_manager import StationNetworkManager
+from transit.services.timetable_generator import DEFAULT_ROUTES, write_timetable
+
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+ENGINES = ("dfs", "csa", "pareto", "best_first")
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def percentiles(timings: list[float]) -> dict:
+    timings = sorted(timings)
+    at = lambda fraction: timings[min(int(len(timings) * fraction), len(timings) - 1)] * 1000
+    return {
+        "p50_ms": at(0.5),
+        "p90_ms": at(0.9),
+        "p99_ms": at(0.99),
+        "max_ms": timings[-1] * 1000,
+        "mean_ms": sum(timings) / len(timings) * 1000,
+    }
+
+
+class QueryTimeout(Exception):
+    pass
+
+
+def stop_query(signum, frame):
+    raise QueryTimeout()
+
+
+def run_scale(
+    csv_path: str, queries: int, worst: int, engines: list[str], seed: int, query_timeout: float, max_timeouts: int
+) -> dict:
+    # runs inside the child process, one per scale, so memory and caches start empty
+    # django.setup() loaded eu_rail_network.csv into the singleton, start over with csv_path
+    StationNetworkManager._instance = None
+    start = time.perf_counter()
+    manager = StationNetworkManager(csv_path)
+    load_seconds = time.perf_counter() - start
+    network = manager.get_network()
+
+    # a second copy, only to measure what the loaded network holds
+    gc.collect()
+    tracemalloc.start()
+    copy = RailNetwork(read_csv(csv_path), 0)
+    copy.warm()
+    network_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del copy
+
+    rng = random.Random(seed)
+    cities = sorted(network.stations, key=lambda city: city.value)
+    random_pairs = [(*rng.sample(cities, 2), rng.choice(list(DayOfWeek))) for _ in range(queries)]
+
+    departures = Counter(connection.departure_city for connection in network.connections)
+    busiest_day = max(DayOfWeek, key=lambda day: sum(day in c.days_of_operation for c in network.connections))
+    busiest = [city for city, _ in departures.most_common()]
+    worst_pairs = [(a, b, busiest_day) for a in busiest for b in busiest if a != b][:worst]
+
+    searches = {
+        "dfs": lambda a, b, day: manager.find_trips(a, b, day),
+        "csa": lambda a, b, day: manager.find_trips(a, b, day),
+        "pareto": manager.pareto_trips,
+        "best_first": lambda a, b, day: list(manager.iter_trips(a, b, day)),
+    }
+    signal.signal(signal.SIGALRM, stop_query)
+    results = {}
+    for pair_set, pairs in (("random", random_pairs), ("worst", worst_pairs)):
+        results[pair_set] = {}
+        for engine in engines:
+            if engine in ("dfs", "csa"):
+                manager.set_routing_engine(engine)
+            timings, trips, timeouts = [], 0, 0
+            for a, b, day in pairs:
+                manager.clear_search_cache()
+                started = time.perf_counter()
+                signal.setitimer(signal.ITIMER_REAL, query_timeout)
+                try:
+                    trips += len(searches[engine](a, b, day))
+                    timings.append(time.perf_counter() - started)
+                except QueryTimeout:
+                    timings.append(query_timeout)
+                    timeouts += 1
+                finally:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+                if timeouts >= max_timeouts:
+                    break
+            completed = len(timings) - timeouts
+            results[pair_set][engine] = {
+                **percentiles(timings),
+                "queries": len(timings),
+                "timeouts": timeouts,
+                "mean_trips": trips / completed if completed else None,
+            }
+
+    return {
+        "connections": len(network.connections),
+        "cities": len(network.stations),
+        "load_seconds": load_seconds,
+        "network_mib": network_bytes / 2**20,
+        "max_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "searches": results,
+    }
+
+
+def print_results(results: dict):
+    for scale in results["scales"]:
+        print(
+            f"{scale['connections']} connections, {scale['cities']} cities: loaded in {scale['load_seconds']:.2f} s, "
+            f"network {scale['network_mib']:.1f} MiB, peak RSS {scale['max_rss_mib']:.0f} MiB"
+        )
+        print(
+            f"  {'pairs':<8}{'engine':<12}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+            f"{'trips':>9}{'timeouts':>10}"
+        )
+        for pair_set, engines in scale["searches"].items():
+            for engine, stats in engines.items():
+                trips = "-" if stats["mean_trips"] is None else f"{stats['mean_trips']:.1f}"
+                print(
+                    f"  {pair_set:<8}{engine:<12}{stats['p50_ms']:>10.2f}{stats['p90_ms']:>10.2f}"
+                    f"{stats['p99_ms']:>10.2f}{stats['max_ms']:>10.2f}{trips:>9}"
+                    f"{stats['timeouts']:>6}/{stats['queries']:<3}"
+                )
+
+
+def print_comparison(previous: dict, current: dict):
+    # ratios current / previous, < 1 is faster (or smaller)
+    print(f"change from {previous['commit']} to {current['commit']} (current / previous)")
+    before = {scale["scale"]: scale for scale in previous["scales"]}
+    for scale in current["scales"]:
+        old = before.get(scale["scale"])
+        if old is None:
+            continue
+        print(
+            f"  {scale['scale']}x: load {scale['load_seconds'] / old['load_seconds']:.2f}, "
+            f"network memory {scale['network_mib'] / old['network_mib']:.2f}"
+        )
+        for pair_set, engines in scale["searches"].items():
+            for engine, stats in engines.items():
+                old_stats = old["searches"].get(pair_set, {}).get(engine)
+                if old_stats:
+                    print(
+                        f"    {pair_set:<8}{engine:<12}p50 {stats['p50_ms'] / old_stats['p50_ms']:.2f}"
+                        f"  p99 {stats['p99_ms'] / old_stats['p99_ms']:.2f}"
+                    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100],
+                        help="Timetable sizes, in multiples of eu_rail_network.csv")
+    parser.add_argument("--queries", type=int, default=200, help="Random queries per scale")
+    parser.add_argument("--worst", type=int, default=20, help="Busiest city pairs per scale")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=list(ENGINES))
+    parser.add_argument("--query-timeout", type=float, default=10, help="Seconds before a query is stopped")
+    parser.add_argument("--max-timeouts", type=int, default=3, help="Timeouts before an engine is skipped")
+    parser.add_argument("--seed", type=int, default=342)
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/routing-<commit>.json)")
+    parser.add_argument("--compare", help="Previous results file to compare with")
+    parser.add_argument("--child", help=argparse.SUPPRESS)  # CSV path, set for the per-scale processes
+    args = parser.parse_args()
+
+    if args.child:
+        # keep the app's own prints (network loading) off stdout, the parent reads JSON from it
+        stdout = sys.stdout
+        sys.stdout = sys.stderr
+        result = run_scale(
+            args.child, args.queries, args.worst, args.engines, args.seed, args.query_timeout, args.max_timeouts
+        )
+        stdout.write(json.dumps(result) + "\n")
+        return
+
+    results = {
+        "commit": git_commit(),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "scales": [],
+    }
+    with tempfile.TemporaryDirectory() as folder:
+        for scale in args.scales:
+            csv_path = os.path.join(folder, f"timetable-{scale}x.csv")
+            write_timetable(csv_path, routes=DEFAULT_ROUTES * scale, seed=args.seed)
+            child = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", csv_path, "--queries", str(args.queries),
+                 "--worst", str(args.worst), "--seed", str(args.seed), "--query-timeout", str(args.query_timeout),
+                 "--max-timeouts", str(args.max_timeouts), "--engines", *args.engines],
+                cwd=BACKEND_DIR,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                check=True,
+            )
+            results["scales"].append({"scale": scale, **json.loads(child.stdout.strip().splitlines()[-1])})
+
+    print_results(results)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"routing-{results['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+    print(f"results written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            print_comparison(json.load(file), results)
+
+
+if __name__ == "__main__":
+    main()
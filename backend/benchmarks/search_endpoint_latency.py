@@ -0,0 +1,135 @@
+"""
+Latency of the async search/ endpoint under concurrent load.
+
+Requests are sent straight to the ASGI application of asgi.py (no sockets), with
+`concurrency` requests in flight at a time, and the time to the first trip line and
+to the end of the NDJSON stream is measured for each. The search cache is cleared
+before each level, so every query is searched once and then served from the cache.
+Run from the backend folder:
+    python benchmarks/search_endpoint_latency.py [--requests 400] [--concurrency 1 8 32 64]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+
+from asgi import application  # sets up Django
+
+from transit.constants import City, DayOfWeek
+from transit.views import get_network_manager
+
+DATES = {  # one date per DayOfWeek, the week of 2025-01-05 (a Sunday)
+    day: f"2025-01-{5 + day.value:02d}" for day in DayOfWeek
+}
+
+
+def pick_queries(count: int, rng: random.Random) -> list[str]:
+    # query strings for (from, to, date) that have at least one trip
+    manager = get_network_manager()
+    cities = [city for city in City if manager.getStation(city)]
+    queries = []
+    while len(queries) < count:
+        start_city, end_city = rng.sample(cities, 2)
+        day_of_week = rng.choice(list(DayOfWeek))
+        if manager.find_trips(start_city, end_city, day_of_week):
+            queries.append(urlencode({"from": start_city.value, "to": end_city.value, "date": DATES[day_of_week]}))
+    return queries
+
+
+async def request(query_string: str) -> tuple[float, float]:
+    # one GET /api/search/, returns (seconds to the first body chunk, seconds to the end)
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/api/search/",
+        "raw_path": b"/api/search/",
+        "query_string": query_string.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"localhost")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("localhost", 80),
+    }
+    disconnected = asyncio.Event()
+    sent_request = False
+
+    async def receive():
+        nonlocal sent_request
+        if not sent_request:
+            sent_request = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    start = time.perf_counter()
+    first_chunk = None
+    status = None
+
+    async def send(message):
+        nonlocal first_chunk, status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and message.get("body") and first_chunk is None:
+            first_chunk = time.perf_counter() - start
+
+    await application(scope, receive, send)
+    disconnected.set()
+    if status != 200:
+        raise RuntimeError(f"search/?{query_string} answered {status}")
+    return first_chunk, time.perf_counter() - start
+
+
+async def run_level(queries: list[str], concurrency: int) -> list[tuple[float, float]]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(query_string):
+        async with semaphore:
+            return await request(query_string)
+
+    return await asyncio.gather(*(limited(query_string) for query_string in queries))
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--distinct", type=int, default=100, help="distinct queries among the requests")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    args = parser.parse_args()
+
+    rng = random.Random(342)
+    distinct = pick_queries(args.distinct, rng)
+    queries = [rng.choice(distinct) for _ in range(args.requests)]
+
+    print(f"{len(queries)} requests over {len(distinct)} distinct queries, {os.cpu_count()} CPU(s)")
+    print(f"  {'in flight':>10}{'req/s':>9}{'first p50':>11}{'first p95':>11}{'total p50':>11}{'total p95':>11}  (ms)")
+    for concurrency in args.concurrency:
+        get_network_manager().clear_search_cache()
+        start = time.perf_counter()
+        timings = asyncio.run(run_level(queries, concurrency))
+        elapsed = time.perf_counter() - start
+        first = [t[0] * 1000 for t in timings]
+        total = [t[1] * 1000 for t in timings]
+        print(
+            f"  {concurrency:>10}{len(queries) / elapsed:>9.0f}"
+            f"{statistics.median(first):>11.2f}{percentile(first, 0.95):>11.2f}"
+            f"{statistics.median(total):>11.2f}{percentile(total, 0.95):>11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
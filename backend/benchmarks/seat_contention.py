@@ -0,0 +1,113 @@
+"""
+Many threads booking seats on the same popular connection at once.
+
+Each thread keeps taking one seat (reserve_seats) or booking a one-traveller trip
+(BookingService.book_trip, --book) on route R00001 until the connection is sold out.
+The run checks that exactly `--seats` seats were sold, and counts the attempts that
+were rejected as sold out or failed because the database was locked.
+A throwaway SQLite database is created for the run, db.sqlite3 is not touched.
+Run from the backend folder:
+    python benchmarks/seat_contention.py [--threads 1 4 16 32] [--seats 400] [--book]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+django.setup()
+
+from django.db import OperationalError, connection
+from transit.models.Client import Client
+from transit.models.Connection import Connection
+from transit.models.SeatInventory import SeatInventory, SECOND_CLASS
+from transit.models.Ticket import TripOption
+from transit.services.booking_service import BookingService
+from transit.services.seat_inventory import SoldOutError, reserve_seats
+
+ROUTE_ID = "R00001"
+TRAVEL_DATE = date(2025, 6, 2)
+
+
+def run(threads: int, seats: int, book: bool) -> dict:
+    SeatInventory.objects.all().delete()
+    Client.objects.all().delete()  # and their trips, tickets and legs from the previous run
+    SeatInventory.objects.create(route_id=ROUTE_ID, travel_date=TRAVEL_DATE, seat_class=SECOND_CLASS, capacity=seats)
+    trip = TripOption([Connection(ROUTE_ID, "Paris", "Lyon", "08:00", "10:00", "Daily", "TGV", "100", "50")])
+    service = BookingService()
+
+    counts = {"sold": 0, "sold_out": 0, "locked": 0}
+    counts_lock = threading.Lock()
+    start_barrier = threading.Barrier(threads)
+
+    def worker(worker_id: int):
+        attempt = 0
+        start_barrier.wait()
+        try:
+            while True:
+                attempt += 1
+                try:
+                    if book:
+                        traveller = {"id": f"T{worker_id}-{attempt}", "first_name": "Load", "last_name": "Test", "age": 30}
+                        service.book_trip(trip, [traveller], 1, TRAVEL_DATE)
+                    else:
+                        reserve_seats([ROUTE_ID], TRAVEL_DATE, SECOND_CLASS, 1)
+                    outcome = "sold"
+                except SoldOutError:
+                    outcome = "sold_out"
+                except OperationalError:
+                    outcome = "locked"
+                with counts_lock:
+                    counts[outcome] += 1
+                if outcome == "sold_out":
+                    return
+        finally:
+            connection.close()  # each thread has its own database connection
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    counts["seconds"] = time.perf_counter() - started
+    counts["seats_sold"] = SeatInventory.objects.get(route_id=ROUTE_ID).seats_sold
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--seats", type=int, default=400)
+    parser.add_argument("--book", action="store_true", help="run the whole book_trip, not just the seat update")
+    args = parser.parse_args()
+
+    # a file (not in-memory) test database, so the threads really contend for the SQLite write lock
+    database_path = os.path.join(tempfile.mkdtemp(), "seat_contention.sqlite3")
+    connection.settings_dict["TEST"]["NAME"] = database_path
+    connection.creation.create_test_db(verbosity=0, serialize=False)
+
+    try:
+        print(f"{'book_trip' if args.book else 'reserve_seats'}, {args.seats} seats on one connection")
+        print(f"  {'threads':>8}{'seconds':>9}{'sold/s':>9}{'sold':>7}{'sold out':>10}{'locked':>8}  oversold")
+        for threads in args.threads:
+            result = run(threads, args.seats, args.book)
+            oversold = result["seats_sold"] != result["sold"] or result["seats_sold"] > args.seats
+            print(
+                f"  {threads:>8}{result['seconds']:>9.2f}{result['sold'] / result['seconds']:>9.0f}"
+                f"{result['sold']:>7}{result['sold_out']:>10}{result['locked']:>8}  {'YES' if oversold else 'no'}"
+            )
+    finally:
+        connection.creation.destroy_test_db(database_path, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Mixed trip-history / booking throughput with the "default" and "production" SQLite profiles
+(SQLITE_PROFILES in settings.py).
+
+Each profile runs in its own process (RAILCONNECT_DB_PROFILE is read when settings load)
+on a throwaway database file seeded with clients and trips. `--threads` threads then
+run for `--seconds`: each operation is a booking with probability `--write-ratio`,
+otherwise a trip history lookup, and ends like a request does (close_old_connections),
+so without CONN_MAX_AGE every operation opens a new connection.
+db.sqlite3 is not touched. Run from the backend folder:
+    python benchmarks/sqlite_profile_throughput.py [--threads 8] [--seconds 5] [--write-ratio 0.05 0.3]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILES = ("default", "production")
+
+
+def run_profile(threads: int, seconds: float, write_ratio: float, clients: int) -> dict:
+    # runs inside the child process, with RAILCONNECT_DB_PROFILE already set
+    import random
+    from datetime import date, timedelta
+    import django
+
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+    django.setup()
+
+    from django.db import OperationalError, close_old_connections, connection
+    from transit.models.Client import Client
+    from transit.models.Connection import Connection
+    from transit.models.Ticket import Ticket, TripOption
+    from transit.models.Trip import Trip
+    from transit.services.booking_service import BookingService
+
+    database_path = os.path.join(tempfile.mkdtemp(), "profile_throughput.sqlite3")
+    connection.settings_dict["TEST"]["NAME"] = database_path
+    connection.creation.create_test_db(verbosity=0, serialize=False)
+
+    # seed: every client has 10 trips with one ticket each, half of them in the past
+    today = date.today()
+    Client.objects.bulk_create(
+        [Client(client_id=f"C{i}", first_name="Seed", last_name="Client", age=30) for i in range(clients)]
+    )
+    trips = Trip.objects.bulk_create([
+        Trip(client_id=f"C{i}", source_city="Paris", destination_city="Lyon", date=today + timedelta(days=d - 5))
+        for i in range(clients) for d in range(10)
+    ])
+    Ticket.objects.bulk_create([
+        Ticket(trip=trip, client_id=trip.client_id, departure_city="Paris", arrival_city="Lyon",
+               departure_time="2000-01-01T08:00Z", arrival_time="2000-01-01T10:00Z", price=150,
+               route_ids="R0", day_of_week=1)
+        for trip in trips
+    ])
+    close_old_connections()
+
+    service = BookingService()
+    counts = {"reads": 0, "writes": 0, "locked": 0}
+    read_latencies = []
+    counts_lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(worker_id: int):
+        rng = random.Random(worker_id)
+        bookings = 0
+        try:
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                write = rng.random() < write_ratio
+                try:
+                    if write:
+                        bookings += 1
+                        route_id = f"R{rng.randrange(1, 200)}"
+                        trip = TripOption([Connection(route_id, "Paris", "Lyon", "08:00", "10:00", "Daily", "TGV", "100", "50")])
+                        traveller = {"id": f"W{worker_id}-{bookings}", "first_name": "Load", "last_name": "Test", "age": 30}
+                        service.book_trip(trip, [traveller], 1, today + timedelta(days=rng.randrange(30)))
+                    else:
+                        history = service.get_client_trip_history(f"C{rng.randrange(clients)}", "Client")
+                        for trip in list(history['current']) + list(history['past']):
+                            list(trip.tickets.all())
+                    outcome = "writes" if write else "reads"
+                except OperationalError:
+                    outcome = "locked"
+                finally:
+                    close_old_connections()  # what the end of a request does
+                elapsed = time.perf_counter() - started
+                with counts_lock:
+                    counts[outcome] += 1
+                    if outcome == "reads":
+                        read_latencies.append(elapsed)
+        finally:
+            connection.close()
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    journal_mode = connection.cursor().execute("PRAGMA journal_mode").fetchone()[0]
+    connection.creation.destroy_test_db(database_path, verbosity=0)
+
+    read_latencies.sort()
+    return {
+        "journal_mode": journal_mode,
+        "reads_per_second": counts["reads"] / elapsed,
+        "writes_per_second": counts["writes"] / elapsed,
+        "locked": counts["locked"],
+        "read_p95_ms": read_latencies[int(len(read_latencies) * 0.95)] * 1000 if read_latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--write-ratio", type=float, nargs="+", default=[0.05, 0.3])
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # keep the app's own prints (network loading) off stdout, the parent reads JSON from it
+        stdout = sys.stdout
+        sys.stdout = sys.stderr
+        result = run_profile(args.threads, args.seconds, args.write_ratio[0], args.clients)
+        stdout.write(json.dumps(result) + "\n")
+        return
+
+    print(f"{args.threads} threads, {args.seconds:g} s per run, {args.clients} clients with 10 trips each")
+    print(f"  {'writes':>7}  {'profile':<11}{'journal':>8}{'reads/s':>9}{'writes/s':>10}{'read p95 ms':>13}{'locked':>8}")
+    for write_ratio in args.write_ratio:
+        for profile in PROFILES:
+            child = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", "--threads", str(args.threads),
+                 "--seconds", str(args.seconds), "--write-ratio", str(write_ratio), "--clients", str(args.clients)],
+                cwd=BACKEND_DIR,
+                env={**os.environ, "RAILCONNECT_DB_PROFILE": profile},
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                check=True,
+            )
+            result = json.loads(child.stdout.strip().splitlines()[-1])
+            print(
+                f"  {write_ratio:>7.0%}  {profile:<11}{result['journal_mode']:>8}{result['reads_per_second']:>9.0f}"
+                f"{result['writes_per_second']:>10.0f}{result['read_p95_ms']:>13.2f}{result['locked']:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Search time of a narrow time window: searching the whole day and filtering the trips
+afterwards, against the same search run with a TimeWindow (transit/services/time_window.py).
+
+The timetable is a synthetic one `--scale` times the size of eu_rail_network.csv. Each
+random (from, to, day) query is run, with an empty result cache, once for the whole day
+and once per window below; both must return the same trips (except for pareto: the
+filtered front of the whole day misses trips only dominated outside the window).
+  morning   depart_after 07:00, depart_before 09:00
+  evening   depart_after 18:00
+  arrive_by arrive_by 14:00
+Run from the backend folder:
+    python benchmarks/time_window_search.py [--scale 10] [--queries 300]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+django.setup()
+
+from transit.constants import DayOfWeek
+from transit.services.station_network_manager import StationNetworkManager
+from transit.services.time_window import ANY_TIME, TimeWindow
+from transit.services.timetable_generator import DEFAULT_ROUTES, write_timetable
+
+WINDOWS = {
+    "morning": TimeWindow(depart_after=7 * 60, depart_before=9 * 60),
+    "evening": TimeWindow(depart_after=18 * 60),
+    "arrive_by": TimeWindow(arrive_by=14 * 60),
+}
+
+
+def searches(manager: StationNetworkManager) -> dict:
+    # engine name -> search(start_city, end_city, day_of_week, window)
+    def find_trips(engine):
+        def search(start_city, end_city, day_of_week, window):
+            manager.set_routing_engine(engine)
+            return manager.find_trips(start_city, end_city, day_of_week, window)
+        return search
+
+    return {
+        "dfs": find_trips("dfs"),
+        "csa": find_trips("csa"),
+        "best_first": lambda *query, window: list(manager.iter_trips(*query, window=window)),
+        "pareto": lambda *query, window: manager.pareto_trips(*query, window=window),
+    }
+
+
+def route_ids(trips) -> list:
+    return sorted(tuple(connection.route_id for connection in trip.connections) for trip in trips)
+
+
+def timed(search, query, window):
+    started = time.perf_counter()
+    trips = search(*query, window=window)
+    return time.perf_counter() - started, trips
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=10, help="Timetable size, in multiples of eu_rail_network.csv")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--engines", nargs="+", default=["dfs", "csa", "best_first", "pareto"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        csv_path = os.path.join(folder, "timetable.csv")
+        write_timetable(csv_path, routes=DEFAULT_ROUTES * args.scale)
+        # django.setup() loaded eu_rail_network.csv into the singleton, start over with csv_path
+        StationNetworkManager._instance = None
+        manager = StationNetworkManager(csv_path)
+
+    rng = random.Random(342)
+    cities = list(manager.get_network().stations)
+    queries = [(*rng.sample(cities, 2), rng.choice(list(DayOfWeek))) for _ in range(args.queries)]
+
+    print(f"{DEFAULT_ROUTES * args.scale} connections, {len(queries)} queries, total seconds")
+    print(f"  {'engine':<12}{'window':<11}{'full day + filter':>19}{'window':>10}{'speedup':>10}{'trips':>8}")
+    engine_searches = searches(manager)
+    for engine in args.engines:
+        search = engine_searches[engine]
+        for name, window in WINDOWS.items():
+            filtered_seconds = window_seconds = 0.0
+            trips = 0
+            for query in queries:
+                manager.clear_search_cache()
+                seconds, full_day = timed(search, query, ANY_TIME)
+                started = time.perf_counter()
+                expected = [trip for trip in full_day if window.contains(trip)]
+                filtered_seconds += seconds + time.perf_counter() - started
+
+                manager.clear_search_cache()
+                seconds, found = timed(search, query, window)
+                window_seconds += seconds
+                trips += len(found)
+                if engine != "pareto" and route_ids(found) != route_ids(expected):
+                    raise AssertionError(f"{engine} {name}: different trips for {query}")
+            print(
+                f"  {engine:<12}{name:<11}{filtered_seconds:>19.3f}{window_seconds:>10.3f}"
+                f"{filtered_seconds / window_seconds:>9.1f}x{trips:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Memory of N worker processes serving searches from one rail network, per loading mode:
+  independent     each worker is spawned and parses the CSV itself
+  snapshot        each worker is spawned and builds the network from the compiled
+                  snapshot (python manage.py compile_network), memory mapped
+  preload         the parent loads the network and forks the workers
+  preload_freeze  same, after StationNetworkManager.preload() (RAILCONNECT_PRELOAD_NETWORK=1)
+
+The timetable is a synthetic one `--scale` times the size of eu_rail_network.csv.
+Every worker reports its RSS, PSS (its share of the pages shared with the others) and
+USS (pages only it uses) once all workers are up ("before") and again after running
+`--queries` searches ("after"); pages inherited from the parent and written by the
+worker move from shared to private. Linux only (reads /proc/self/smaps_rollup).
+Run from the backend folder:
+    python benchmarks/worker_memory.py [--workers 4] [--scale 10] [--queries 200]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+django.setup()
+
+from transit.constants import DayOfWeek
+from transit.services.network_snapshot import compile_snapshot
+from transit.services.station_network_manager import StationNetworkManager
+from transit.services.timetable_generator import DEFAULT_ROUTES, write_timetable
+
+MODES = ("independent", "snapshot", "preload", "preload_freeze")
+FORKED_MODES = ("preload", "preload_freeze")
+
+
+def memory_mib() -> dict:
+    fields = {}
+    with open("/proc/self/smaps_rollup") as file:
+        for line in file:
+            name, _, value = line.partition(":")
+            if value.strip().endswith("kB"):
+                fields[name] = int(value.split()[0])
+    return {
+        "rss": fields["Rss"] / 1024,
+        "pss": fields["Pss"] / 1024,
+        "uss": (fields["Private_Clean"] + fields["Private_Dirty"]) / 1024,
+    }
+
+
+def load_network(csv_path: str) -> StationNetworkManager:
+    # django.setup() loaded eu_rail_network.csv into the singleton, start over with csv_path
+    StationNetworkManager._instance = None
+    return StationNetworkManager(csv_path)
+
+
+def worker(mode: str, csv_path: str, queries: int, seed: int, barrier, results):
+    # forked workers inherit the parent's singleton, spawned ones load their own
+    sys.stdout = open(os.devnull, "w")
+    manager = StationNetworkManager(csv_path) if mode in FORKED_MODES else load_network(csv_path)
+
+    barrier.wait()  # every worker is up, so PSS splits the shared pages between all of them
+    before = memory_mib()
+    barrier.wait()
+
+    rng = random.Random(seed + os.getpid())
+    cities = list(manager.get_network().stations)
+    for _ in range(queries):
+        start_city, end_city = rng.sample(cities, 2)
+        manager.clear_search_cache()
+        manager.find_trips(start_city, end_city, rng.choice(list(DayOfWeek)))
+
+    barrier.wait()
+    after = memory_mib()
+    results.put({"before": before, "after": after})
+    barrier.wait()  # keep every worker alive until all of them measured
+
+
+def run(mode: str, csv_path: str, workers: int, queries: int, seed: int) -> list[dict]:
+    if mode in FORKED_MODES:
+        context = multiprocessing.get_context("fork")
+        manager = load_network(csv_path)
+        if mode == "preload_freeze":
+            manager.preload()
+    else:
+        context = multiprocessing.get_context("spawn")
+
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(mode, csv_path, queries, seed, barrier, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    measurements = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return measurements
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--scale", type=int, default=10, help="Timetable size, in multiples of eu_rail_network.csv")
+    parser.add_argument("--queries", type=int, default=200, help="Searches run by each worker")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--seed", type=int, default=342)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    try:
+        # one CSV without a snapshot next to it, one with
+        csv_path = os.path.join(folder, "timetable.csv")
+        write_timetable(csv_path, routes=DEFAULT_ROUTES * args.scale, seed=args.seed)
+        snapshot_folder = os.path.join(folder, "compiled")
+        os.makedirs(snapshot_folder)
+        compiled_csv_path = shutil.copy(csv_path, snapshot_folder)
+        compile_snapshot(compiled_csv_path)
+
+        print(f"{args.workers} workers, {DEFAULT_ROUTES * args.scale} connections, {args.queries} searches per worker")
+        print(f"  {'mode':<16}{'':>8}{'RSS MiB':>10}{'PSS MiB':>10}{'USS MiB':>10}{'total PSS':>11}")
+        for mode in args.modes:
+            measurements = run(
+                mode, compiled_csv_path if mode == "snapshot" else csv_path, args.workers, args.queries, args.seed
+            )
+            for moment in ("before", "after"):
+                values = [measurement[moment] for measurement in measurements]
+                mean = {key: sum(value[key] for value in values) / len(values) for key in ("rss", "pss", "uss")}
+                total_pss = sum(value["pss"] for value in values)
+                print(
+                    f"  {mode if moment == 'before' else '':<16}{moment:>8}{mean['rss']:>10.1f}"
+                    f"{mean['pss']:>10.1f}{mean['uss']:>10.1f}{total_pss:>11.1f}"
+                )
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,16 +8,19 @@ django.setup()
 # --------------------
 
 from datetime import datetime
+from backend_django.apps import CSV_FILE_PATH
 from transit.constants import City,DayOfWeek,get_city_from_label
 from transit.services.station_network_manager import StationNetworkManager
 from transit.models.Ticket import TripOption, Ticket
 from transit.models.Trip import Trip
 from transit.services.booking_service import BookingService
+from transit.services.seat_inventory import SEAT_AVAILABILITY
 from typing import List, Dict
 
 # --- Global In-Memory Storage ---
 try:
-    FILE_PATH = "backend/transit/data/eu_rail_network.csv"
+    # the network loaded by django.setup() (see backend_django/apps.py), not a second copy
+    FILE_PATH = CSV_FILE_PATH
     NETWORK_MANAGER = StationNetworkManager(FILE_PATH)
     BOOKING_SERVICE = BookingService()
 except FileNotFoundError:
@@ -97,23 +100,24 @@ def run_book_trip():
     to_city = get_city_input("Enter arrival city (e.g., Berlin): ")
     day, date_obj = get_day_of_week_input()
 
-    # 1. SEARCH
-    found_tickets = NETWORK_MANAGER.dfs_all_paths(from_city, to_city, day)
+    # 1. SEARCH & 2. IDENTIFY
+    # Trips are listed best first (by duration, then stops); with the best_first routing engine
+    # (settings.ROUTING_ENGINE) each one is shown as soon as it is found
+    ticket_map: Dict[int, TripOption] = {}
+    # Trips with a sold out connection on that date are left out
+    trips = SEAT_AVAILABILITY.available_trips(NETWORK_MANAGER.iter_trips(from_city, to_city, day), date_obj)
+    for i, ticket in enumerate(trips, start=1):
+        if i == 1:
+            print("\n--- 2. Possible Trips (fastest first) ---")
+        ticket_map[i] = ticket
+        print(f"\nOPTION: [{i}]")
+        print(ticket) # Use the ticket's __str__ method
     
-    if not found_tickets:
+    if not ticket_map:
         print("\nSorry, no trips were found matching your criteria.")
         return
 
-    # 2. IDENTIFY
-    print(f"\n--- 2. Found {len(found_tickets)} Possible Trips ---")
-    # Sort by duration, then stops
-    found_tickets.sort(key=lambda t: (t.total_travel_duration, t.num_connections))
-    
-    ticket_map: Dict[str, TripOption] = {}
-    for i, ticket in zip(range(1,len(found_tickets)+1), found_tickets):
-        ticket_map[i] = ticket
-        print(f"\nOPTION: [{i}]")
-        print(ticket) # Use the ticket's __str__ method
+    print(f"\nFound {len(ticket_map)} possible trip(s).")
 
     # 3. SELECT
     print("\n--- 3. Select a Ticket ---")
@@ -163,37 +167,41 @@ def run_view_trips():
         return
         
     try:
-        # Use the new method to get separated history
+        # Use the new method to get separated history (first page of each)
         history = BOOKING_SERVICE.get_client_trip_history(client_id, last_name)
         
         print(f"\nTrip History for {last_name} ({client_id}):")
         
-        current_trips = history['current']
-        past_trips = history['past']
-        
-        print(f"\n--- Upcoming & Today's Trips ({len(current_trips)}) ---")
-        if current_trips:
-            for trip in current_trips:
-                print(f"[{trip.date}] {trip}")
-                # Print connection info
-                for ticket in trip.tickets.all():
-                     print(f"  - {ticket}")
-        else:
-            print("No upcoming trips found.")
-
-        print(f"\n--- Past Trip History ({len(past_trips)}) ---")
-        if past_trips:
-             for trip in past_trips:
-                print(f"[{trip.date}] {trip}")
-                for ticket in trip.tickets.all():
-                     print(f"  - {ticket}")
-        else:
-            print("No past trips found.")
+        print("\n--- Upcoming & Today's Trips ---")
+        print_trip_pages(history['current'], client_id, last_name, upcoming=True, empty_message="No upcoming trips found.")
+
+        print("\n--- Past Trip History ---")
+        print_trip_pages(history['past'], client_id, last_name, upcoming=False, empty_message="No past trips found.")
             
     except ValueError as e:
         print(f"\nError: {e}")
 
 
+def print_trip_pages(page, client_id: str, last_name: str, upcoming: bool, empty_message: str):
+    """Prints a page of trips, then the following pages for as long as the user asks for more."""
+    if not page.trips:
+        print(empty_message)
+        return
+
+    while True:
+        for trip in page:
+            print(f"[{trip.date}] {trip}")
+            # Print connection info (the tickets were fetched with the page)
+            for ticket in trip.tickets.all():
+                 print(f"  - {ticket}")
+
+        if page.next_cursor is None:
+            return
+        if input("Show more trips? (y/n): ").strip().lower() != "y":
+            return
+        page = BOOKING_SERVICE.get_trip_page(client_id, last_name, upcoming, cursor=page.next_cursor)
+
+
 def main_loop():
     """
     The main console loop for the user.
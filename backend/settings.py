@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -81,6 +84,78 @@ DATABASES = {
     }
 }
 
+# SQLite profiles, picked with the RAILCONNECT_DB_PROFILE environment variable.
+# "default" keeps Django's defaults. "production" is for serving concurrent requests:
+#   - WAL journal: readers no longer wait for the booking writer (and vice versa)
+#   - synchronous=NORMAL: safe with WAL, only the last commits can be lost on power failure
+#   - 64 MiB page cache, 256 MiB memory map, temporary tables in memory
+#   - busy_timeout: a writer waits up to 20 s for the lock instead of failing
+#   - IMMEDIATE transactions: atomic blocks take the write lock up front, so a transaction
+#     that reads then writes can't fail to upgrade its lock
+#   - connections are kept for 10 minutes instead of opened for every request
+# The pragmas are run on every new connection (init_command needs Django 5.1+).
+SQLITE_PROFILES = {
+    'default': {},
+    'production': {
+        'OPTIONS': {
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA cache_size=-65536;'
+                'PRAGMA mmap_size=268435456;'
+                'PRAGMA temp_store=MEMORY;'
+                'PRAGMA busy_timeout=20000;'
+            ),
+            'transaction_mode': 'IMMEDIATE',
+        },
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+    },
+}
+
+DB_PROFILE = os.environ.get('RAILCONNECT_DB_PROFILE', 'default')
+if DB_PROFILE not in SQLITE_PROFILES:
+    raise ImproperlyConfigured(
+        f"RAILCONNECT_DB_PROFILE is '{DB_PROFILE}', expected one of {', '.join(SQLITE_PROFILES)}."
+    )
+DATABASES['default'].update(SQLITE_PROFILES[DB_PROFILE])
+
+# per-query search counters and latency histograms (StationNetworkManager.search_stats),
+# turned on with RAILCONNECT_SEARCH_STATS=1 and read at /api/search-stats/
+SEARCH_INSTRUMENTATION = os.environ.get('RAILCONNECT_SEARCH_STATS') == '1'
+
+# routing engine of the searches (StationNetworkManager.ROUTING_ENGINES), set with
+# RAILCONNECT_ROUTING_ENGINE to compare the engines in production: best_first streams the
+# trips as they are found, dfs and csa find them all before the first one is sent
+ROUTING_ENGINE = os.environ.get('RAILCONNECT_ROUTING_ENGINE', 'best_first')
+
+# RAILCONNECT_PRELOAD_NETWORK=1 prepares the rail network to be shared by forked workers
+# (StationNetworkManager.preload), for servers that load the app before forking them
+PRELOAD_NETWORK = os.environ.get('RAILCONNECT_PRELOAD_NETWORK') == '1'
+
+# search results handed out by option ID (transit/services/trip_option_store.py), so a
+# booking names the trip it wants instead of the search being run again.
+# The default local-memory cache is private to each process: with several worker
+# processes set RAILCONNECT_TRIP_OPTION_CACHE to a folder they all share (file cache)
+TRIP_OPTION_TTL = 15 * 60  # seconds
+TRIP_OPTION_MAX_ENTRIES = 50_000
+TRIP_OPTION_CACHE_DIR = os.environ.get('RAILCONNECT_TRIP_OPTION_CACHE')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'trip_options': {
+        'BACKEND': (
+            'django.core.cache.backends.filebased.FileBasedCache' if TRIP_OPTION_CACHE_DIR
+            else 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': TRIP_OPTION_CACHE_DIR or 'trip-options',
+        'TIMEOUT': TRIP_OPTION_TTL,
+        'OPTIONS': {'MAX_ENTRIES': TRIP_OPTION_MAX_ENTRIES},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
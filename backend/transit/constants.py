@@ -1,3 +1,4 @@
+import unicodedata
 from enum import Enum
 
 # --- City Enum ---
@@ -254,21 +255,34 @@ class City(Enum):
 
 city_from_raw = {city.value.lower(): city for city in City}
 
+# letters that don't decompose into a base letter plus accents under NFKD
+CITY_TRANSLITERATION = str.maketrans({
+  "ł": "l", "Ł": "l", "ø": "o", "Ø": "o", "đ": "d", "Đ": "d", "ı": "i",
+  "æ": "ae", "Æ": "ae", "œ": "oe", "Œ": "oe", "ß": "ss", "þ": "th", "Þ": "th",
+})
+
+def normalize_city_label(label: str) -> str:
+    """
+    Case- and accent-insensitive key of a city label ("Łódź" -> "lodz", " Zürich " -> "zurich").
+    Hyphens count as spaces and runs of whitespace are collapsed.
+    """
+    decomposed = unicodedata.normalize("NFKD", label.translate(CITY_TRANSLITERATION))
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.casefold().replace("-", " ").split())
+
+city_from_normalized = {normalize_city_label(city.value): city for city in City}
+
 
 def get_city_from_label(label_to_find):
     """
     Gets the enum's key (e.g., City.A_CORUNA) from its 
     human-readable label (e.g., 'A Coruña').
-    This is case-insensitive.
+    This is case- and accent-insensitive ('a coruna' works too).
     """
     if not label_to_find:
         return None
-        
-    label_to_find_lower = label_to_find.lower()
-    for city in City:
-        if city.value.lower() == label_to_find_lower:
-            return city
-    return None
+    
+    return city_from_normalized.get(normalize_city_label(label_to_find))
 
 # --- DayOfWeek Enum ---
 class DayOfWeek(Enum):
@@ -290,6 +304,16 @@ day_name_to_enum = {
     "Sat": DayOfWeek.Saturday,
 }
 
+# times are kept as integer minutes from midnight of the travel day,
+# arrivals on the next day are >= MINUTES_PER_DAY
+MINUTES_PER_DAY = 24 * 60
+
+# bit `day.value` is set for every day a connection operates on
+ALL_DAYS_MASK = (1 << len(DayOfWeek)) - 1
+
+def day_bit(day: DayOfWeek) -> int:
+    return 1 << day.value
+
 # --- TrainType Enum ---
 class TrainType(str, Enum):
     AVE = "AVE"
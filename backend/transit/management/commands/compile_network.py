@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand
+from backend_django.apps import CSV_FILE_PATH
+from transit.services.network_snapshot import compile_snapshot, default_snapshot_path
+
+
+class Command(BaseCommand):
+    help = "Compiles the rail network CSV into a binary snapshot that loads without parsing the CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv_path", nargs="?", default=CSV_FILE_PATH)
+        parser.add_argument("--output", help="Snapshot path (default: next to the CSV, with a .snapshot suffix)")
+
+    def handle(self, *args, **options):
+        csv_path = options["csv_path"]
+        snapshot_path = options["output"] or default_snapshot_path(csv_path)
+
+        start = time.perf_counter()
+        compile_snapshot(csv_path, snapshot_path)
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(f"Compiled {csv_path} into {snapshot_path} in {elapsed:.2f}s."))
@@ -0,0 +1,31 @@
+import time
+from django.core.management.base import BaseCommand
+from transit.services.timetable_generator import DEFAULT_ROUTES, write_timetable
+
+
+class Command(BaseCommand):
+    help = "Writes a synthetic hub and spoke timetable in the schema of the rail network CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="Path of the CSV file to write")
+        parser.add_argument("--routes", type=int, default=DEFAULT_ROUTES, help="Number of rows")
+        parser.add_argument("--cities", type=int, help="Number of cities served (default: all of them)")
+        parser.add_argument("--hubs", type=int, help="Number of hub cities (default: one city in 12)")
+        parser.add_argument("--hub-frequency", type=int, default=4, help="Services on hub links per service elsewhere")
+        parser.add_argument("--night-share", type=float, default=0.05, help="Share of night trains")
+        parser.add_argument("--seed", type=int, default=342)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = write_timetable(
+            options["output"],
+            routes=options["routes"],
+            cities=options["cities"],
+            hubs=options["hubs"],
+            hub_frequency=options["hub_frequency"],
+            night_share=options["night_share"],
+            seed=options["seed"],
+        )
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} connections to {options['output']} in {elapsed:.2f}s."))
@@ -0,0 +1,56 @@
+import json
+import random
+from django.core.management.base import BaseCommand, CommandError
+from backend_django.apps import CSV_FILE_PATH
+from transit.constants import DayOfWeek, get_city_from_label
+from transit.services.search_stats import format_snapshot
+from transit.services.station_network_manager import ROUTING_ENGINES, StationNetworkManager
+
+SEARCHES = ROUTING_ENGINES + ("pareto",)
+
+
+class Command(BaseCommand):
+    help = "Runs searches with the search instrumentation on and prints their counters and latency histograms."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="from_city", help="Departure city of a single query")
+        parser.add_argument("--to", dest="to_city", help="Arrival city of a single query")
+        parser.add_argument("--day", choices=[day.name for day in DayOfWeek], default=DayOfWeek.Monday.name)
+        parser.add_argument("--random", type=int, default=0, help="Number of random queries to run")
+        parser.add_argument("--search", nargs="+", choices=SEARCHES, default=list(SEARCHES))
+        parser.add_argument("--seed", type=int, default=342)
+        parser.add_argument("--json", action="store_true", help="Print the statistics as JSON")
+
+    def handle(self, *args, **options):
+        manager = StationNetworkManager(CSV_FILE_PATH)
+        queries = []
+        if options["from_city"] or options["to_city"]:
+            start_city = get_city_from_label(options["from_city"])
+            end_city = get_city_from_label(options["to_city"])
+            if start_city is None or end_city is None:
+                raise CommandError("Unknown or missing --from / --to city.")
+            queries.append((start_city, end_city, DayOfWeek[options["day"]]))
+
+        rng = random.Random(options["seed"])
+        cities = sorted(manager.get_network().stations, key=lambda city: city.value)
+        for _ in range(options["random"]):
+            queries.append((*rng.sample(cities, 2), rng.choice(list(DayOfWeek))))
+        if not queries:
+            raise CommandError("Nothing to run, give --from and --to, or --random N.")
+
+        routing_engine = manager.routing_engine
+        manager.enable_instrumentation()
+        manager.clear_search_cache()
+        try:
+            for search in options["search"]:
+                for start_city, end_city, day_of_week in queries:
+                    if search == "pareto":
+                        manager.pareto_trips(start_city, end_city, day_of_week)
+                    else:
+                        manager.set_routing_engine(search)
+                        manager.find_trips(start_city, end_city, day_of_week)
+        finally:
+            manager.set_routing_engine(routing_engine)
+
+        snapshot = manager.search_stats.snapshot()
+        self.stdout.write(json.dumps(snapshot, indent=2) if options["json"] else format_snapshot(snapshot))
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transit', '0002_trip_client_trip_date_trip_destination_city_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketLeg',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('route_id', models.CharField(max_length=20)),
+                ('travel_date', models.DateField()),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ticket_legs', to='transit.client')),
+                ('ticket', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='legs', to='transit.ticket')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['route_id', 'travel_date'], name='ticketleg_route_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('client', 'route_id', 'travel_date'), name='unique_client_route_per_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:11
+
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+
+def populate_ticket_legs(apps, schema_editor):
+    # one TicketLeg per route id of every existing ticket, on the date of its trip
+    Ticket = apps.get_model('transit', 'Ticket')
+    TicketLeg = apps.get_model('transit', 'TicketLeg')
+
+    legs = []
+    tickets = Ticket.objects.values_list('id', 'client_id', 'route_ids', 'trip__date')
+    for ticket_id, client_id, route_ids, travel_date in tickets.iterator(chunk_size=BATCH_SIZE):
+        for route_id in filter(None, (route_id.strip() for route_id in route_ids.split(","))):
+            legs.append(TicketLeg(ticket_id=ticket_id, client_id=client_id, route_id=route_id, travel_date=travel_date))
+
+    # the rule used to be checked only in Python, if a leg was still booked twice the first one is kept
+    TicketLeg.objects.bulk_create(legs, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transit', '0003_ticketleg'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_ticket_legs, migrations.RunPython.noop),
+    ]
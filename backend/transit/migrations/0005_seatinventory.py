@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transit', '0004_populate_ticket_legs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeatInventory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('route_id', models.CharField(max_length=20)),
+                ('travel_date', models.DateField()),
+                ('seat_class', models.CharField(choices=[('first', 'First class'), ('second', 'Second class')], max_length=6)),
+                ('capacity', models.PositiveIntegerField()),
+                ('seats_sold', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('route_id', 'travel_date', 'seat_class'), name='unique_seat_inventory'), models.CheckConstraint(condition=models.Q(('seats_sold__lte', models.F('capacity'))), name='seats_sold_within_capacity')],
+            },
+        ),
+    ]
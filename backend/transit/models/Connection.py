@@ -1,19 +1,38 @@
-
-
-from transit.constants import City, city_from_raw, DayOfWeek, day_name_to_enum, train_type_from_raw as train
+from transit.constants import City, city_from_raw, DayOfWeek, day_name_to_enum, day_bit, MINUTES_PER_DAY, TrainType, train_type_from_raw as train
 from datetime import datetime, timedelta
-from typing import Set 
+from typing import Set
 
 # This class basically represents a single row in the CSV file
 # It holds all the information about a single train connection
 # It also parses and converts the raw data into more useful formats
+#
+# To keep large timetables small, a connection only stores compact values in __slots__:
+# departure/arrival as integer minutes from midnight of the departure day, the days of
+# operation as a 7-bit mask, and references to the shared City / TrainType members.
+# departure_time, arrival_time, duration, day_offset and days_of_operation are computed
+# from those when accessed.
 
 
 from django.utils import timezone
 
+# DayOfWeek set for every 7-bit day mask
+DAYS_BY_MASK = [frozenset(day for day in DayOfWeek if mask & day_bit(day)) for mask in range(1 << len(DayOfWeek))]
+
 class Connection:
     dummy_date = datetime(2000, 1, 1)
-    
+
+    __slots__ = (
+        'route_id',
+        'departure_city',
+        'arrival_city',
+        'departure_minutes',  # minutes from midnight
+        'arrival_minutes',  # minutes from midnight of the departure day, >= 1440 when arriving the next day
+        'day_mask',  # bit day.value is set for each DayOfWeek the connection operates on
+        'train_type',
+        'first_class_price',
+        'second_class_price',
+    )
+
     def __init__(
         self,
         route_id: str,
@@ -30,48 +49,94 @@ class Connection:
         self.departure_city = city_from_raw[departure_city.lower()]
         self.arrival_city = city_from_raw[arrival_city.lower()]
         hour, minute = map(int, departure_time.split(":"))
-        # Make timezone aware
-        naive_departure = Connection.dummy_date.replace(hour=hour, minute=minute)
-        self.departure_time = timezone.make_aware(naive_departure)
-        
+        self.departure_minutes = hour * 60 + minute
+
         self.parse_set_arrival_time(arrival_time)
-        self.duration = self.arrival_time - self.departure_time
         self.train_type = train[train_type]
         self.first_class_price = float(first_class_price)
         self.second_class_price = float(second_class_price)
-        self.days_of_operation = self.parse_days_of_operation(days_of_operation)
-        
-      
-    
+        self.day_mask = sum(day_bit(day) for day in self.parse_days_of_operation(days_of_operation))
+
+    @classmethod
+    def from_compact(
+        cls,
+        route_id: str,
+        departure_city: City,
+        arrival_city: City,
+        departure_minutes: int,
+        arrival_minutes: int,
+        day_mask: int,
+        train_type: TrainType,
+        first_class_price: float,
+        second_class_price: float
+        ):
+        """
+        Builds a connection from already parsed values (e.g. a compiled network snapshot)
+        without going through the string parsing of __init__.
+        """
+        connection = cls.__new__(cls)
+        connection.route_id = route_id
+        connection.departure_city = departure_city
+        connection.arrival_city = arrival_city
+        connection.departure_minutes = departure_minutes
+        connection.arrival_minutes = arrival_minutes
+        connection.day_mask = day_mask
+        connection.train_type = train_type
+        connection.first_class_price = first_class_price
+        connection.second_class_price = second_class_price
+        return connection
+
+    @staticmethod
+    def _time_at(minutes: int) -> datetime:
+        # timezone aware datetime `minutes` after midnight of the dummy date
+        return timezone.make_aware(Connection.dummy_date) + timedelta(minutes=minutes)
+
+    @property
+    def departure_time(self) -> datetime:
+        return Connection._time_at(self.departure_minutes)
+
+    @property
+    def arrival_time(self) -> datetime:
+        return Connection._time_at(self.arrival_minutes)
+
+    @property
+    def duration(self) -> timedelta:
+        return timedelta(minutes=self.arrival_minutes - self.departure_minutes)
+
+    @property
+    def day_offset(self) -> int:
+        return self.arrival_minutes // MINUTES_PER_DAY
+
+    @property
+    def days_of_operation(self) -> Set[DayOfWeek]:
+        return DAYS_BY_MASK[self.day_mask]
+
     def parse_set_arrival_time(self, arrival_time: str):
         parts = arrival_time.split(" ")
-        
+
         if len(parts) > 1:
               # Arrival time includes day offset, e.g., "23:45 (+1d)"
             time = parts[0]
             day_offset_str = parts[1]
-            
+
             import re
             m = re.match(r"\(\+(\d+)d\)", day_offset_str)
-            
+
             if not m:
                 raise ValueError(f"Invalid day offset format: {day_offset_str}")
-            
-            self.day_offset = int(m.group(1))    
+
+            day_offset = int(m.group(1))
             hour, minute = map(int, time.split(":"))
         else:
             # No day offset, arrival on same dummy date
-            self.day_offset = 0
+            day_offset = 0
             hour, minute = map(int, arrival_time.split(":"))
-            
-            
-        
-        naive_arrival = (Connection.dummy_date + timedelta(days=self.day_offset)).replace(hour=hour, minute=minute)
-        self.arrival_time = timezone.make_aware(naive_arrival)
-    
+
+        self.arrival_minutes = day_offset * MINUTES_PER_DAY + hour * 60 + minute
+
     def parse_days_of_operation(self, days_of_operation: str) -> Set[DayOfWeek]:
         days = set()
-        
+
         if days_of_operation == "Daily":
             # add all days of the week
             for day in DayOfWeek:
@@ -82,7 +147,7 @@ class Connection:
             start_day = day_name_to_enum[start_str].value
             end_day = day_name_to_enum[end_str].value
             current_day = start_day
-            
+
             while True:
                 days.add(DayOfWeek(current_day))
                 if current_day == end_day:
@@ -93,5 +158,5 @@ class Connection:
             for day_str in days_of_operation.split(","):
                 day = day_name_to_enum[day_str.strip()]
                 days.add(day)
-                
-        return days
\ No newline at end of file
+
+        return days
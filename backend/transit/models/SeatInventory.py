@@ -0,0 +1,34 @@
+from django.db import models
+
+FIRST_CLASS = "first"
+SECOND_CLASS = "second"
+
+class SeatInventory(models.Model):
+    """
+    Seats of one class on one connection on one calendar date.
+    Rows are created when the first seat is booked, see transit/services/seat_inventory.py.
+    """
+    SEAT_CLASS_CHOICES = [
+        (FIRST_CLASS, "First class"),
+        (SECOND_CLASS, "Second class"),
+    ]
+
+    route_id = models.CharField(max_length=20)
+    travel_date = models.DateField()
+    seat_class = models.CharField(max_length=6, choices=SEAT_CLASS_CHOICES)
+    capacity = models.PositiveIntegerField()
+    seats_sold = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['route_id', 'travel_date', 'seat_class'], name='unique_seat_inventory'),
+            # last line of defence against overselling, the booking path never gets here
+            models.CheckConstraint(condition=models.Q(seats_sold__lte=models.F('capacity')), name='seats_sold_within_capacity'),
+        ]
+
+    @property
+    def seats_left(self) -> int:
+        return self.capacity - self.seats_sold
+
+    def __str__(self):
+        return f"{self.route_id} on {self.travel_date} ({self.seat_class}): {self.seats_sold}/{self.capacity} sold"
@@ -1,25 +1,137 @@
+from bisect import bisect_right
+from heapq import merge
 from transit.models.Connection import Connection
-from transit.constants import City
+from transit.constants import City, DayOfWeek, ALL_DAYS_MASK
 
 # this class represents a station (node in the graph)
-# it holds the city name and a map of outgoing connections
-# the outgoing connections are organized by day of week and arrival city
+# it holds the city name and its outgoing connections sorted by departure time
+# connections running every day are kept once in a shared list, the others are kept
+# in one list per day they operate on, so a "Daily" route is stored a single time
+
+
+class DepartureList:
+    """
+    Connections sorted by departure time, with the integer minute keys kept in a
+    parallel list so departure windows can be found with bisect.
+    """
+
+    def __init__(self):
+        self.keys = []  # departure_minutes of each connection, ascending
+        self.connections = []
+
+    def add(self, connection: Connection):
+        index = bisect_right(self.keys, connection.departure_minutes)
+        self.keys.insert(index, connection.departure_minutes)
+        self.connections.insert(index, connection)
+
+    def remove(self, connection: Connection):
+        self.connections.remove(connection)
+        self.keys = [c.departure_minutes for c in self.connections]
+
+    def between(self, after_minutes: int, until_minutes: int) -> list[Connection]:
+        # connections departing strictly after `after_minutes` and no later than `until_minutes`
+        start = bisect_right(self.keys, after_minutes)
+        end = bisect_right(self.keys, until_minutes, lo=start)
+        return self.connections[start:end]
+
+    def count_between(self, after_minutes: int, until_minutes: int) -> int:
+        # len(between(...)) without building the list
+        start = bisect_right(self.keys, after_minutes)
+        return bisect_right(self.keys, until_minutes, lo=start) - start
+
+    def copy(self) -> "DepartureList":
+        duplicate = DepartureList()
+        duplicate.keys = list(self.keys)
+        duplicate.connections = list(self.connections)
+        return duplicate
+
+    def __len__(self):
+        return len(self.connections)
+
 
 class Station():
-    def __init__(self, city: City): 
+    def __init__(self, city: City):
         self.city = city
-        self.outgoing_connections = {}  # key: DayOfWeek, value: map of arrival city to list of connections
-        
+        self.__daily = DepartureList()  # connections operating every day of the week
+        self.__by_day = {}  # key: DayOfWeek, value: DepartureList of the remaining connections
+
     def add_connection(self, connection: Connection):
-        
+        if connection.day_mask == ALL_DAYS_MASK:
+            self.__daily.add(connection)
+            return
+
         for day_of_week in connection.days_of_operation:
-        
-            if day_of_week not in self.outgoing_connections:
-                self.outgoing_connections[day_of_week] = {}
-            
-            if connection.arrival_city not in self.outgoing_connections[day_of_week]:
-                self.outgoing_connections[day_of_week][connection.arrival_city] = []
-                
-            self.outgoing_connections[day_of_week][connection.arrival_city].append(connection)
-            
-        
\ No newline at end of file
+            self.__add_for_day(day_of_week, connection)
+
+    def __add_for_day(self, day_of_week: DayOfWeek, connection: Connection):
+        if day_of_week not in self.__by_day:
+            self.__by_day[day_of_week] = DepartureList()
+        self.__by_day[day_of_week].add(connection)
+
+    def remove_connection(self, connection: Connection):
+        if connection.day_mask == ALL_DAYS_MASK:
+            self.__daily.remove(connection)
+            return
+
+        for day_of_week in connection.days_of_operation:
+            self.__by_day[day_of_week].remove(connection)
+
+    def copy(self) -> "Station":
+        """Independent copy of the departure index (the connections themselves are shared)."""
+        duplicate = Station(self.city)
+        duplicate.__daily = self.__daily.copy()
+        duplicate.__by_day = {day_of_week: departures.copy() for day_of_week, departures in self.__by_day.items()}
+        return duplicate
+
+    def __len__(self):
+        return len(self.__daily) + sum(len(departures) for departures in self.__by_day.values())
+
+    def departures(self, day_of_week: DayOfWeek) -> list[Connection]:
+        """All connections leaving this station on `day_of_week`, by departure time."""
+        day_list = self.__by_day.get(day_of_week)
+        if not day_list:
+            return list(self.__daily.connections)
+        if not self.__daily:
+            return list(day_list.connections)
+        return list(merge(self.__daily.connections, day_list.connections, key=lambda c: c.departure_minutes))
+
+    def departures_between(self, day_of_week: DayOfWeek, after_minutes: int, until_minutes: int) -> list[Connection]:
+        """Connections leaving on `day_of_week` in the window (after_minutes, until_minutes], by departure time."""
+        window = self.__daily.between(after_minutes, until_minutes)
+        day_list = self.__by_day.get(day_of_week)
+        if not day_list:
+            return window
+        day_window = day_list.between(after_minutes, until_minutes)
+        if not window:
+            return day_window
+        if not day_window:
+            return window
+        return list(merge(window, day_window, key=lambda c: c.departure_minutes))
+
+    def count_departures_between(self, day_of_week: DayOfWeek, after_minutes: int, until_minutes: int) -> int:
+        """Number of connections departures_between would return."""
+        count = self.__daily.count_between(after_minutes, until_minutes)
+        day_list = self.__by_day.get(day_of_week)
+        if day_list:
+            count += day_list.count_between(after_minutes, until_minutes)
+        return count
+
+    # map of DayOfWeek to arrival city to list of connections, built from the departure index
+    # kept for callers (and the verification scripts) that work on the nested dict layout
+    @property
+    def outgoing_connections(self):
+        outgoing = {}
+        for day_of_week in DayOfWeek:
+            for connection in self.departures(day_of_week):
+                outgoing.setdefault(day_of_week, {}).setdefault(connection.arrival_city, []).append(connection)
+        return outgoing
+
+    @outgoing_connections.setter
+    def outgoing_connections(self, outgoing: dict):
+        # connections are indexed exactly under the days they are listed for
+        self.__daily = DepartureList()
+        self.__by_day = {}
+        for day_of_week, connections_by_city in outgoing.items():
+            for connections in connections_by_city.values():
+                for connection in connections:
+                    self.__add_for_day(day_of_week, connection)
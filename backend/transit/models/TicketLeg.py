@@ -0,0 +1,26 @@
+from django.db import models
+from .Client import Client
+from .Ticket import Ticket
+
+class TicketLeg(models.Model):
+    """
+    One connection of a booked ticket, on the calendar date it is travelled.
+    A client can hold only one seat on a given connection on a given day, which
+    the database enforces with the unique constraint below.
+    """
+    ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name='legs')
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='ticket_legs')
+    route_id = models.CharField(max_length=20)
+    travel_date = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['client', 'route_id', 'travel_date'], name='unique_client_route_per_day'),
+        ]
+        indexes = [
+            # "who is booked on route R on date D"
+            models.Index(fields=['route_id', 'travel_date'], name='ticketleg_route_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.route_id} on {self.travel_date} for {self.client_id}"
@@ -8,6 +8,8 @@ from .Station import Station
 from .Client import Client
 from .Ticket import Ticket
 from .Trip import Trip
+from .TicketLeg import TicketLeg
+from .SeatInventory import SeatInventory
 
 # This makes it so you can import them like
 # from transit.models import Connection, Station, Trip
@@ -16,5 +18,7 @@ __all__ = [
     'Station',
     'Ticket',
     'Client',
-    'Trip'
+    'Trip',
+    'TicketLeg',
+    'SeatInventory'
 ]
@@ -0,0 +1,95 @@
+import multiprocessing
+import os
+from typing import Iterable, Optional
+from transit.constants import City, DayOfWeek
+from transit.models.Ticket import TripOption
+
+# batch trip search on a process pool
+# the workers are forked after the network is loaded, so they share the parent's
+# StationNetworkManager pages copy-on-write instead of parsing the timetable again.
+# workers send back only the route ids of each trip, and the parent turns them back
+# into TripOptions over the Connection objects of the network version the workers were
+# forked with (not the current one, a reload may have swapped it in the meantime),
+# keeping the results in input order.
+# where fork isn't available the workers are spawned and load the network from its file.
+
+BATCH_SEARCHES = ("find_trips", "pareto_trips")
+
+Query = tuple[City, City, DayOfWeek]
+
+_worker_manager = None  # the network manager used inside the worker processes
+_worker_search = None
+
+
+def _fork_initializer(search: str):
+    global _worker_search
+    _worker_search = search
+
+
+def _spawn_initializer(file_path: str, routing_engine: str, search: str):
+    # a spawned worker doesn't inherit the parent's memory, so it loads the network itself
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+    django.setup()
+    from .station_network_manager import StationNetworkManager
+
+    global _worker_manager, _worker_search
+    _worker_manager = StationNetworkManager(file_path, routing_engine=routing_engine)
+    _worker_search = search
+
+
+def _run_query(query: Query) -> list[tuple[str, ...]]:
+    start_city, end_city, day_of_week = query
+    trips = getattr(_worker_manager, _worker_search)(start_city, end_city, day_of_week)
+    return [tuple(connection.route_id for connection in trip.connections) for trip in trips]
+
+
+def batch_search(
+    manager,
+    queries: Iterable[Query],
+    workers: Optional[int] = None,
+    search: str = "find_trips",
+    chunksize: Optional[int] = None,
+) -> list[list[TripOption]]:
+    """
+    Runs `search` ("find_trips" or "pareto_trips") of `manager` for every
+    (start_city, end_city, day_of_week) query and returns the trips of each query,
+    in the same order as `queries`. workers defaults to the number of CPUs.
+    """
+    global _worker_manager
+
+    if search not in BATCH_SEARCHES:
+        raise ValueError(f"Unknown batch search '{search}', expected one of {BATCH_SEARCHES}.")
+
+    queries = list(queries)
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(queries) <= 1:
+        run = getattr(manager, search)
+        return [run(*query) for query in queries]
+
+    # a few chunks per worker keeps them all busy without paying IPC per query
+    chunksize = chunksize or max(1, len(queries) // (workers * 4))
+
+    # the version the forked workers search, whatever reload happens while they run
+    network = manager.get_network()
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+        _worker_manager = manager  # inherited by the forked workers
+        pool = context.Pool(workers, initializer=_fork_initializer, initargs=(search,))
+    else:
+        context = multiprocessing.get_context("spawn")
+        pool = context.Pool(
+            workers, initializer=_spawn_initializer, initargs=(manager.file_path, manager.routing_engine, search)
+        )
+
+    try:
+        with pool:
+            route_ids = pool.map(_run_query, queries, chunksize=chunksize)
+    finally:
+        _worker_manager = None
+
+    return [
+        [TripOption([network.get_connection(route_id) for route_id in trip]) for trip in trips]
+        for trips in route_ids
+    ]
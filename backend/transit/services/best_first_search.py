@@ -0,0 +1,93 @@
+import heapq
+from itertools import count
+from typing import Callable, Iterator, Optional
+from transit.constants import City, DayOfWeek
+from transit.models.Station import Station
+from transit.models.Ticket import TripOption
+from .layover_policy import MAX_LEGS, MINUTES_PER_DAY, max_layover_minutes
+from .reachability import within_reach, within_time
+from .time_window import ANY_TIME, TimeWindow
+
+# best-first trip search
+# partial paths are kept in a priority queue ordered by (travel duration so far, legs so far).
+# every extension adds a connection with a positive duration, so the key of a partial path
+# is a lower bound on the key of any trip completed from it: when a finished trip comes out
+# of the queue nothing left in the queue can beat it, and it can be yielded right away.
+# with a table of the shortest travel time left from each city (ReachabilityIndex.duration_table)
+# the key of a partial path is the duration so far plus the time left from where it is, A*
+# style: still a lower bound, so trips come out in the same order, but the paths heading
+# away from the destination are only expanded once all the better trips were yielded.
+
+
+def iter_best_first(
+    get_station: Callable[[City], Optional[Station]],
+    start_city: City,
+    end_city: City,
+    day_of_week: DayOfWeek,
+    max_legs: int = MAX_LEGS,
+    min_legs: Optional[dict] = None,
+    window: TimeWindow = ANY_TIME,
+    latest_departures: Optional[dict] = None,
+    min_durations: Optional[dict] = None,
+) -> Iterator[TripOption]:
+    """
+    Yields the trips dfs_all_paths would find, ordered by
+    (total_travel_duration, num_connections), computing only as much as has been consumed.
+    `min_legs`, `latest_departures` and `min_durations` are optional ReachabilityIndex
+    tables for end_city used for pruning, `min_durations` also to order the search.
+    Only trips within `window` are searched for.
+    """
+    if start_city == end_city:
+        return
+
+    tie_breaker = count()  # keeps heap entries comparable without comparing connections
+    # (lower bound of the trip duration in minutes, legs, is_partial, tie, duration so far, city, path)
+    queue = [(0, 0, True, next(tie_breaker), 0, start_city, ())]
+
+    while queue:
+        _, legs, is_partial, _, duration, city, path = heapq.heappop(queue)
+
+        if not is_partial:
+            yield TripOption(list(path))
+            continue
+
+        station = get_station(city)
+        if station is None:
+            continue
+
+        if path:
+            arrival = path[-1].arrival_minutes
+            last_departure = arrival + max_layover_minutes(arrival)
+            if latest_departures is not None:
+                last_departure = min(last_departure, latest_departures.get(city, -1))
+            next_connections = station.departures_between(day_of_week, arrival, window.latest_departure(last_departure))
+        else:
+            next_connections = window.first_departures(station, day_of_week)
+
+        for connection in next_connections:
+            if not window.arrives_in_time(connection):
+                continue
+            next_duration = duration + connection.arrival_minutes - connection.departure_minutes
+            next_path = path + (connection,)
+
+            next_city = connection.arrival_city
+            next_arrival = connection.arrival_minutes
+
+            if next_city == end_city:
+                # finished trips go back in the queue so they come out in order
+                heapq.heappush(
+                    queue, (next_duration, legs + 1, False, next(tie_breaker), next_duration, end_city, next_path)
+                )
+            elif (
+                next_arrival < MINUTES_PER_DAY
+                and within_reach(min_legs, next_city, legs + 1, max_legs)
+                and within_time(latest_departures, next_city, next_arrival)
+                and window.can_arrive_in_time(min_durations, next_city, next_arrival)
+            ):
+                time_left = min_durations.get(next_city) if min_durations is not None else 0
+                if time_left is None:
+                    continue  # end_city can't be reached from next_city at all
+                heapq.heappush(
+                    queue,
+                    (next_duration + time_left, legs + 1, True, next(tie_breaker), next_duration, next_city, next_path),
+                )
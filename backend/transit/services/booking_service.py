@@ -1,18 +1,44 @@
 import uuid
-from typing import List, Dict
-from django.db import transaction
+from typing import List, Dict, Optional, Tuple
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch, Q, QuerySet
 from transit.models.Client import Client
 from transit.models.Trip import Trip
 from transit.models.Ticket import Ticket, TripOption
-from datetime import datetime
+from transit.models.TicketLeg import TicketLeg
+from transit.models.SeatInventory import FIRST_CLASS, SECOND_CLASS
+from transit.services.seat_inventory import reserve_seats
+from transit.services.trip_option_store import TripOptionStore
+from datetime import datetime, date
+
+# trip history is paginated with a keyset cursor: the (date, trip_id) of the last trip of a page
+HISTORY_PAGE_SIZE = 20
+
+TripCursor = Tuple[date, int]
+
+
+class TripPage:
+    """
+    One page of a client's trips. next_cursor is None on the last page.
+    """
+    def __init__(self, trips: List[Trip], next_cursor: Optional[TripCursor]):
+        self.trips = trips
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.trips)
+
+    def __len__(self):
+        return len(self.trips)
 
 class BookingService:
     """
     Manages all logic for booking trips and viewing past trips.
     Uses Django ORM for persistence.
+    trip_options resolves the option IDs handed out with search results (book_trip_option).
     """
-    def __init__(self):
-        pass
+    def __init__(self, trip_options: Optional[TripOptionStore] = None):
+        self.trip_options = trip_options
 
     def get_or_create_client(self, client_id: str, first_name: str, last_name: str, age: int) -> Client:
         """Finds a client by their ID or creates a new one."""
@@ -31,88 +57,151 @@ class BookingService:
             
         return client
 
-    def book_trip(self, selected_ticket: TripOption, traveller_details: List[Dict], day_of_week: int, travel_date: datetime.date) -> Trip:
+    def book_trip(self, selected_ticket: TripOption, traveller_details: List[Dict], day_of_week: int, travel_date: datetime.date, seat_class: str = SECOND_CLASS) -> Trip:
         """
-        Books a selected trip for a list of travellers.
+        Books a selected trip for a list of travellers, one `seat_class` seat each on every connection.
+        Runs a fixed number of queries whatever the size of the group.
         """
-        # "Once created, a trip is assigned a unique numerical ID"
-        # The ID is now auto-generated by the database (AutoField)
-        
-        # Create the Trip object first
-        new_trip = Trip.objects.create(
-            source_city=selected_ticket.departure_city.value,
-            destination_city=selected_ticket.arrival_city.value,
-            date=travel_date,
-            total_price=selected_ticket.total_second_class_price * len(traveller_details), # Assuming 2nd class for now
-            route_description=str(selected_ticket)
-        )
-            
+        # 1. Check for duplicate within this booking request
         client_ids_on_this_trip = set()
-        
+        for details in traveller_details:
+            if details['id'] in client_ids_on_this_trip:
+                raise ValueError(
+                    f"Error: Client {details['first_name']} {details['last_name']} (ID: {details['id']}) "
+                    f"is already booked on this trip. Cannot add them twice."
+                )
+            client_ids_on_this_trip.add(details['id'])
+
         # Get route IDs for the selected trip
         new_route_ids = [c.route_id for c in selected_ticket.connections]
+
+        try:
+            return self.__book_trip(selected_ticket, traveller_details, day_of_week, travel_date, new_route_ids, seat_class)
+        except IntegrityError:
+            # the whole booking was rolled back. If a concurrent booking took one of the legs
+            # after our check, the unique constraint on TicketLeg rejected it and the leg is
+            # there now; any other integrity error (e.g. a concurrent booking creating the
+            # same new client) isn't a double booking and is raised as it is
+            client_ids = [details['id'] for details in traveller_details]
+            if not self.clients_already_booked(client_ids, new_route_ids, travel_date):
+                raise
+            raise ValueError(
+                "Error: One of the travellers already has a reservation for one of these connections on this day."
+            )
+
+    def book_trip_option(self, option_id: str, traveller_details: List[Dict], seat_class: str = SECOND_CLASS) -> Trip:
+        """
+        Books the trip a search returned as option_id, on the date it was searched for.
+        Raises TripOptionNotFound if the option expired, TripOptionChanged if its connections changed since.
+        """
+        if self.trip_options is None:
+            raise ValueError("Error: This booking service has no trip option store.")
+        option = self.trip_options.get(option_id)
+        return self.book_trip(option.trip, traveller_details, option.day_of_week.value, option.travel_date, seat_class)
+
+    def __book_trip(self, selected_ticket: TripOption, traveller_details: List[Dict], day_of_week: int, travel_date: datetime.date, new_route_ids: List[str], seat_class: str) -> Trip:
         new_route_ids_str = ",".join(new_route_ids)
 
-        # We use a transaction to ensure atomicity
-        with transaction.atomic():
+        # We use a transaction to ensure atomicity (the trip too, so a failed booking leaves nothing behind)
+        price = selected_ticket.total_first_class_price if seat_class == FIRST_CLASS else selected_ticket.total_second_class_price
 
-            for details in traveller_details:
-                client = self.get_or_create_client(
-                    client_id=details['id'],
-                    first_name=details['first_name'],
-                    last_name=details['last_name'],
-                    age=details['age']
-                )
+        with transaction.atomic():
+            # Take the seats first: on SQLite the first statement of the transaction is then a
+            # write, so concurrent bookings wait for each other instead of failing to upgrade a read lock
+            reserve_seats(new_route_ids, travel_date, seat_class, len(traveller_details))
 
-                # Assign the first client as the primary booker for the trip
-                if new_trip.client is None:
-                    new_trip.client = client
-                    new_trip.save()
+            clients = self.get_or_create_clients(traveller_details)
 
-                # 1. Check for duplicate within this booking request
-                if client.client_id in client_ids_on_this_trip:
+            # 2. Check for global duplicates (same connection, same day), for every traveller at once
+            # one lookup on the (client, route_id, travel_date) unique index of TicketLeg
+            clients_already_booked = self.clients_already_booked(
+                [client.client_id for client in clients], new_route_ids, travel_date
+            )
+            for client in clients:
+                if client.client_id in clients_already_booked:
                     raise ValueError(
                         f"Error: Client {client.first_name} {client.last_name} (ID: {client.client_id}) "
-                        f"is already booked on this trip. Cannot add them twice."
+                        f"already has a reservation for one of these connections on this day."
                     )
-                client_ids_on_this_trip.add(client.client_id)
-                
-                # 2. Check for global duplicates (same connection, same day)
-                # Find all tickets for this client on this specific date
-                # We check trip__date to ensure we are looking at the calendar date, not just day of week
-                existing_tickets = Ticket.objects.filter(client=client, trip__date=travel_date)
-                
-                for ticket in existing_tickets:
-                    existing_routes = ticket.route_ids.split(",")
-                    # Check intersection
-                    if set(new_route_ids).intersection(set(existing_routes)):
-                         raise ValueError(
-                            f"Error: Client {client.first_name} {client.last_name} (ID: {client.client_id}) "
-                            f"already has a reservation for one of these connections on this day."
-                        )
-
-                # Create the Ticket record
-                Ticket.objects.create(
+
+            # "Once created, a trip is assigned a unique numerical ID"
+            # The ID is auto-generated by the database (AutoField)
+            # The first client is the primary booker for the trip
+            new_trip = Trip.objects.create(
+                client=clients[0] if clients else None,
+                source_city=selected_ticket.departure_city.value,
+                destination_city=selected_ticket.arrival_city.value,
+                date=travel_date,
+                total_price=price * len(traveller_details),
+                route_description=str(selected_ticket)
+            )
+
+            # Create the Ticket records, then one TicketLeg per connection of each ticket
+            tickets = Ticket.objects.bulk_create([
+                Ticket(
                     trip=new_trip,
                     client=client,
                     departure_city=selected_ticket.departure_city.value,
                     arrival_city=selected_ticket.arrival_city.value,
                     departure_time=selected_ticket.departure_time,
                     arrival_time=selected_ticket.arrival_time,
-                    price=selected_ticket.total_first_class_price + selected_ticket.total_second_class_price, # Storing total for now, or maybe just 2nd class? Let's store sum or just one. The prompt didn't specify price storage details, but Ticket model has 'price'. Let's assume standard price.
-                    # Actually, let's just store the second class price as base, or maybe we need to ask user for class?
-                    # The current app doesn't ask for class. It just shows both prices.
-                    # I'll store the second class price as default 'price' for now.
+                    price=price,
                     route_ids=new_route_ids_str,
                     day_of_week=day_of_week
                 )
+                for client in clients
+            ])
+            TicketLeg.objects.bulk_create([
+                TicketLeg(ticket=ticket, client=ticket.client, route_id=route_id, travel_date=travel_date)
+                for ticket in tickets
+                for route_id in new_route_ids
+            ])
 
             print(f"\nSuccessfully booked Trip {new_trip.trip_id} for {len(traveller_details)} passenger(s).")
             return new_trip
 
-    def view_trips(self, client_id: str, last_name: str) -> List[Trip]:
+    @staticmethod
+    def clients_already_booked(client_ids: List[str], route_ids: List[str], travel_date: date) -> set:
         """
-        Finds all trips for a specific client.
+        IDs of the clients holding a seat on one of route_ids on travel_date, with one
+        lookup on the (client, route_id, travel_date) unique index of TicketLeg.
+        """
+        return set(
+            TicketLeg.objects.filter(
+                client_id__in=client_ids,
+                route_id__in=route_ids,
+                travel_date=travel_date,
+            ).values_list('client_id', flat=True)
+        )
+
+    def get_or_create_clients(self, traveller_details: List[Dict]) -> List[Client]:
+        """
+        Finds the clients of all travellers with one query and creates the missing ones
+        with a single insert. Returns them in the order of traveller_details.
+        """
+        existing_clients = Client.objects.in_bulk([details['id'] for details in traveller_details])
+
+        new_clients = [
+            Client(
+                client_id=details['id'],
+                first_name=details['first_name'],
+                last_name=details['last_name'],
+                age=details['age']
+            )
+            for details in traveller_details
+            if details['id'] not in existing_clients
+        ]
+        if new_clients:
+            Client.objects.bulk_create(new_clients)
+            for client in new_clients:
+                print(f"(New client record created for {client.first_name} {client.last_name})")
+
+        clients_by_id = {**existing_clients, **{client.client_id: client for client in new_clients}}
+        return [clients_by_id[details['id']] for details in traveller_details]
+
+    def authenticate_client(self, client_id: str, last_name: str) -> Client:
+        """
+        Returns the client with this ID, if the last name matches.
         """
         # Validate client exists
         try:
@@ -124,36 +213,59 @@ class BookingService:
         if client.last_name.lower() != last_name.lower():
             raise ValueError("Last name does not match the ID provided.")
 
-        # Find trips
-        # We want trips where this client has a ticket
-        trips = Trip.objects.filter(tickets__client=client).distinct()
-        
-        return list(trips)
+        return client
+
+    @staticmethod
+    def _client_trips(client: Client) -> QuerySet:
+        # We want trips where this client has a ticket, with the primary booker joined in and
+        # their tickets (and the client of each ticket) fetched in one extra query per page
+        return Trip.objects.filter(tickets__client=client).distinct().select_related('client').prefetch_related(
+            Prefetch('tickets', queryset=Ticket.objects.select_related('client'))
+        )
 
-    def get_client_trip_history(self, client_id: str, last_name: str) -> Dict[str, List[Trip]]:
+    def view_trips(self, client_id: str, last_name: str) -> List[Trip]:
         """
-        Returns a dictionary with 'current' and 'past' trips for the client.
+        Finds all trips for a specific client.
         """
-        all_trips = self.view_trips(client_id, last_name)
+        client = self.authenticate_client(client_id, last_name)
+        return list(self._client_trips(client).order_by('date', 'trip_id'))
+
+    def _trip_page(self, client: Client, upcoming: bool, cursor: Optional[TripCursor], page_size: int) -> TripPage:
         today = datetime.now().date()
-        
-        history = {
-            'current': [],
-            'past': []
-        }
-        
-        for trip in all_trips:
-            # Check if trip date is today or future
-            if trip.date >= today:
-                history['current'].append(trip)
-            else:
-                history['past'].append(trip)
-                
-        # Sort current trips by date ascending (soonest first)
-        history['current'].sort(key=lambda x: x.date)
-        
-        # Sort past trips by date descending (most recent first)
-        history['past'].sort(key=lambda x: x.date, reverse=True)
-        
-        return history
+        trips = self._client_trips(client)
+
+        # upcoming: today or later, soonest first; past: most recent first
+        # keyset pagination: the page starts right after the (date, trip_id) of the cursor
+        if upcoming:
+            trips = trips.filter(date__gte=today).order_by('date', 'trip_id')
+            if cursor is not None:
+                trips = trips.filter(Q(date__gt=cursor[0]) | Q(date=cursor[0], trip_id__gt=cursor[1]))
+        else:
+            trips = trips.filter(date__lt=today).order_by('-date', '-trip_id')
+            if cursor is not None:
+                trips = trips.filter(Q(date__lt=cursor[0]) | Q(date=cursor[0], trip_id__lt=cursor[1]))
 
+        # one extra row tells whether there is a next page
+        trips = list(trips[:page_size + 1])
+        if len(trips) <= page_size:
+            return TripPage(trips, None)
+        last_trip = trips[page_size - 1]
+        return TripPage(trips[:page_size], (last_trip.date, last_trip.trip_id))
+
+    def get_trip_page(self, client_id: str, last_name: str, upcoming: bool, cursor: Optional[TripCursor] = None, page_size: int = HISTORY_PAGE_SIZE) -> TripPage:
+        """
+        Returns one page of the client's upcoming (or past) trips, with their tickets.
+        Pass the next_cursor of a page to get the page after it.
+        """
+        client = self.authenticate_client(client_id, last_name)
+        return self._trip_page(client, upcoming, cursor, page_size)
+
+    def get_client_trip_history(self, client_id: str, last_name: str, page_size: int = HISTORY_PAGE_SIZE) -> Dict[str, TripPage]:
+        """
+        Returns a dictionary with the first page of 'current' and 'past' trips for the client.
+        """
+        client = self.authenticate_client(client_id, last_name)
+        return {
+            'current': self._trip_page(client, True, None, page_size),
+            'past': self._trip_page(client, False, None, page_size),
+        }
@@ -0,0 +1,139 @@
+from typing import Iterable, Optional
+from transit.constants import City, normalize_city_label
+
+# city lookup and autocomplete index, built once from the City enum
+# every label is normalized (case, accents, ł/ø/..., hyphens, see normalize_city_label) and:
+#   - kept in a dict, so an exact lookup is a single hash
+#   - inserted in a prefix trie, from its first letter and from the start of each of its
+#     words, so "fra" finds Frankfurt and "napoca" finds Cluj-Napoca
+#   - matched with a bounded edit distance using symmetric deletes: every string obtained by
+#     deleting up to MAX_FUZZY_DISTANCE characters of a label points back to that label, so
+#     the candidates for a query are found by looking up the query's own deletions, and only
+#     those few are checked with a real Levenshtein distance
+# a query has O(len²) deletions, so queries longer than any label + MAX_FUZZY_DISTANCE
+# (which can't be within that distance of a label) are not fuzzy matched at all
+
+DEFAULT_SUGGESTIONS = 10
+MAX_FUZZY_DISTANCE = 2
+MAX_QUERY_LENGTH = 100  # longest autocomplete query the API accepts
+
+
+def deletions(word: str, max_deletes: int) -> set[str]:
+    # word with up to `max_deletes` characters removed (including word itself)
+    variants = {word}
+    frontier = {word}
+    for _ in range(max_deletes):
+        frontier = {variant[:i] + variant[i + 1:] for variant in frontier for i in range(len(variant))}
+        variants |= frontier
+    return variants
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    # Levenshtein distance of a and b, or max_distance + 1 once it is known to be larger
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous_row = list(range(len(b) + 1))
+    for i, character in enumerate(a, start=1):
+        row = [i]
+        for j, other in enumerate(b, start=1):
+            row.append(min(row[j - 1] + 1, previous_row[j] + 1, previous_row[j - 1] + (character != other)))
+        if min(row) > max_distance:
+            return max_distance + 1
+        previous_row = row
+    return previous_row[-1]
+
+
+class _TrieNode:
+    __slots__ = ("children", "cities")
+
+    def __init__(self):
+        self.children = {}  # key: character, value: _TrieNode
+        self.cities = []  # cities whose label (or one of its words) starts with this prefix, by label
+
+
+class CityIndex:
+
+    def __init__(self, cities: Iterable[City]):
+        self.__by_label = {}  # key: normalized label, value: City
+        self.__root = _TrieNode()
+        self.__deletions = {}  # key: a label with up to MAX_FUZZY_DISTANCE characters deleted, value: labels
+        self.__longest_label = 0
+
+        for city in sorted(cities, key=lambda c: normalize_city_label(c.value)):
+            label = normalize_city_label(city.value)
+            self.__by_label[label] = city
+            self.__longest_label = max(self.__longest_label, len(label))
+            self.__insert(label, city)
+            # also index each later word, "frankfurt am main" under "am main" and "main"
+            for position, character in enumerate(label):
+                if character == " ":
+                    self.__insert(label[position + 1:], city)
+            for variant in deletions(label, MAX_FUZZY_DISTANCE):
+                self.__deletions.setdefault(variant, []).append(label)
+
+    def __insert(self, key: str, city: City):
+        node = self.__root
+        for character in key:
+            node = node.children.setdefault(character, _TrieNode())
+            if city not in node.cities:
+                node.cities.append(city)
+
+    def resolve(self, label: str) -> Optional[City]:
+        """The city with exactly this label, ignoring case and accents."""
+        return self.__by_label.get(normalize_city_label(label)) if label else None
+
+    def complete(self, prefix: str, limit: int = DEFAULT_SUGGESTIONS) -> list[City]:
+        """Cities whose label, or one of its words, starts with `prefix`, alphabetical."""
+        node = self.__root
+        for character in normalize_city_label(prefix):
+            node = node.children.get(character)
+            if node is None:
+                return []
+        return node.cities[:limit]
+
+    def fuzzy(self, label: str, max_distance: int = MAX_FUZZY_DISTANCE, limit: int = DEFAULT_SUGGESTIONS) -> list[City]:
+        """Cities within `max_distance` (at most MAX_FUZZY_DISTANCE) edits of `label`, closest first."""
+        query = normalize_city_label(label)
+        max_distance = min(max_distance, MAX_FUZZY_DISTANCE)
+        if len(query) > self.__longest_label + max_distance:
+            return []
+
+        # two strings within d edits share a string reachable by at most d deletions from each
+        candidates = set()
+        for variant in deletions(query, max_distance):
+            candidates.update(self.__deletions.get(variant, ()))
+
+        matches = []  # (distance, label)
+        for candidate in candidates:
+            distance = edit_distance(query, candidate, max_distance)
+            if distance <= max_distance:
+                matches.append((distance, candidate))
+
+        matches.sort()
+        return [self.__by_label[candidate] for _, candidate in matches[:limit]]
+
+    def suggest(self, query: str, limit: int = DEFAULT_SUGGESTIONS) -> list[City]:
+        """
+        Autocomplete for a search box: the exact match, then prefix matches, then (if there
+        is room left) cities a typo or two away. Short queries allow fewer edits.
+        """
+        suggestions = []
+        exact = self.resolve(query)
+        if exact is not None:
+            suggestions.append(exact)
+
+        for city in self.complete(query, limit + 1):
+            if city not in suggestions:
+                suggestions.append(city)
+
+        length = len(normalize_city_label(query))
+        max_distance = 0 if length < 3 else 1 if length < 6 else 2
+        if len(suggestions) < limit and max_distance:
+            for city in self.fuzzy(query, max_distance, limit):
+                if city not in suggestions:
+                    suggestions.append(city)
+
+        return suggestions[:limit]
+
+
+CITY_INDEX = CityIndex(City)
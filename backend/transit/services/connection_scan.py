@@ -0,0 +1,145 @@
+from bisect import bisect_left
+from transit.constants import City, DayOfWeek
+from transit.models.Connection import Connection
+from transit.models.Ticket import TripOption
+from typing import Optional
+from .layover_policy import MAX_LEGS, MINUTES_PER_DAY, max_layover_minutes
+from .reachability import within_reach, within_time
+from .time_window import ANY_TIME, TimeWindow
+
+# Connection Scan routing engine
+# the timetable is kept as one array of connections per day, sorted by departure time.
+# a query is answered with a single sweep over that array: every connection can only
+# extend partial journeys that arrived at its departure city before it leaves, and those
+# journeys were all created by connections that departed earlier, i.e. earlier in the sweep.
+
+
+class ConnectionScanEngine:
+
+    def __init__(self, connections: list[Connection]):
+        self.__connections_by_day = {}  # key: DayOfWeek, value: connections sorted by departure time
+        self.__departure_span = {}  # key: DayOfWeek, value: map of City to (first, last) index in that array
+
+        for day_of_week in DayOfWeek:
+            day_connections = [c for c in connections if day_of_week in c.days_of_operation]
+            day_connections.sort(key=lambda c: c.departure_minutes)
+            self.__connections_by_day[day_of_week] = day_connections
+
+            span = {}
+            for index, connection in enumerate(day_connections):
+                first, _ = span.get(connection.departure_city, (index, index))
+                span[connection.departure_city] = (first, index)
+            self.__departure_span[day_of_week] = span
+
+    def connections_on(self, day_of_week: DayOfWeek) -> list[Connection]:
+        return self.__connections_by_day.get(day_of_week, [])
+
+    # finds the same trips as StationNetworkManager.dfs_all_paths
+    # (max 3 legs, layover policy, no travelling through end_city)
+    # `min_legs` maps each city to the fewest legs it needs to reach end_city (see ReachabilityIndex),
+    # journeys that can't make it within max_legs are not kept waiting, nor those arriving after
+    # the latest useful departure (`latest_departures`) or too late for arrive_by (`min_durations`)
+    # with a `window`, the sweep starts at the first departure from start_city at or after
+    # depart_after and stops once nothing departing later can arrive by arrive_by
+    # the counters described in search_stats.py are added to `counters` unless it is None
+    # Returns a list of TripOption objects
+    def search(
+        self,
+        start_city: City,
+        end_city: City,
+        day_of_week: DayOfWeek,
+        max_legs: int = MAX_LEGS,
+        min_legs: Optional[dict] = None,
+        window: TimeWindow = ANY_TIME,
+        latest_departures: Optional[dict] = None,
+        min_durations: Optional[dict] = None,
+        counters: Optional[dict] = None,
+    ):
+        all_paths = []
+        scanned = pushed = waiting_paths = pruned = 0
+
+        span = self.__departure_span.get(day_of_week, {}).get(start_city)
+        if start_city == end_city or span is None:
+            return all_paths
+
+        # the sweep starts at the first departure from start_city and ends once the last one
+        # has left and every layover window of the partial journeys has closed
+        first_index, last_index = span
+        day_connections = self.connections_on(day_of_week)
+        if window.depart_after is not None:
+            first_index = bisect_left(
+                day_connections, window.depart_after, lo=first_index, hi=last_index + 1,
+                key=lambda c: c.departure_minutes,
+            )
+        # last departure that can start a trip, and that can take any leg at all
+        last_first_departure = day_connections[last_index].departure_minutes
+        if window.depart_before is not None:
+            last_first_departure = min(last_first_departure, window.depart_before)
+        sweep_end = window.latest_departure(MINUTES_PER_DAY)
+
+        # key: City, value: list of (arrival_minutes, latest_departure, path) waiting for a connection
+        waiting = {}
+        horizon = -1  # latest departure any waiting journey can still take
+
+        for index in range(first_index, len(day_connections)):
+            connection = day_connections[index]
+            departure_city = connection.departure_city
+            departure = connection.departure_minutes
+
+            if departure > sweep_end or (departure > last_first_departure and departure > horizon):
+                break
+            scanned += 1
+
+            # trips stop as soon as they reach end_city
+            if departure_city == end_city:
+                continue
+
+            extended_paths = []
+
+            if departure_city == start_city and window.departs_in_time(departure):
+                # First leg, no layover check needed, only the departure window
+                extended_paths.append((connection,))
+
+            bucket = waiting.get(departure_city)
+            if bucket:
+                still_waiting = []
+                for entry in bucket:
+                    arrival, latest_departure, path = entry
+                    # the sweep is ordered by departure, once the window closes it stays closed
+                    if latest_departure < departure:
+                        continue
+                    still_waiting.append(entry)
+                    if departure > arrival:
+                        extended_paths.append(path + (connection,))
+                waiting[departure_city] = still_waiting
+
+            if extended_paths and not window.arrives_in_time(connection):
+                pruned += len(extended_paths)
+                continue
+
+            pushed += len(extended_paths)
+            for path in extended_paths:
+                if connection.arrival_city == end_city:
+                    all_paths.append(TripOption(list(path)))
+                elif connection.arrival_minutes >= MINUTES_PER_DAY or len(path) >= max_legs:
+                    # next-day arrivals can't catch anything else departing on this day
+                    continue
+                elif (
+                    within_reach(min_legs, connection.arrival_city, len(path), max_legs)
+                    and within_time(latest_departures, connection.arrival_city, connection.arrival_minutes)
+                    and window.can_arrive_in_time(min_durations, connection.arrival_city, connection.arrival_minutes)
+                ):
+                    arrival = connection.arrival_minutes
+                    latest_departure = arrival + max_layover_minutes(arrival)
+                    waiting.setdefault(connection.arrival_city, []).append((arrival, latest_departure, path))
+                    waiting_paths += 1
+                    horizon = max(horizon, latest_departure)
+                else:
+                    pruned += 1
+
+        if counters is not None:
+            counters["scanned"] = counters.get("scanned", 0) + scanned
+            counters["pushed"] = counters.get("pushed", 0) + pushed
+            counters["waiting"] = counters.get("waiting", 0) + waiting_paths
+            counters["pruned"] = counters.get("pruned", 0) + pruned
+        return all_paths
@@ -0,0 +1,131 @@
+from datetime import time
+from typing import Iterable, Optional, Union
+from transit.constants import City, DayOfWeek, TrainType, day_bit
+from transit.models.Connection import Connection
+
+# NumPy is optional: without it the table is not built and callers fall back to
+# filtering the Connection objects in Python (see filter_connections below)
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# columnar copy of the timetable
+# one NumPy array per field, row i describing connections[i], so questions like
+# "all connections from X on Monday departing between 22:00 and 22:30" are answered
+# with vectorized comparisons instead of Python loops over the stations.
+
+TimeOfDay = Union[int, str, time]  # minutes from midnight, "HH:MM" or datetime.time
+
+CITY_IDS = {city: index for index, city in enumerate(City)}
+TRAIN_TYPE_IDS = {train: index for index, train in enumerate(TrainType)}
+
+
+def numpy_available() -> bool:
+    return np is not None
+
+
+def to_minutes(value: TimeOfDay) -> int:
+    if isinstance(value, time):
+        return value.hour * 60 + value.minute
+    if isinstance(value, str):
+        hour, minute = map(int, value.split(":"))
+        return hour * 60 + minute
+    return int(value)
+
+
+class ConnectionTable:
+
+    def __init__(self, connections: list[Connection]):
+        if np is None:
+            raise ImportError("ConnectionTable needs NumPy, install it with `pip install numpy`.")
+
+        self.connections = list(connections)
+        self.departure_city = np.fromiter((CITY_IDS[c.departure_city] for c in connections), dtype=np.int16, count=len(connections))
+        self.arrival_city = np.fromiter((CITY_IDS[c.arrival_city] for c in connections), dtype=np.int16, count=len(connections))
+        self.departure_minutes = np.fromiter((c.departure_minutes for c in connections), dtype=np.int32, count=len(connections))
+        self.arrival_minutes = np.fromiter((c.arrival_minutes for c in connections), dtype=np.int32, count=len(connections))
+        self.day_mask = np.fromiter((c.day_mask for c in connections), dtype=np.uint8, count=len(connections))
+        self.train_type = np.fromiter((TRAIN_TYPE_IDS[c.train_type] for c in connections), dtype=np.uint8, count=len(connections))
+        self.first_class_price = np.fromiter((c.first_class_price for c in connections), dtype=np.float64, count=len(connections))
+        self.second_class_price = np.fromiter((c.second_class_price for c in connections), dtype=np.float64, count=len(connections))
+
+    def __len__(self):
+        return len(self.connections)
+
+    def mask(
+        self,
+        origin: Optional[City] = None,
+        destination: Optional[City] = None,
+        day_of_week: Optional[DayOfWeek] = None,
+        depart_after: Optional[TimeOfDay] = None,
+        depart_before: Optional[TimeOfDay] = None,
+        train_types: Optional[Iterable[TrainType]] = None,
+        max_price: Optional[float] = None,
+        first_class: bool = False,
+    ):
+        """
+        Boolean array selecting the rows matching every given criterion.
+        The departure window is inclusive on both ends; max_price applies to the
+        second class fare unless first_class is set.
+        """
+        selected = np.ones(len(self.connections), dtype=bool)
+
+        if origin is not None:
+            selected &= self.departure_city == CITY_IDS[origin]
+        if destination is not None:
+            selected &= self.arrival_city == CITY_IDS[destination]
+        if day_of_week is not None:
+            selected &= (self.day_mask & day_bit(day_of_week)) != 0
+        if depart_after is not None:
+            selected &= self.departure_minutes >= to_minutes(depart_after)
+        if depart_before is not None:
+            selected &= self.departure_minutes <= to_minutes(depart_before)
+        if train_types is not None:
+            selected &= np.isin(self.train_type, [TRAIN_TYPE_IDS[train] for train in train_types])
+        if max_price is not None:
+            prices = self.first_class_price if first_class else self.second_class_price
+            selected &= prices <= max_price
+
+        return selected
+
+    def indices(self, **criteria):
+        """Row numbers matching `criteria` (see mask), in timetable order."""
+        return np.flatnonzero(self.mask(**criteria))
+
+    def select(self, **criteria) -> list[Connection]:
+        """Connections matching `criteria` (see mask), in timetable order."""
+        connections = self.connections
+        return [connections[index] for index in self.indices(**criteria)]
+
+
+def filter_connections(
+    connections: list[Connection],
+    origin: Optional[City] = None,
+    destination: Optional[City] = None,
+    day_of_week: Optional[DayOfWeek] = None,
+    depart_after: Optional[TimeOfDay] = None,
+    depart_before: Optional[TimeOfDay] = None,
+    train_types: Optional[Iterable[TrainType]] = None,
+    max_price: Optional[float] = None,
+    first_class: bool = False,
+) -> list[Connection]:
+    """Pure Python version of ConnectionTable.select, used when NumPy isn't installed."""
+    after = to_minutes(depart_after) if depart_after is not None else None
+    before = to_minutes(depart_before) if depart_before is not None else None
+    bit = day_bit(day_of_week) if day_of_week is not None else None
+    allowed_trains = set(train_types) if train_types is not None else None
+
+    def matches(c: Connection) -> bool:
+        price = c.first_class_price if first_class else c.second_class_price
+        return (
+            (origin is None or c.departure_city == origin)
+            and (destination is None or c.arrival_city == destination)
+            and (bit is None or c.day_mask & bit)
+            and (after is None or c.departure_minutes >= after)
+            and (before is None or c.departure_minutes <= before)
+            and (allowed_trains is None or c.train_type in allowed_trains)
+            and (max_price is None or price <= max_price)
+        )
+
+    return [c for c in connections if matches(c)]
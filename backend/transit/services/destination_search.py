@@ -0,0 +1,184 @@
+from bisect import bisect_left
+from typing import Iterator, Optional
+from transit.constants import City, DayOfWeek
+from transit.models.Connection import Connection
+from transit.models.Ticket import TripOption
+from .layover_policy import MAX_LEGS, MINUTES_PER_DAY, max_layover_minutes
+from .pareto_search import Label, dominates
+from .time_window import ANY_TIME, TimeWindow
+
+# one-to-all search: the earliest arrival, the fastest trip and the cheapest trip from one
+# origin to every city reachable on a day, for "where can I go from here" pages, under the
+# rules of dfs_all_paths for each of them (leg limit, layover policy).
+# it is a single connection scan sweep over the day's connections (see connection_scan.py)
+# that keeps, like pareto_search, the journeys that are not dominated on (travel duration,
+# second class price, legs) per (city, arrival minute): journeys arriving in the same city
+# at the same minute have the same onward options, so the best trip to any later city on
+# any of the three criteria extends one of them. The three best journeys to each city are
+# kept as Labels (parent pointers shared between destinations), and only turned into
+# TripOptions when asked for.
+
+CRITERIA = ("earliest", "fastest", "cheapest")
+
+CRITERION_KEYS = {
+    "earliest": lambda label: (label.connection.arrival_minutes, label.duration, label.price, label.legs),
+    "fastest": lambda label: (label.duration, label.connection.arrival_minutes, label.price, label.legs),
+    "cheapest": lambda label: (label.price, label.duration, label.connection.arrival_minutes, label.legs),
+}
+
+
+class Destination:
+    """The best journeys found to one city, per criterion."""
+
+    __slots__ = ("city", "earliest", "fastest", "cheapest")
+
+    def __init__(self, city: City, label: Label):
+        self.city = city
+        self.earliest = self.fastest = self.cheapest = label
+
+    def add(self, label: Label):
+        for criterion in CRITERIA:
+            key = CRITERION_KEYS[criterion]
+            if key(label) < key(getattr(self, criterion)):
+                setattr(self, criterion, label)
+
+    @property
+    def earliest_arrival(self) -> int:
+        # minutes from midnight of the travel day, >= MINUTES_PER_DAY the next day
+        return self.earliest.connection.arrival_minutes
+
+    @property
+    def fastest_minutes(self) -> int:
+        return self.fastest.duration
+
+    @property
+    def cheapest_price(self) -> float:
+        return self.cheapest.price
+
+    def trip(self, criterion: str) -> TripOption:
+        if criterion not in CRITERIA:
+            raise ValueError(f"Unknown criterion '{criterion}', expected one of {CRITERIA}.")
+        return getattr(self, criterion).to_trip_option()
+
+
+class DestinationTable:
+    """Destinations reachable from start_city on day_of_week, earliest arrival first."""
+
+    def __init__(self, start_city: City, day_of_week: DayOfWeek, destinations: dict):
+        self.start_city = start_city
+        self.day_of_week = day_of_week
+        self.__destinations = dict(
+            sorted(destinations.items(), key=lambda item: (item[1].earliest_arrival, item[0].value))
+        )
+
+    def __len__(self):
+        return len(self.__destinations)
+
+    def __iter__(self) -> Iterator[Destination]:
+        return iter(self.__destinations.values())
+
+    def __contains__(self, city: City):
+        return city in self.__destinations
+
+    def get(self, city: City) -> Optional[Destination]:
+        return self.__destinations.get(city)
+
+    def trip(self, city: City, criterion: str = "fastest") -> Optional[TripOption]:
+        """The `criterion` trip to city, None if city can't be reached."""
+        destination = self.__destinations.get(city)
+        return destination.trip(criterion) if destination is not None else None
+
+
+def destination_search(
+    day_connections: list[Connection],
+    first_legs: list[Connection],
+    start_city: City,
+    day_of_week: DayOfWeek,
+    max_legs: int = MAX_LEGS,
+    window: TimeWindow = ANY_TIME,
+    counters: Optional[dict] = None,
+) -> DestinationTable:
+    """
+    One sweep over day_connections (the connections running on day_of_week, by departure
+    time) from start_city, where trips start with one of `first_legs` (the departures from
+    start_city inside `window`, see TimeWindow.first_departures). Returns the DestinationTable of every city reachable within
+    max_legs legs and `window`. Adds `labels` (journeys kept) and `dominated` (journeys
+    dropped) to `counters` unless it is None.
+    """
+    destinations = {}
+    if not first_legs:
+        return DestinationTable(start_city, day_of_week, destinations)
+
+    # key: City, value: list of (arrival_minutes, latest_departure, label) waiting for a connection
+    waiting = {}
+    bags = {}  # key: (City, arrival_minutes), value: labels not dominated on (duration, price, legs)
+    horizon = -1  # latest departure any waiting journey can still take
+    last_first_departure = max(c.departure_minutes for c in first_legs)
+    sweep_end = window.latest_departure(MINUTES_PER_DAY)
+    labels = dominated = 0
+
+    def add_to_bag(label: Label) -> bool:
+        bag = bags.setdefault((label.connection.arrival_city, label.connection.arrival_minutes), [])
+        key = (label.duration, label.price, label.legs)
+        if any(dominates((other.duration, other.price, other.legs), key) or
+               (other.duration, other.price, other.legs) == key for other in bag):
+            return False
+        bag[:] = [other for other in bag if not dominates(key, (other.duration, other.price, other.legs))]
+        bag.append(label)
+        return True
+
+    first_index = bisect_left(
+        day_connections, min(c.departure_minutes for c in first_legs), key=lambda c: c.departure_minutes,
+    )
+    for index in range(first_index, len(day_connections)):
+        connection = day_connections[index]
+        departure_city = connection.departure_city
+        departure = connection.departure_minutes
+
+        if departure > sweep_end or (departure > last_first_departure and departure > horizon):
+            break
+
+        extended = []
+        if departure_city == start_city and window.departs_in_time(departure):
+            extended.append(Label(connection, None))
+
+        bucket = waiting.get(departure_city)
+        if bucket:
+            still_waiting = []
+            for entry in bucket:
+                arrival, latest_departure, label = entry
+                # the sweep is ordered by departure, once the window closes it stays closed
+                if latest_departure < departure:
+                    continue
+                still_waiting.append(entry)
+                # skip journeys a later one pushed out of their bag
+                if departure > arrival and label in bags[(departure_city, arrival)]:
+                    extended.append(Label(connection, label))
+            waiting[departure_city] = still_waiting
+
+        if not extended or not window.arrives_in_time(connection):
+            continue
+
+        arrival_city = connection.arrival_city
+        arrival = connection.arrival_minutes
+        for label in extended:
+            if arrival_city != start_city:
+                if arrival_city in destinations:
+                    destinations[arrival_city].add(label)
+                else:
+                    destinations[arrival_city] = Destination(arrival_city, label)
+            # next-day arrivals can't catch anything else departing on this day
+            if arrival >= MINUTES_PER_DAY or label.legs >= max_legs:
+                continue
+            if not add_to_bag(label):
+                dominated += 1
+                continue
+            labels += 1
+            latest_departure = arrival + max_layover_minutes(arrival)
+            waiting.setdefault(arrival_city, []).append((arrival, latest_departure, label))
+            horizon = max(horizon, latest_departure)
+
+    if counters is not None:
+        counters["labels"] = counters.get("labels", 0) + labels
+        counters["dominated"] = counters.get("dominated", 0) + dominated
+    return DestinationTable(start_city, day_of_week, destinations)
@@ -0,0 +1,29 @@
+from transit.constants import MINUTES_PER_DAY
+
+# layover policy shared by every routing engine
+# all times are integer minutes from midnight of the travel day,
+# arrivals on the next day are >= MINUTES_PER_DAY
+
+# start_city - connection - stop - connection - stop - connection - end_City
+MAX_LEGS = 3  # default leg limit of a search
+MAX_SEARCH_LEGS = 6  # highest leg limit the search API accepts
+
+# Nighttime: 22:00 - 06:00
+NIGHT_START_HOUR = 22
+NIGHT_END_HOUR = 6
+
+NIGHT_LAYOVER_MAX_MINUTES = 30
+DAY_LAYOVER_MAX_MINUTES = 120
+
+
+def is_night_arrival(arrival_minutes: int) -> bool:
+    arrival_hour = (arrival_minutes // 60) % 24
+    return arrival_hour >= NIGHT_START_HOUR or arrival_hour < NIGHT_END_HOUR
+
+
+def max_layover_minutes(arrival_minutes: int) -> int:
+    """Longest wait allowed at a stop reached at `arrival_minutes`."""
+    if is_night_arrival(arrival_minutes):
+        return NIGHT_LAYOVER_MAX_MINUTES
+    return DAY_LAYOVER_MAX_MINUTES
+
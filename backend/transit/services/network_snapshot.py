@@ -0,0 +1,183 @@
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Optional
+from transit.constants import City, TrainType
+from transit.models.Connection import Connection
+
+# compiled, binary snapshot of the rail network CSV
+# the snapshot stores the parsed timetable as fixed-width columns (one array per field),
+# so loading it is a memory map plus one pass building Connection objects, with none of
+# the regex / date / set parsing done per CSV row.
+#
+# layout: header, then the columns in COLUMNS order, each padded to 8 bytes
+#   header      magic, format version, byte order, row count,
+#               sha256 of the source CSV, digest of the City / TrainType enums
+#   route_id    ROUTE_ID_WIDTH bytes per row, ASCII, NUL padded
+#   the rest    native arrays of the type codes listed in COLUMNS
+#
+# a snapshot is stale (and the CSV is used instead) if the CSV checksum, the enums the
+# ids refer to, the format version or the byte order differ.
+
+SNAPSHOT_MAGIC = b"RLNS"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SUFFIX = ".snapshot"
+
+HEADER = struct.Struct("<4sHBxI32s16s")
+ROUTE_ID_WIDTH = 16
+ALIGNMENT = 8
+
+COLUMNS = [
+    ("departure_city", "H"),  # index in list(City)
+    ("arrival_city", "H"),
+    ("departure_minutes", "H"),  # minutes from midnight
+    ("arrival_minutes", "H"),  # minutes from midnight of the departure day
+    ("day_mask", "B"),  # bit day.value set for each DayOfWeek
+    ("train_type", "B"),  # index in list(TrainType)
+    ("first_class_price", "d"),
+    ("second_class_price", "d"),
+]
+
+CITIES = list(City)
+TRAIN_TYPES = list(TrainType)
+
+
+class StaleSnapshotError(Exception):
+    """The snapshot doesn't match the CSV or this version of the code."""
+
+
+def default_snapshot_path(csv_path: str) -> str:
+    return os.path.splitext(csv_path)[0] + SNAPSHOT_SUFFIX
+
+
+def file_checksum(path: str) -> bytes:
+    with open(path, "rb") as file:
+        return hashlib.sha256(file.read()).digest()
+
+
+def enum_digest() -> bytes:
+    # ids are positions in the enums, so any change to them invalidates the snapshot
+    names = "\n".join([city.value for city in CITIES] + ["--"] + [train.value for train in TRAIN_TYPES])
+    return hashlib.sha256(names.encode("utf-8")).digest()[:16]
+
+
+def _byte_order_flag() -> int:
+    return 0 if sys.byteorder == "little" else 1
+
+
+def _padding(size: int) -> bytes:
+    return b"\0" * (-size % ALIGNMENT)
+
+
+def compile_snapshot(csv_path: str, snapshot_path: Optional[str] = None) -> str:
+    """Parses `csv_path` and writes its snapshot, returns the snapshot path."""
+    from .route_loader import read_csv  # route_loader imports this module
+
+    snapshot_path = snapshot_path or default_snapshot_path(csv_path)
+    connections = read_csv(csv_path)
+
+    city_ids = {city: index for index, city in enumerate(CITIES)}
+    train_ids = {train: index for index, train in enumerate(TRAIN_TYPES)}
+
+    route_ids = bytearray()
+    for connection in connections:
+        encoded = connection.route_id.encode("ascii")
+        if len(encoded) > ROUTE_ID_WIDTH:
+            raise ValueError(f"Route ID '{connection.route_id}' is longer than {ROUTE_ID_WIDTH} characters.")
+        route_ids += encoded.ljust(ROUTE_ID_WIDTH, b"\0")
+
+    values = {
+        "departure_city": [city_ids[c.departure_city] for c in connections],
+        "arrival_city": [city_ids[c.arrival_city] for c in connections],
+        "departure_minutes": [c.departure_minutes for c in connections],
+        "arrival_minutes": [c.arrival_minutes for c in connections],
+        "day_mask": [c.day_mask for c in connections],
+        "train_type": [train_ids[c.train_type] for c in connections],
+        "first_class_price": [c.first_class_price for c in connections],
+        "second_class_price": [c.second_class_price for c in connections],
+    }
+
+    header = HEADER.pack(
+        SNAPSHOT_MAGIC, SNAPSHOT_VERSION, _byte_order_flag(), len(connections), file_checksum(csv_path), enum_digest()
+    )
+
+    # write next to the target and rename, so readers never see a half written snapshot
+    temporary_path = snapshot_path + ".tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(header + _padding(HEADER.size))
+        file.write(route_ids + _padding(len(route_ids)))
+        for name, type_code in COLUMNS:
+            column = array(type_code, values[name]).tobytes()
+            file.write(column + _padding(len(column)))
+    os.replace(temporary_path, snapshot_path)
+
+    return snapshot_path
+
+
+def _aligned(size: int) -> int:
+    return size + len(_padding(size))
+
+
+def read_snapshot(buffer, csv_checksum: Optional[bytes] = None) -> list[Connection]:
+    """
+    Builds the connections stored in a snapshot `buffer` (bytes, mmap or memoryview).
+    Raises StaleSnapshotError if it doesn't match `csv_checksum` or this code.
+    """
+    if len(buffer) < HEADER.size:
+        raise StaleSnapshotError("Snapshot is truncated.")
+
+    magic, version, byte_order, row_count, checksum, digest = HEADER.unpack(bytes(buffer[:HEADER.size]))
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise StaleSnapshotError("Snapshot format is not supported.")
+    if byte_order != _byte_order_flag():
+        raise StaleSnapshotError("Snapshot was written on a machine with a different byte order.")
+    if digest != enum_digest():
+        raise StaleSnapshotError("City or train type enums changed since the snapshot was compiled.")
+    if csv_checksum is not None and checksum != csv_checksum:
+        raise StaleSnapshotError("CSV changed since the snapshot was compiled.")
+
+    column_sizes = [row_count * array(type_code).itemsize for _, type_code in COLUMNS]
+    expected_size = _aligned(HEADER.size) + _aligned(row_count * ROUTE_ID_WIDTH) + sum(map(_aligned, column_sizes))
+    if len(buffer) < expected_size:
+        raise StaleSnapshotError("Snapshot is truncated.")
+
+    # read every column out of the buffer, then release the views so an mmap can be closed
+    with memoryview(buffer) as view:
+        offset = _aligned(HEADER.size)
+        size = row_count * ROUTE_ID_WIDTH
+        route_id_bytes = bytes(view[offset:offset + size])
+        offset += _aligned(size)
+
+        columns = []
+        for (_, type_code), size in zip(COLUMNS, column_sizes):
+            with view[offset:offset + size] as raw, raw.cast(type_code) as column:
+                columns.append(column.tolist())
+            offset += _aligned(size)
+
+    route_ids = [
+        route_id_bytes[row * ROUTE_ID_WIDTH:(row + 1) * ROUTE_ID_WIDTH].rstrip(b"\0").decode("ascii")
+        for row in range(row_count)
+    ]
+
+    return [
+        Connection.from_compact(
+            route_id, CITIES[departure_city], CITIES[arrival_city], departure_minutes, arrival_minutes,
+            day_mask, TRAIN_TYPES[train_type], first_class_price, second_class_price,
+        )
+        for (route_id, departure_city, arrival_city, departure_minutes, arrival_minutes,
+             day_mask, train_type, first_class_price, second_class_price) in zip(route_ids, *columns)
+    ]
+
+
+def load_snapshot(snapshot_path: str, csv_path: Optional[str] = None) -> list[Connection]:
+    """
+    Memory-maps `snapshot_path` and returns its connections.
+    If `csv_path` is given the snapshot must have been compiled from that exact file.
+    """
+    csv_checksum = file_checksum(csv_path) if csv_path else None
+    with open(snapshot_path, "rb") as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return read_snapshot(mapped, csv_checksum)
@@ -0,0 +1,169 @@
+from typing import Callable, Optional
+from transit.constants import City, DayOfWeek
+from transit.models.Station import Station
+from transit.models.Ticket import TripOption
+from .layover_policy import MAX_LEGS, MINUTES_PER_DAY, max_layover_minutes
+from .reachability import within_reach, within_time
+from .time_window import ANY_TIME, TimeWindow
+
+# multi-criteria round-based search (in the spirit of RAPTOR)
+# round k extends the journeys found in round k-1 by one more connection, and only
+# journeys that are not dominated on (travel duration, second class price, transfers)
+# are kept, so dominated partial paths are dropped as soon as they appear instead of
+# being expanded up to the leg limit and sorted away afterwards.
+
+
+class Label:
+    """A partial journey: the last connection taken plus a pointer to the journey before it."""
+
+    __slots__ = ("connection", "parent", "legs", "duration", "price")
+
+    def __init__(self, connection, parent: Optional["Label"]):
+        self.connection = connection
+        self.parent = parent
+        # duration is the sum of the connection durations, like TripOption.total_travel_duration
+        leg_duration = connection.arrival_minutes - connection.departure_minutes
+        if parent is None:
+            self.legs = 1
+            self.duration = leg_duration
+            self.price = connection.second_class_price
+        else:
+            self.legs = parent.legs + 1
+            self.duration = parent.duration + leg_duration
+            self.price = parent.price + connection.second_class_price
+
+    def criteria(self):
+        # transfers = legs - 1
+        return (self.duration, self.price, self.legs - 1)
+
+    def to_trip_option(self) -> TripOption:
+        connections = []
+        label = self
+        while label is not None:
+            connections.append(label.connection)
+            label = label.parent
+        connections.reverse()
+        return TripOption(connections)
+
+
+def dominates(a: tuple, b: tuple) -> bool:
+    """True if `a` is no worse than `b` on every criterion and better on at least one."""
+    return all(x <= y for x, y in zip(a, b)) and a != b
+
+
+def weakly_dominates(a: tuple, b: tuple) -> bool:
+    return all(x <= y for x, y in zip(a, b))
+
+
+def pareto_filter(trips: list[TripOption]) -> list[TripOption]:
+    """Keeps the trips that are not dominated on (duration, second class price, transfers)."""
+    def criteria(trip):
+        return (trip.total_travel_duration, trip.total_second_class_price, trip.num_connections - 1)
+
+    keyed = [(criteria(trip), trip) for trip in trips]
+    return [trip for key, trip in keyed if not any(dominates(other, key) for other, _ in keyed)]
+
+
+def pareto_search(
+    get_station: Callable[[City], Optional[Station]],
+    start_city: City,
+    end_city: City,
+    day_of_week: DayOfWeek,
+    max_legs: int = MAX_LEGS,
+    min_legs: Optional[dict] = None,
+    window: TimeWindow = ANY_TIME,
+    latest_departures: Optional[dict] = None,
+    min_durations: Optional[dict] = None,
+    counters: Optional[dict] = None,
+) -> list[TripOption]:
+    """
+    Returns the non-dominated trips from start_city to end_city on day_of_week, under the
+    same rules as dfs_all_paths (leg limit, layover policy, no travelling through end_city).
+    `min_legs`, `latest_departures` and `min_durations` are optional ReachabilityIndex
+    tables for end_city used for pruning. Only trips within `window` are considered.
+    Adds `pushed` (journeys extended by one connection), `pruned` (dropped by the bounds)
+    and `dominated` (dropped by a better journey) to `counters` unless it is None.
+    """
+    if start_city == end_city:
+        return []
+
+    results = []  # labels that reached end_city, kept non-dominated
+    bags = {}  # key: (City, arrival_minutes), value: non-dominated labels waiting there
+
+    def dominated_by_result(label: Label) -> bool:
+        # any extension of `label` takes longer, costs at least as much and has at least
+        # label.legs transfers, so a result weakly better than that bound dominates it
+        bound = (label.duration, label.price, label.legs)
+        return any(weakly_dominates(result.criteria(), bound) for result in results)
+
+    def add_result(label: Label):
+        key = label.criteria()
+        if any(dominates(result.criteria(), key) for result in results):
+            return
+        results[:] = [result for result in results if not dominates(key, result.criteria())]
+        results.append(label)
+
+    def add_to_bag(label: Label) -> bool:
+        # labels arriving at the same city at the same minute have the same onward options,
+        # so they can be compared; a label with fewer legs also has more legs left to use
+        bag_key = (label.connection.arrival_city, label.connection.arrival_minutes)
+        bag = bags.setdefault(bag_key, [])
+        key = (label.duration, label.price, label.legs)
+        if any(dominates((other.duration, other.price, other.legs), key) for other in bag):
+            return False
+        bag[:] = [other for other in bag if not dominates(key, (other.duration, other.price, other.legs))]
+        bag.append(label)
+        return True
+
+    # round 1: every departure from start_city
+    start_station = get_station(start_city)
+    candidates = [
+        Label(c, None) for c in window.first_departures(start_station, day_of_week) if window.arrives_in_time(c)
+    ] if start_station else []
+
+    pushed = pruned = dominated = 0
+    for _ in range(max_legs):  # round k takes the k-th leg
+        pushed += len(candidates)
+        frontier = []
+        for label in candidates:
+            city, arrival = label.connection.arrival_city, label.connection.arrival_minutes
+            if city == end_city:
+                add_result(label)
+            elif arrival >= MINUTES_PER_DAY or label.legs >= max_legs:
+                # next-day arrivals can't catch anything else departing on this day
+                continue
+            elif not (
+                within_reach(min_legs, city, label.legs, max_legs)
+                and within_time(latest_departures, city, arrival)
+                and window.can_arrive_in_time(min_durations, city, arrival)
+            ):
+                pruned += 1
+            elif dominated_by_result(label) or not add_to_bag(label):
+                dominated += 1
+            else:
+                frontier.append(label)
+
+        # next round: extend the labels that survived this one, skipping any that a later
+        # label of the same round pushed out of its bag
+        candidates = []
+        for label in frontier:
+            bag = bags.get((label.connection.arrival_city, label.connection.arrival_minutes), [])
+            if label not in bag or dominated_by_result(label):
+                dominated += 1
+                continue
+            station = get_station(label.connection.arrival_city)
+            if station is None:
+                continue
+            arrival = label.connection.arrival_minutes
+            last_departure = arrival + max_layover_minutes(arrival)
+            if latest_departures is not None:
+                last_departure = min(last_departure, latest_departures.get(label.connection.arrival_city, -1))
+            for connection in station.departures_between(day_of_week, arrival, window.latest_departure(last_departure)):
+                if window.arrives_in_time(connection):
+                    candidates.append(Label(connection, label))
+
+    if counters is not None:
+        counters["pushed"] = counters.get("pushed", 0) + pushed
+        counters["pruned"] = counters.get("pruned", 0) + pruned
+        counters["dominated"] = counters.get("dominated", 0) + dominated
+    return [label.to_trip_option() for label in results]
@@ -0,0 +1,152 @@
+from threading import Lock
+from typing import Optional
+from transit.constants import City
+from transit.models.Connection import Connection
+from transit.models.Station import Station
+from .connection_scan import ConnectionScanEngine
+from .reachability import ReachabilityIndex
+from .connection_table import ConnectionTable, numpy_available
+
+# one version of the loaded rail network
+# a RailNetwork is never modified once it is in use: reloading the timetable builds a new
+# version next to it (see apply) and StationNetworkManager swaps its reference to it, so a
+# search that already picked up the old version keeps reading a consistent graph until it ends.
+#
+# apply() only does work for the routes that changed: unchanged Connection objects are
+# reused, and only the Stations whose departures changed are copied and edited, the others
+# are shared with the previous version. The structures built over the whole timetable
+# (connection scan arrays, reachability tables, NumPy table) are built on first use.
+
+
+def connection_values(connection: Connection) -> tuple:
+    return tuple(getattr(connection, name) for name in Connection.__slots__)
+
+
+class NetworkDiff:
+    """Route IDs added, removed and changed between two versions of the network."""
+
+    def __init__(self, added: list[str], removed: list[str], changed: list[str]):
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+    def __repr__(self):
+        return f"NetworkDiff(added={len(self.added)}, removed={len(self.removed)}, changed={len(self.changed)})"
+
+
+class RailNetwork:
+
+    def __init__(self, connections: list[Connection], version: int, stations: Optional[dict] = None):
+        self.version = version
+        self.connections = connections
+        self.connections_by_route = {connection.route_id: connection for connection in connections}
+
+        if stations is None:
+            stations = {}
+            for connection in connections:
+                # create station if not exists
+                if connection.departure_city not in stations:
+                    stations[connection.departure_city] = Station(connection.departure_city)
+                stations[connection.departure_city].add_connection(connection)
+        self.stations = stations  # key: City, value: Station
+
+        self.__lock = Lock()
+        self.__connection_scan = None
+        self.__reachability = None
+        self.__connection_table = None
+
+    def get_station(self, city: City) -> Optional[Station]:
+        return self.stations.get(city)
+
+    def get_connection(self, route_id: str) -> Optional[Connection]:
+        return self.connections_by_route.get(route_id)
+
+    @property
+    def connection_scan(self) -> ConnectionScanEngine:
+        if self.__connection_scan is None:
+            with self.__lock:
+                if self.__connection_scan is None:
+                    self.__connection_scan = ConnectionScanEngine(self.connections)
+        return self.__connection_scan
+
+    @property
+    def reachability(self) -> ReachabilityIndex:
+        if self.__reachability is None:
+            with self.__lock:
+                if self.__reachability is None:
+                    self.__reachability = ReachabilityIndex(self.connections)
+        return self.__reachability
+
+    # columnar NumPy view of the timetable, None when NumPy isn't installed
+    @property
+    def connection_table(self) -> Optional[ConnectionTable]:
+        if self.__connection_table is None and numpy_available():
+            with self.__lock:
+                if self.__connection_table is None:
+                    self.__connection_table = ConnectionTable(self.connections)
+        return self.__connection_table
+
+    def warm(self):
+        """Builds the whole-timetable structures now instead of on first use."""
+        self.connection_scan
+        self.reachability
+        self.connection_table
+
+    def apply(self, connections: list[Connection], version: int) -> tuple["RailNetwork", NetworkDiff]:
+        """
+        Returns the network for the timetable `connections` (as version `version`) and the
+        diff from this one, without modifying this network. Routes are matched by Route ID.
+        If nothing changed this network itself is returned.
+        """
+        previous_by_route = self.connections_by_route
+        new_route_ids = {connection.route_id for connection in connections}
+
+        removed = [previous_by_route[route_id] for route_id in previous_by_route if route_id not in new_route_ids]
+        added = []
+        changed = []  # (previous, new) pairs
+        merged = []  # the new timetable in file order, reusing the unchanged connections
+
+        for connection in connections:
+            previous = previous_by_route.get(connection.route_id)
+            if previous is None:
+                added.append(connection)
+                merged.append(connection)
+            elif connection_values(previous) != connection_values(connection):
+                changed.append((previous, connection))
+                merged.append(connection)
+            else:
+                merged.append(previous)
+
+        diff = NetworkDiff(
+            [c.route_id for c in added], [c.route_id for c in removed], [c.route_id for _, c in changed]
+        )
+        if not diff:
+            return self, diff
+
+        # copy-on-write: only the stations touched by the diff are copied
+        stations = dict(self.stations)
+        copied = set()
+
+        def station_for(city: City) -> Station:
+            if city not in copied:
+                stations[city] = stations[city].copy() if city in stations else Station(city)
+                copied.add(city)
+            return stations[city]
+
+        for connection in removed:
+            station_for(connection.departure_city).remove_connection(connection)
+        for previous, connection in changed:
+            station_for(previous.departure_city).remove_connection(previous)
+            station_for(connection.departure_city).add_connection(connection)
+        for connection in added:
+            station_for(connection.departure_city).add_connection(connection)
+
+        # like a fresh load, only cities with departures get a station
+        for city in copied:
+            if not len(stations[city]):
+                del stations[city]
+
+        return RailNetwork(merged, version, stations), diff
@@ -0,0 +1,146 @@
+import heapq
+from collections import deque
+from typing import Optional
+from transit.constants import City, DayOfWeek
+from transit.models.Connection import Connection
+from .layover_policy import MINUTES_PER_DAY
+
+# reverse-reachability tables used to prune searches
+# for every DayOfWeek and destination city we store, for each city that can reach it using
+# only that day's connections, the minimum number of legs and the minimum summed travel
+# time needed to get there. Both ignore departure times and layovers, so they are lower
+# bounds: a branch that needs more legs than it has left can never reach the destination.
+# A third table holds, per city, the latest departure from it that can still reach the
+# destination that day (again ignoring layover limits): a branch arriving in a city at or
+# after that time is a dead end, and departures after it are not worth looking at.
+# The leg tables are built up front, the travel time and latest departure tables on first
+# use of a destination.
+
+
+class ReachabilityIndex:
+
+    def __init__(self, connections: list[Connection]):
+        # key: DayOfWeek, value: map of arrival City to map of departure City to shortest leg duration
+        self.__reverse_edges = {day_of_week: {} for day_of_week in DayOfWeek}
+        # key: DayOfWeek, value: map of arrival City to the connections arriving there
+        self.__arrivals = {day_of_week: {} for day_of_week in DayOfWeek}
+
+        for connection in connections:
+            duration = connection.arrival_minutes - connection.departure_minutes
+            for day_of_week in connection.days_of_operation:
+                incoming = self.__reverse_edges[day_of_week].setdefault(connection.arrival_city, {})
+                previous = incoming.get(connection.departure_city)
+                if previous is None or duration < previous:
+                    incoming[connection.departure_city] = duration
+                self.__arrivals[day_of_week].setdefault(connection.arrival_city, []).append(connection)
+
+        self.__min_legs = {day_of_week: {} for day_of_week in DayOfWeek}
+        self.__min_duration = {day_of_week: {} for day_of_week in DayOfWeek}
+        self.__latest_departure = {day_of_week: {} for day_of_week in DayOfWeek}
+
+        for day_of_week, reverse_edges in self.__reverse_edges.items():
+            for end_city in reverse_edges:
+                self.__min_legs[day_of_week][end_city] = self.__legs_to(reverse_edges, end_city)
+
+    @staticmethod
+    def __legs_to(reverse_edges: dict, end_city: City) -> dict:
+        # breadth-first search backwards from end_city
+        legs = {end_city: 0}
+        queue = deque([end_city])
+        while queue:
+            city = queue.popleft()
+            for previous_city in reverse_edges.get(city, {}):
+                if previous_city not in legs:
+                    legs[previous_city] = legs[city] + 1
+                    queue.append(previous_city)
+        return legs
+
+    @staticmethod
+    def __durations_to(reverse_edges: dict, end_city: City) -> dict:
+        # Dijkstra backwards from end_city over the shortest leg between each pair of cities
+        durations = {end_city: 0}
+        queue = [(0, end_city.value, end_city)]
+        while queue:
+            duration, _, city = heapq.heappop(queue)
+            if duration > durations[city]:
+                continue
+            for previous_city, leg_duration in reverse_edges.get(city, {}).items():
+                candidate = duration + leg_duration
+                if candidate < durations.get(previous_city, candidate + 1):
+                    durations[previous_city] = candidate
+                    heapq.heappush(queue, (candidate, previous_city.value, previous_city))
+        return durations
+
+    @staticmethod
+    def __latest_departures_to(arrivals: dict, end_city: City) -> dict:
+        # label setting backwards from end_city, latest times first: a connection into a city
+        # other than end_city is useful if it arrives strictly before the latest useful
+        # departure from there, and then its own departure is a useful departure
+        latest = {}
+        queue = [(-MINUTES_PER_DAY, end_city.value, end_city)]
+        settled = set()
+        while queue:
+            _, _, city = heapq.heappop(queue)
+            if city in settled:
+                continue
+            settled.add(city)
+            for connection in arrivals.get(city, ()):
+                if city != end_city and connection.arrival_minutes >= latest[city]:
+                    continue
+                previous_city = connection.departure_city
+                if previous_city != end_city and connection.departure_minutes > latest.get(previous_city, -1):
+                    latest[previous_city] = connection.departure_minutes
+                    heapq.heappush(queue, (-connection.departure_minutes, previous_city.value, previous_city))
+        return latest
+
+    def legs_table(self, end_city: City, day_of_week: DayOfWeek) -> dict:
+        """Map of City to the minimum number of legs from it to end_city (missing = unreachable)."""
+        return self.__min_legs[day_of_week].get(end_city, {end_city: 0})
+
+    def duration_table(self, end_city: City, day_of_week: DayOfWeek) -> dict:
+        """Map of City to a lower bound in minutes on the travel time from it to end_city."""
+        tables = self.__min_duration[day_of_week]
+        if end_city not in tables:
+            tables[end_city] = self.__durations_to(self.__reverse_edges[day_of_week], end_city)
+        return tables[end_city]
+
+    def latest_departure_table(self, end_city: City, day_of_week: DayOfWeek) -> dict:
+        """
+        Map of City to the latest departure from it on day_of_week that can still reach
+        end_city that day (layover limits and the leg limit are ignored): a journey arriving
+        in a city at or after that time can't get to end_city. Missing = unreachable.
+        """
+        tables = self.__latest_departure[day_of_week]
+        if end_city not in tables:
+            tables[end_city] = self.__latest_departures_to(self.__arrivals[day_of_week], end_city)
+        return tables[end_city]
+
+    def min_legs(self, city: City, end_city: City, day_of_week: DayOfWeek) -> Optional[int]:
+        return self.legs_table(end_city, day_of_week).get(city)
+
+    def min_duration(self, city: City, end_city: City, day_of_week: DayOfWeek) -> Optional[int]:
+        return self.duration_table(end_city, day_of_week).get(city)
+
+
+def within_reach(min_legs: Optional[dict], city: City, legs_used: int, max_legs: int) -> bool:
+    """
+    True if a journey at `city` (not its destination) that already used `legs_used` legs can
+    still reach the destination within `max_legs`, according to the `min_legs` table.
+    Without a table only the leg limit itself is checked.
+    """
+    if min_legs is None:
+        return legs_used < max_legs
+    legs_needed = min_legs.get(city)
+    return legs_needed is not None and legs_used + legs_needed <= max_legs
+
+
+def within_time(latest_departures: Optional[dict], city: City, arrival_minutes: int) -> bool:
+    """
+    True if a journey arriving in `city` (not its destination) at `arrival_minutes` can still
+    take a departure that reaches the destination, according to the `latest_departures`
+    table. Without a table nothing is ruled out.
+    """
+    if latest_departures is None:
+        return True
+    latest = latest_departures.get(city)
+    return latest is not None and arrival_minutes < latest
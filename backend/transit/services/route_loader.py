@@ -1,24 +1,54 @@
 import csv
+import os
 from transit.models.Connection import Connection
+from .network_snapshot import StaleSnapshotError, default_snapshot_path, load_snapshot
+
+# columns of the rail network CSV, in file order
+CSV_COLUMNS = (
+    'Route ID',
+    'Departure City',
+    'Arrival City',
+    'Departure Time',
+    'Arrival Time',
+    'Train Type',
+    'Days of Operation',
+    'First Class ticket rate (in euro)',
+    'Second Class ticket rate (in euro)',
+)
+
+
+def connection_from_row(row: dict) -> Connection:
+    # `row` maps the CSV_COLUMNS to their raw values, as csv.DictReader returns them
+    return Connection(
+        route_id=row['Route ID'],
+        departure_city=row['Departure City'],
+        arrival_city=row['Arrival City'],
+        departure_time=row['Departure Time'],
+        arrival_time=row['Arrival Time'],
+        days_of_operation=row['Days of Operation'],
+        train_type=row['Train Type'],
+        first_class_price=row['First Class ticket rate (in euro)'],
+        second_class_price=row['Second Class ticket rate (in euro)']
+    )
+
 
 def read_csv(rail_network_csv_path: str):
     with open(rail_network_csv_path, mode='r', encoding='utf-8') as file:
         csv_reader = csv.DictReader(file)
         list_connections = []
         for row in csv_reader:
-            
-            connection = Connection(
-                route_id=row['Route ID'],
-                departure_city=row['Departure City'],
-                arrival_city=row['Arrival City'],
-                departure_time=row['Departure Time'],
-                arrival_time=row['Arrival Time'],
-                days_of_operation=row['Days of Operation'],
-                train_type=row['Train Type'],
-                first_class_price=row['First Class ticket rate (in euro)'],
-                second_class_price=row['Second Class ticket rate (in euro)']
-            )
-            
-            list_connections.append(connection)
+            list_connections.append(connection_from_row(row))
         return list_connections
 
+
+def load_connections(rail_network_csv_path: str, snapshot_path: str = None):
+    # use the compiled snapshot of the CSV when there is an up to date one,
+    # otherwise parse the CSV itself
+    snapshot_path = snapshot_path or default_snapshot_path(rail_network_csv_path)
+    if os.path.exists(snapshot_path):
+        try:
+            return load_snapshot(snapshot_path, rail_network_csv_path)
+        except (StaleSnapshotError, OSError, ValueError) as e:
+            print(f"Ignoring network snapshot {snapshot_path}: {e}")
+    
+    return read_csv(rail_network_csv_path)
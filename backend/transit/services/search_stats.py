@@ -0,0 +1,177 @@
+import heapq
+import itertools
+from bisect import bisect_left
+from collections import deque
+from threading import Lock
+from typing import Optional
+
+# opt-in instrumentation of the searches run by StationNetworkManager
+# when enabled, every search that isn't answered from the result cache records how long
+# it took, how many trips it found and the counters its engine keeps, e.g. for the DFS:
+#   pushed            stack entries pushed (partial paths extended by one connection)
+#   pruned            branches dropped because the reachability index says they can't
+#                     reach the destination within the remaining legs or in time, or
+#                     because they arrive after the search's arrive_by
+#   layover_rejected  later departures skipped because they leave after the layover window
+#   leg_limit         partial paths that stopped at the leg limit without reaching the destination
+# the connection scan ("csa") and the Pareto search ("pareto") count the same work:
+#   pushed            partial journeys extended by one connection
+#   pruned            partial journeys dropped by the reachability bounds or arrive_by
+#   scanned           (csa) connections looked at in the sweep
+#   waiting           (csa) partial journeys kept waiting for a connection
+#   dominated         (pareto) partial journeys dropped because another one is better on
+#                     duration, price and transfers
+# the records are aggregated per engine into counter totals and a latency histogram with
+# fixed bucket bounds (LATENCY_BUCKETS_MS). The last RECENT_QUERIES records and the
+# SLOWEST_QUERIES slowest ones since the last reset are kept, so a slow query can be
+# looked at on its own.
+# when disabled, a search checks `enabled` once and records nothing.
+
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+RECENT_QUERIES = 100
+SLOWEST_QUERIES = 20
+
+
+class LatencyHistogram:
+    """Counts of latencies per LATENCY_BUCKETS_MS bucket, plus one bucket above the last bound."""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, milliseconds: float):
+        self.counts[bisect_left(LATENCY_BUCKETS_MS, milliseconds)] += 1
+        self.count += 1
+        self.total_ms += milliseconds
+        self.max_ms = max(self.max_ms, milliseconds)
+
+    def percentile(self, fraction: float) -> float:
+        # upper bound of the bucket holding the percentile (the maximum for the last bucket)
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": self.total_ms / self.count if self.count else 0.0,
+            "max_ms": self.max_ms,
+            "p50_ms": self.percentile(0.5),
+            "p90_ms": self.percentile(0.9),
+            "p99_ms": self.percentile(0.99),
+            "buckets": [
+                {"le_ms": bound, "count": count}
+                for bound, count in zip(LATENCY_BUCKETS_MS + (None,), self.counts)
+            ],
+        }
+
+
+class SearchStats:
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.__lock = Lock()
+        self.reset()
+
+    def reset(self):
+        with self.__lock:
+            self.__engines = {}  # key: engine name, value: dict of searches, cache_hits, counters, latency
+            self.__recent = deque(maxlen=RECENT_QUERIES)
+            self.__slowest = []  # min-heap of (ms, sequence number, record)
+            self.__sequence = itertools.count()
+
+    def __engine(self, engine: str) -> dict:
+        if engine not in self.__engines:
+            self.__engines[engine] = {"searches": 0, "cache_hits": 0, "counters": {}, "latency": LatencyHistogram()}
+        return self.__engines[engine]
+
+    def record(self, engine: str, query: tuple, seconds: float, trips: int, counters: Optional[dict] = None):
+        """
+        Records one search of `engine` for query (start City, end City, DayOfWeek), end City
+        None for one-to-all searches.
+        """
+        milliseconds = seconds * 1000
+        counters = counters or {}
+        with self.__lock:
+            stats = self.__engine(engine)
+            stats["searches"] += 1
+            stats["latency"].add(milliseconds)
+            totals = stats["counters"]
+            for name, value in counters.items():
+                totals[name] = totals.get(name, 0) + value
+            record = {
+                "engine": engine,
+                "from": query[0].value,
+                "to": query[1].value if query[1] is not None else "*",
+                "day": query[2].name,
+                "ms": milliseconds,
+                "trips": trips,
+                **counters,
+            }
+            self.__recent.append(record)
+            entry = (milliseconds, next(self.__sequence), record)
+            if len(self.__slowest) < SLOWEST_QUERIES:
+                heapq.heappush(self.__slowest, entry)
+            elif milliseconds > self.__slowest[0][0]:
+                heapq.heapreplace(self.__slowest, entry)
+
+    def record_cache_hit(self, engine: str):
+        with self.__lock:
+            self.__engine(engine)["cache_hits"] += 1
+
+    def snapshot(self) -> dict:
+        """JSON serializable copy of the statistics, recent queries last, slowest queries first."""
+        with self.__lock:
+            return {
+                "enabled": self.enabled,
+                "engines": {
+                    engine: {
+                        "searches": stats["searches"],
+                        "cache_hits": stats["cache_hits"],
+                        "counters": dict(stats["counters"]),
+                        "latency": stats["latency"].to_dict(),
+                    }
+                    for engine, stats in self.__engines.items()
+                },
+                "recent": list(self.__recent),
+                "slowest": [record for _, _, record in sorted(self.__slowest, reverse=True)],
+            }
+
+
+def format_snapshot(snapshot: dict, slowest: int = 10) -> str:
+    # plain text report of a SearchStats snapshot, with its `slowest` slowest queries
+    lines = [f"search instrumentation {'on' if snapshot['enabled'] else 'off'}"]
+    for engine, stats in snapshot["engines"].items():
+        latency = stats["latency"]
+        lines.append(
+            f"{engine}: {stats['searches']} searches, {stats['cache_hits']} cache hits, "
+            f"mean {latency['mean_ms']:.2f} ms, p50 <= {latency['p50_ms']:g} ms, "
+            f"p90 <= {latency['p90_ms']:g} ms, p99 <= {latency['p99_ms']:g} ms, max {latency['max_ms']:.2f} ms"
+        )
+        for name, value in sorted(stats["counters"].items()):
+            lines.append(f"  {name:<18}{value:>12}")
+        for bucket in latency["buckets"]:
+            if bucket["count"]:
+                bound = f"<= {bucket['le_ms']:g} ms" if bucket["le_ms"] is not None else "slower"
+                lines.append(f"  {bound:<18}{bucket['count']:>12}")
+
+    if snapshot["slowest"]:
+        lines.append("slowest queries:")
+    for query in snapshot["slowest"][:slowest]:
+        counters = ", ".join(
+            f"{name} {value}" for name, value in query.items()
+            if name not in ("engine", "from", "to", "day", "ms", "trips")
+        )
+        lines.append(
+            f"  {query['engine']:<11}{query['from']} -> {query['to']} ({query['day']}): "
+            f"{query['ms']:.2f} ms, {query['trips']} trips" + (f", {counters}" if counters else "")
+        )
+    return "\n".join(lines)
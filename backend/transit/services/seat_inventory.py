@@ -0,0 +1,167 @@
+import time
+from collections import OrderedDict
+from datetime import date
+from threading import Lock
+from typing import Iterable, Iterator, Optional
+from django.db import transaction
+from django.db.models import F
+from transit.models.SeatInventory import SeatInventory, FIRST_CLASS, SECOND_CLASS
+from transit.models.Ticket import TripOption
+
+# seat inventory per (route_id, travel_date, seat_class)
+# reserving seats is one conditional UPDATE for all legs of a trip:
+#     UPDATE ... SET seats_sold = seats_sold + n WHERE ... AND seats_sold <= capacity - n
+# the database applies it atomically, so concurrent bookings can't oversell a connection,
+# and it works the same on SQLite (which has no row locks) as on other databases.
+# if fewer rows than legs were updated one leg is sold out and the transaction is rolled back.
+#
+# SEAT_AVAILABILITY caches the seats left per date in memory, loaded with one query per
+# date, so searches can drop sold out trips without a query per candidate. Reservations
+# made by this process update it when they commit, the others show up within AVAILABILITY_TTL.
+# it keeps the MAX_CACHED_DATES most recently used dates, expired ones are dropped whenever
+# a date is loaded. A date's map is never changed once returned: a reservation replaces it.
+# async callers load the seats left of the date with seats_left_on in a thread-sensitive
+# call (the request's database connection) and pass them to available_trips, which then
+# filters without querying from the worker thread the search runs in.
+
+SEAT_CLASSES = (FIRST_CLASS, SECOND_CLASS)
+DEFAULT_CAPACITY = {FIRST_CLASS: 60, SECOND_CLASS: 240}  # seats per connection, per date
+AVAILABILITY_TTL = 30  # seconds
+MAX_CACHED_DATES = 64
+
+
+class SoldOutError(ValueError):
+    """Not enough seats left on one of the connections."""
+
+
+def reserve_seats(route_ids: Iterable[str], travel_date: date, seat_class: str, seats: int):
+    """
+    Takes `seats` seats of `seat_class` on every connection in `route_ids` on `travel_date`,
+    or none of them. Raises SoldOutError if one of the connections doesn't have enough left.
+    """
+    if seat_class not in SEAT_CLASSES:
+        raise ValueError(f"Unknown seat class '{seat_class}', expected one of {SEAT_CLASSES}.")
+    route_ids = list(dict.fromkeys(route_ids))
+
+    # joins the caller's transaction if there is one, so a sold out leg undoes the others
+    with transaction.atomic(savepoint=False):
+        # the first booking of a connection on a date creates its row
+        SeatInventory.objects.bulk_create(
+            [
+                SeatInventory(route_id=route_id, travel_date=travel_date, seat_class=seat_class,
+                              capacity=DEFAULT_CAPACITY[seat_class])
+                for route_id in route_ids
+            ],
+            ignore_conflicts=True,
+        )
+
+        reserved = SeatInventory.objects.filter(
+            route_id__in=route_ids,
+            travel_date=travel_date,
+            seat_class=seat_class,
+            seats_sold__lte=F('capacity') - seats,
+        ).update(seats_sold=F('seats_sold') + seats)
+
+        if reserved != len(route_ids):
+            sold_out = SeatInventory.objects.filter(
+                route_id__in=route_ids,
+                travel_date=travel_date,
+                seat_class=seat_class,
+                seats_sold__gt=F('capacity') - seats,
+            ).values_list('route_id', flat=True)
+            raise SoldOutError(
+                f"Error: Not enough {seat_class} class seats left on {', '.join(sold_out)} on {travel_date}."
+            )
+
+    transaction.on_commit(lambda: SEAT_AVAILABILITY.record_reservation(route_ids, travel_date, seat_class, seats))
+
+
+class SeatAvailabilityCache:
+
+    def __init__(self, ttl: float = AVAILABILITY_TTL, max_dates: int = MAX_CACHED_DATES):
+        self.ttl = ttl
+        self.max_dates = max_dates
+        self.__lock = Lock()
+        self.__by_date = OrderedDict()  # key: date, value: (loaded_at, map of (route_id, seat_class) to seats left)
+
+    def seats_left_on(self, travel_date: date) -> dict:
+        """
+        Map of (route_id, seat_class) to seats left on travel_date, for the connections with
+        bookings. The map is shared, callers must not change it.
+        """
+        with self.__lock:
+            entry = self.__by_date.get(travel_date)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self.__by_date.move_to_end(travel_date)
+                return entry[1]
+
+        # only connections with bookings have a row, the others have their full capacity
+        seats_left = {
+            (route_id, seat_class): capacity - seats_sold
+            for route_id, seat_class, capacity, seats_sold in SeatInventory.objects.filter(
+                travel_date=travel_date
+            ).values_list('route_id', 'seat_class', 'capacity', 'seats_sold')
+        }
+        with self.__lock:
+            now = time.monotonic()
+            for expired in [day for day, (loaded_at, _) in self.__by_date.items() if now - loaded_at >= self.ttl]:
+                del self.__by_date[expired]
+            self.__by_date[travel_date] = (now, seats_left)
+            self.__by_date.move_to_end(travel_date)
+            while len(self.__by_date) > self.max_dates:
+                self.__by_date.popitem(last=False)
+        return seats_left
+
+    def cached_dates(self) -> list[date]:
+        """The dates held, least recently used first."""
+        with self.__lock:
+            return list(self.__by_date)
+
+    def seats_left(self, route_id: str, travel_date: date, seat_class: str = SECOND_CLASS) -> int:
+        return self.seats_left_on(travel_date).get((route_id, seat_class), DEFAULT_CAPACITY[seat_class])
+
+    def has_seats(self, trip: TripOption, travel_date: date, seats: int = 1, seat_class: str = SECOND_CLASS,
+                  seats_left: Optional[dict] = None) -> bool:
+        """
+        True if every connection of `trip` has `seats` seats of `seat_class` left on travel_date,
+        according to `seats_left` (see seats_left_on) when given.
+        """
+        if seats_left is None:
+            seats_left = self.seats_left_on(travel_date)
+        capacity = DEFAULT_CAPACITY[seat_class]
+        return all(
+            seats_left.get((connection.route_id, seat_class), capacity) >= seats
+            for connection in trip.connections
+        )
+
+    def available_trips(
+        self, trips: Iterable[TripOption], travel_date: date, seats: int = 1, seat_class: str = SECOND_CLASS,
+        seats_left: Optional[dict] = None,
+    ) -> Iterator[TripOption]:
+        """
+        The trips of `trips` that still have the seats, lazily (the order is kept).
+        With `seats_left` (see seats_left_on) no query is made while iterating.
+        """
+        return (trip for trip in trips if self.has_seats(trip, travel_date, seats, seat_class, seats_left))
+
+    def record_reservation(self, route_ids: Iterable[str], travel_date: date, seat_class: str, seats: int):
+        with self.__lock:
+            entry = self.__by_date.get(travel_date)
+            if entry is None:
+                return
+            # a new map, callers may still be reading the one seats_left_on returned
+            loaded_at, seats_left = entry[0], dict(entry[1])
+            for route_id in route_ids:
+                key = (route_id, seat_class)
+                seats_left[key] = seats_left.get(key, DEFAULT_CAPACITY[seat_class]) - seats
+            self.__by_date[travel_date] = (loaded_at, seats_left)
+
+    def invalidate(self, travel_date: Optional[date] = None):
+        with self.__lock:
+            if travel_date is None:
+                self.__by_date.clear()
+            else:
+                self.__by_date.pop(travel_date, None)
+
+
+SEAT_AVAILABILITY = SeatAvailabilityCache()
@@ -1,6 +1,23 @@
 # graph class
-from .route_loader import read_csv
-from transit.models.Station import Station
+import gc
+import heapq
+import os
+import threading
+import time
+from itertools import islice
+from typing import Callable, Iterator, Optional
+from .route_loader import load_connections
+from .rail_network import RailNetwork, NetworkDiff
+from .layover_policy import MAX_LEGS, MINUTES_PER_DAY, max_layover_minutes
+from .pareto_search import pareto_search
+from .best_first_search import iter_best_first
+from .destination_search import DestinationTable, destination_search
+from .search_cache import SearchCache, DEFAULT_CACHE_SIZE
+from .reachability import ReachabilityIndex, within_reach, within_time
+from .connection_table import ConnectionTable, filter_connections
+from .batch_search import batch_search
+from .search_stats import SearchStats
+from .time_window import ANY_TIME, TimeWindow
 
 from transit.constants import City, DayOfWeek
 from transit.models.Connection import Connection
@@ -8,6 +25,39 @@ from transit.models.Ticket import TripOption
 
 # implemented the singleton pattern to ensure only one instance of the station network manager exists
 # this class loads the railway network from a CSV file and builds the graph representation
+# searches go through find_trips and iter_trips, which dispatch to the routing engine selected
+# for this instance (the app reads it from settings.ROUTING_ENGINE):
+#   "best_first" - best-first search over the station graph, trips streamed fastest first
+#   "dfs"        - exhaustive depth-first search over the station graph (dfs_all_paths)
+#   "csa"        - connection scan over the time-sorted connection array (ConnectionScanEngine)
+# every search takes an optional TimeWindow (depart_after, depart_before, arrive_by, see
+# time_window.py) that the engines apply while walking the departures
+# search results are kept in an LRU cache keyed on (origin, destination, DayOfWeek, options);
+# every (re)load of the network bumps network_version, which invalidates the cached results
+# a ReachabilityIndex (minimum legs between cities per day) is rebuilt on every load and
+# used by the searches to drop branches that can't reach the destination in time
+# destinations() answers one-to-all queries (every city reachable from an origin) in one sweep
+# every search takes max_legs (MAX_LEGS by default); beyond 3 legs the number of partial
+# paths grows quickly, and the lower bounds of the ReachabilityIndex (legs and travel time
+# left, latest useful departure per city) keep the searches to the branches that can still
+# reach the destination
+# when NumPy is installed a columnar ConnectionTable of the timetable is built too, for
+# vectorized filtering (filter_connections falls back to plain Python without it)
+# the loaded network is an immutable RailNetwork (see rail_network.py): reload_network applies
+# only the routes that changed to a new version and swaps it in, searches already running
+# finish on the version they started with. watch_network_file reloads when the file changes
+# search_stats (see search_stats.py) records per-query counters and latencies per engine
+# once enabled with enable_instrumentation; it is off by default and then costs one check
+# per search
+# servers that import the app once and fork their workers from it call preload() before
+# forking, so all workers read the parent's copy of the network instead of loading their own
+
+ROUTING_ENGINES = ("best_first", "dfs", "csa")
+
+# order of the trips of iter_trips, that iter_best_first produces them in
+def fastest_first(trip: TripOption):
+    return (trip.total_travel_duration, trip.num_connections)
+
 
 class StationNetworkManager:
     
@@ -18,25 +68,47 @@ class StationNetworkManager:
             cls._instance = super(StationNetworkManager, cls).__new__(cls)
         return cls._instance
     
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, routing_engine: str = "dfs", cache_size: int = DEFAULT_CACHE_SIZE):
         if hasattr(self, '_initialized') and self._initialized:
             return
         
-        self.__connections = []  # list of all connections
-        self.__stations = {}  # key: City, value: Station
+        self.file_path = file_path
+        self.__network = RailNetwork([], 0)  # current version of the network, replaced as a whole on reload
+        self.__reload_lock = threading.Lock()
+        self.__watcher = None
+        self.__stop_watching = threading.Event()
+        self.search_stats = SearchStats()
+        self.__search_cache = SearchCache(cache_size)
+        self.set_routing_engine(routing_engine)
         self.__load_network(file_path)
         self._initialized = True
         
     
     def getStation(self, city: City):
-        return self.__stations.get(city)
+        return self.__network.get_station(city)
+    
+    def get_connection(self, route_id: str) -> Optional[Connection]:
+        return self.__network.get_connection(route_id)
+    
+    # the network version searches started now will use
+    def get_network(self) -> RailNetwork:
+        return self.__network
+    
+    @property
+    def network_version(self) -> int:
+        return self.__network.version
+    
+    def set_routing_engine(self, routing_engine: str):
+        if routing_engine not in ROUTING_ENGINES:
+            raise ValueError(f"Unknown routing engine '{routing_engine}', expected one of {ROUTING_ENGINES}.")
+        self.routing_engine = routing_engine
     
     def __load_connections(self,file_path: str):
-        # parse CSV here and populate `connections` list
+        # parse CSV (or its compiled snapshot) here and populate `connections` list
         
         try:
             print(f"Loading connections from {file_path}...")
-            connections = read_csv(file_path)
+            connections = load_connections(file_path)
             print(f"Loaded {len(connections)} connections.")
             
             return connections
@@ -45,25 +117,357 @@ class StationNetworkManager:
             return []
     
     def __load_network(self,file_path: str):
-        self.__connections = self.__load_connections(file_path)
-        
-        for connection in self.__connections:
-            # create station if not exists
-            if connection.departure_city not in self.__stations:
-                self.__stations[connection.departure_city] = Station(connection.departure_city)
-            
-            # add connection to station
-            station = self.__stations[connection.departure_city]
-            station.add_connection(connection)
+        network = RailNetwork(self.__load_connections(file_path), self.__network.version + 1)
+        network.warm()
+        self.__network = network
+        self.__search_cache.clear()
+    
+    # re-reads the network file (file_path, or the file loaded before) and applies only the
+    # routes that were added, removed or changed, matched by Route ID
+    # the new version replaces the current one in a single assignment; nothing is swapped
+    # when the file can't be read (the error is raised) or nothing changed
+    # Returns the NetworkDiff that was applied
+    def reload_network(self, file_path: Optional[str] = None) -> NetworkDiff:
+        with self.__reload_lock:
+            file_path = file_path or self.file_path
+            current = self.__network
+            network, diff = current.apply(load_connections(file_path), current.version + 1)
+            self.file_path = file_path
             
+            if diff:
+                self.__network = network
+                # cached results are keyed on the old version already, this just frees them
+                self.__search_cache.clear()
+                print(f"Reloaded {file_path}: {len(diff.added)} added, {len(diff.removed)} removed, "
+                      f"{len(diff.changed)} changed route(s).")
+            return diff
+    
+    # starts a background thread checking the network file every `interval` seconds and
+    # calling reload_network when its modification time or size changed
+    def watch_network_file(self, interval: float = 2.0):
+        if self.__watcher is not None and self.__watcher.is_alive():
+            return
+        self.__stop_watching.clear()
+        self.__watcher = threading.Thread(
+            target=self.__watch, args=(self.file_path, interval), name="network-file-watcher", daemon=True
+        )
+        self.__watcher.start()
+    
+    def stop_watching(self):
+        self.__stop_watching.set()
+        if self.__watcher is not None:
+            self.__watcher.join()
+            self.__watcher = None
+    
+    @staticmethod
+    def __file_signature(file_path: str):
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+    
+    def __watch(self, file_path: str, interval: float):
+        signature = self.__file_signature(file_path)
+        while not self.__stop_watching.wait(interval):
+            current = self.__file_signature(file_path)
+            if current is None or current == signature:
+                continue
+            signature = current
+            try:
+                self.reload_network(file_path)
+            except Exception as e:
+                # keep serving the previous version, a later save of the file will be retried
+                print(f"Error reloading {file_path}: {e}")
+    
+    # for servers that load the app in a parent process and fork the workers from it
+    # (e.g. gunicorn --preload): builds what the searches would otherwise build lazily in
+    # each worker, then moves every object allocated so far into the permanent GC generation
+    # (gc.freeze). The workers' garbage collections then never write to the inherited
+    # objects, so their pages stay shared copy-on-write instead of being copied into
+    # every worker. A network loaded later by reload_network is private to each worker.
+    def preload(self):
+        self.__network.warm()
+        gc.collect()
+        gc.freeze()
+    
+    def get_reachability(self) -> ReachabilityIndex:
+        return self.__network.reachability
+    
+    # columnar NumPy view of the timetable, None when NumPy isn't installed
+    def get_connection_table(self) -> Optional[ConnectionTable]:
+        return self.__network.connection_table
+    
+    # connections matching every given criterion (origin, destination, day_of_week,
+    # depart_after / depart_before window, train_types, max_price), in timetable order
+    def filter_connections(self, **criteria) -> list[Connection]:
+        network = self.__network
+        if network.connection_table is not None:
+            return network.connection_table.select(**criteria)
+        return filter_connections(network.connections, **criteria)
+    
+    # starts (or stops) recording search_stats, the statistics recorded so far are kept
+    def enable_instrumentation(self, enabled: bool = True):
+        self.search_stats.enabled = enabled
+    
+    # hit/miss/eviction counters and size of the search result cache
+    def cache_info(self) -> dict:
+        return self.__search_cache.info()
+    
+    def clear_search_cache(self):
+        self.__search_cache.clear()
+    
+    # runs search(counters) for query (start_city, end_city, day_of_week), recording it in
+    # search_stats under `engine` when instrumentation is on (counters is None when it's off)
+    def __measured(self, engine: str, query: tuple, search: Callable[[Optional[dict]], list]) -> list:
+        stats = self.search_stats
+        if not stats.enabled:
+            return search(None)
+        counters = {}
+        started = time.perf_counter()
+        trips = search(counters)
+        stats.record(engine, query, time.perf_counter() - started, len(trips), counters)
+        return trips
+    
+    # returns the cached result of `search`, running it on a miss
+    # the key includes the network version the search started on, so a result computed
+    # while the network is being reloaded is never served for the new network
+    # keys end with the query (start_city, end_city, day_of_week)
+    def __cached(self, network: RailNetwork, engine: str, key: tuple, search: Callable[[Optional[dict]], list]) -> list:
+        trips = self.__search_cache.get((network.version,) + key)
+        if trips is None:
+            trips = tuple(self.__measured(engine, key[-3:], search))
+            self.__search_cache.put((network.version,) + key, trips)
+        elif self.search_stats.enabled:
+            self.search_stats.record_cache_hit(engine)
+        return list(trips)
+    
+    # lower bounds the searches to end_city on day_of_week prune with, as engine arguments:
+    # fewest legs and latest useful departure per city, and the shortest travel time left
+    # when the window has an arrive_by (or `durations` is set)
+    @staticmethod
+    def __bounds(network: RailNetwork, end_city: City, day_of_week: DayOfWeek, window: TimeWindow,
+                 durations: bool = False) -> dict:
+        reachability = network.reachability
+        return {
+            "min_legs": reachability.legs_table(end_city, day_of_week),
+            "latest_departures": reachability.latest_departure_table(end_city, day_of_week),
+            "min_durations": (
+                reachability.duration_table(end_city, day_of_week)
+                if durations or window.arrive_by is not None else None
+            ),
+        }
+    
+    # finds all trips from start_city to end_city using the routing engine of this instance
+    # leaving and arriving within `window` (any time of the day by default), with at most max_legs legs
+    # Returns a list of TripOption objects
+    def find_trips(
+        self,
+        start_city: City,
+        end_city: City,
+        day_of_week: DayOfWeek,
+        window: TimeWindow = ANY_TIME,
+        max_legs: int = MAX_LEGS,
+    ):
+        if self.routing_engine == "best_first":
+            return list(self.__iter_best_first_cached(start_city, end_city, day_of_week, window, max_legs))
+        network = self.__network
+        bounds = lambda: self.__bounds(network, end_city, day_of_week, window)
+        if self.routing_engine == "csa":
+            search = lambda counters: network.connection_scan.search(
+                start_city, end_city, day_of_week, max_legs=max_legs, window=window, counters=counters, **bounds()
+            )
+        else:
+            search = lambda counters: self.__dfs_all_paths(
+                network.get_station, start_city, end_city, day_of_week, counters, window, max_legs, **bounds()
+            )
+        return self.__cached(
+            network,
+            self.routing_engine,
+            ("find", self.routing_engine, window.key, max_legs, start_city, end_city, day_of_week),
+            search,
+        )
+    
+    # runs find_trips (or pareto_trips) for many (start_city, end_city, day_of_week) queries
+    # on a pool of `workers` processes that share this network, see batch_search.py
+    # Returns one list of TripOption objects per query, in the order of `queries`
+    def batch_search(self, queries, workers: Optional[int] = None, search: str = "find_trips"):
+        return batch_search(self, queries, workers=workers, search=search)
+    
+    # finds only the trips from start_city to end_city that are not dominated on
+    # (travel duration, second class price, number of transfers), within `window`
+    # Returns a list of TripOption objects
+    def pareto_trips(
+        self,
+        start_city: City,
+        end_city: City,
+        day_of_week: DayOfWeek,
+        window: TimeWindow = ANY_TIME,
+        max_legs: int = MAX_LEGS,
+    ):
+        network = self.__network
+        return self.__cached(
+            network,
+            "pareto",
+            ("pareto", window.key, max_legs, start_city, end_city, day_of_week),
+            lambda counters: pareto_search(
+                network.get_station, start_city, end_city, day_of_week, max_legs=max_legs, window=window,
+                counters=counters, **self.__bounds(network, end_city, day_of_week, window),
+            ),
+        )
+    
+    # one-to-all search: the earliest arrival, fastest trip and cheapest trip from start_city
+    # to every city reachable on day_of_week, in one sweep over the day's timetable instead
+    # of one search per destination (see destination_search.py)
+    # trips to a destination are only built when asked for, with DestinationTable.trip
+    # recorded in search_stats (engine "destinations", trips = destinations found)
+    # Returns a DestinationTable
+    def destinations(
+        self,
+        start_city: City,
+        day_of_week: DayOfWeek,
+        window: TimeWindow = ANY_TIME,
+        max_legs: int = MAX_LEGS,
+    ) -> DestinationTable:
+        network = self.__network
+        key = (network.version, "destinations", window.key, max_legs, start_city, day_of_week)
+        table = self.__search_cache.get(key)
+        if table is None:
+            station = network.get_station(start_city)
+            first_legs = window.first_departures(station, day_of_week) if station is not None else []
+            table = self.__measured(
+                "destinations",
+                (start_city, None, day_of_week),
+                lambda counters: destination_search(
+                    network.connection_scan.connections_on(day_of_week), first_legs, start_city, day_of_week,
+                    max_legs=max_legs, window=window, counters=counters,
+                ),
+            )
+            self.__search_cache.put(key, table)
+        elif self.search_stats.enabled:
+            self.search_stats.record_cache_hit("destinations")
+        return table
+    
+    # yields trips from start_city to end_city best first, stopping after `limit` trips
+    # by default trips are ordered by (total_travel_duration, num_connections) (fastest_first);
+    # the "best_first" engine produces them lazily, so the caller can show the first one
+    # before the search finishes, the other engines find all trips with find_trips and
+    # order them. A custom `key` has no such lower bound, so all trips are found and then ordered
+    # only trips within `window` and with at most max_legs legs are searched for
+    def iter_trips(
+        self,
+        start_city: City,
+        end_city: City,
+        day_of_week: DayOfWeek,
+        key: Optional[Callable[[TripOption], object]] = None,
+        limit: Optional[int] = None,
+        window: TimeWindow = ANY_TIME,
+        max_legs: int = MAX_LEGS,
+    ) -> Iterator[TripOption]:
+        if key is None and self.routing_engine == "best_first":
+            trips = self.__iter_best_first_cached(start_city, end_city, day_of_week, window, max_legs)
+        else:
+            key = key or fastest_first
+            trips = self.find_trips(start_city, end_city, day_of_week, window, max_legs)
+            trips = iter(heapq.nsmallest(limit, trips, key=key) if limit is not None else sorted(trips, key=key))
+        return islice(trips, limit)
+    
+    # streams the best-first search, or replays it from the cache once it was run to the end
+    # the travel time left from each city (duration_table) orders the partial paths, A* style
+    def __iter_best_first_cached(
+        self, start_city: City, end_city: City, day_of_week: DayOfWeek, window: TimeWindow, max_legs: int
+    ):
+        network = self.__network
+        key = (network.version, "best_first", window.key, max_legs, start_city, end_city, day_of_week)
+        stats = self.search_stats
+        cached = self.__search_cache.get(key)
+        if cached is not None:
+            if stats.enabled:
+                stats.record_cache_hit("best_first")
+            yield from cached
+            return
+        
+        trips = []
+        search = iter_best_first(
+            network.get_station, start_city, end_city, day_of_week, max_legs=max_legs, window=window,
+            **self.__bounds(network, end_city, day_of_week, window, durations=True),
+        )
+        if not stats.enabled:
+            for trip in search:
+                trips.append(trip)
+                yield trip
+            self.__search_cache.put(key, tuple(trips))
+            return
+        
+        # only the time spent searching is measured, not the time the caller takes between trips
+        # a search the caller stops early is recorded with abandoned = 1
+        elapsed = 0.0
+        finished = False
+        try:
+            while True:
+                started = time.perf_counter()
+                trip = next(search, None)
+                elapsed += time.perf_counter() - started
+                if trip is None:
+                    break
+                trips.append(trip)
+                yield trip
+            finished = True
+            self.__search_cache.put(key, tuple(trips))
+        finally:
+            stats.record(
+                "best_first", (start_city, end_city, day_of_week), elapsed, len(trips), {"abandoned": int(not finished)}
+            )
         
 
-    # finds all paths from start_city to end_city with max 2 connections (3 legs)
+    # finds all paths from start_city to end_city with at most max_legs legs (3 by default)
     # using depth-first search (DFS)
+    # with prune=True, branches that the reachability index says can't reach end_city
+    # within the remaining legs, or in time, are not pushed
+    # only trips within `window` are followed (the time constraints always prune)
+    # recorded in search_stats (engine "dfs") when instrumentation is on
     # Returns a list of TripOption objects
-    def dfs_all_paths(self, start_city : City, end_city :City, day_of_week : DayOfWeek):
-        
+    def dfs_all_paths(
+        self,
+        start_city : City,
+        end_city :City,
+        day_of_week : DayOfWeek,
+        prune: bool = False,
+        window: TimeWindow = ANY_TIME,
+        max_legs: int = MAX_LEGS,
+    ):
+        bounds = self.__bounds(self.__network, end_city, day_of_week, window) if prune else {}
+        return self.__measured(
+            "dfs",
+            (start_city, end_city, day_of_week),
+            lambda counters: self.__dfs_all_paths(
+                self.getStation, start_city, end_city, day_of_week, counters, window, max_legs, **bounds
+            ),
+        )
+    
+    # dfs_all_paths over the stations returned by get_station, pruned with the ReachabilityIndex
+    # tables given (see __bounds), the leg limit and the window only without them
+    # the counters described in search_stats.py are added to `counters` unless it is None
+    def __dfs_all_paths(
+        self,
+        get_station: Callable,
+        start_city: City,
+        end_city: City,
+        day_of_week: DayOfWeek,
+        counters: Optional[dict] = None,
+        window: TimeWindow = ANY_TIME,
+        max_legs: int = MAX_LEGS,
+        min_legs: Optional[dict] = None,
+        latest_departures: Optional[dict] = None,
+        min_durations: Optional[dict] = None,
+    ):
         all_paths = [] # list of lists of connections
+        if start_city == end_city:
+            return all_paths
+        pushed = 0
+        pruned = 0
+        layover_rejected = 0
+        leg_limit = 0
         
         stack = [(start_city, [])]  # (current_city, path_so_far, visited_cities)
         
@@ -71,46 +475,60 @@ class StationNetworkManager:
             
             current_city, path_so_far = stack.pop()
             
-            if current_city == end_city and len(path_so_far) <= 3:
+            if current_city == end_city and len(path_so_far) <= max_legs:
                 all_paths.append(TripOption(path_so_far))
                 continue
             
-            current_station = self.getStation(current_city)
+            current_station = get_station(current_city)
             
             # start_city - connection - stop - connection - stop - connection - end_City
             # limit to max 2 stops (3 connections)
-            if len(path_so_far) >= 3 or current_station.outgoing_connections.get(day_of_week) is None:
+            if len(path_so_far) >= max_legs:
+                leg_limit += 1
+                continue
+            if current_station is None:
                 continue
             
-            # explore all neighbouring connections
-            for next_city, connections in current_station.outgoing_connections.get(day_of_week).items():
-                for connection in connections:
-                    if connection not in path_so_far:  # avoid cycles
-                        # ensure chronological order, passenger can make it to the next connection
-                        if path_so_far:
-                            prev_conn = path_so_far[-1]
-                            if connection.departure_time > prev_conn.arrival_time:
-                                # Check layover policy
-                                layover_duration = connection.departure_time - prev_conn.arrival_time
-                                arrival_hour = prev_conn.arrival_time.hour
-                                
-                                # Nighttime: 22:00 - 06:00
-                                is_night = arrival_hour >= 22 or arrival_hour < 6
-                                
-                                if is_night:
-                                    # Max 30 minutes
-                                    if layover_duration.total_seconds() > 30 * 60:
-                                        continue
-                                else:
-                                    # Max 2 hours (120 minutes)
-                                    if layover_duration.total_seconds() > 120 * 60:
-                                        continue
-                                        
-                                stack.append((next_city, path_so_far + [connection]))
-                        else:
-                            # First leg, no layover check needed
-                            stack.append((next_city, path_so_far + [connection]))
+            if path_so_far:
+                # ensure chronological order and the layover policy: only connections departing
+                # inside the layover window after the previous arrival are feasible
+                arrival = path_so_far[-1].arrival_minutes
+                layover_end = arrival + max_layover_minutes(arrival)
+                # nothing leaving after the latest useful departure reaches end_city
+                last_departure = layover_end if latest_departures is None else min(
+                    layover_end, latest_departures.get(current_city, -1)
+                )
+                next_connections = current_station.departures_between(
+                    day_of_week, arrival, window.latest_departure(last_departure)
+                )
+                if counters is not None:
+                    layover_rejected += current_station.count_departures_between(
+                        day_of_week, layover_end, MINUTES_PER_DAY
+                    )
+            else:
+                # First leg, no layover check needed, only the departure window
+                next_connections = window.first_departures(current_station, day_of_week)
             
+            # departure times strictly increase along a path, so a connection can't repeat (no cycles)
+            for connection in next_connections:
+                next_city = connection.arrival_city
+                if not window.arrives_in_time(connection) or (
+                    min_legs is not None and next_city != end_city and not (
+                        within_reach(min_legs, next_city, len(path_so_far) + 1, max_legs)
+                        and within_time(latest_departures, next_city, connection.arrival_minutes)
+                        and window.can_arrive_in_time(min_durations, next_city, connection.arrival_minutes)
+                    )
+                ):
+                    pruned += 1
+                    continue
+                pushed += 1
+                stack.append((next_city, path_so_far + [connection]))
+        
+        if counters is not None:
+            counters['pushed'] = counters.get('pushed', 0) + pushed
+            counters['pruned'] = counters.get('pruned', 0) + pruned
+            counters['layover_rejected'] = counters.get('layover_rejected', 0) + layover_rejected
+            counters['leg_limit'] = counters.get('leg_limit', 0) + leg_limit
         return all_paths
             
             
@@ -0,0 +1,74 @@
+from typing import Optional
+from transit.constants import City, DayOfWeek
+from transit.models.Connection import Connection
+from transit.models.Station import Station
+from transit.models.Ticket import TripOption
+from .layover_policy import MINUTES_PER_DAY
+
+# time constraints of a search, in minutes from midnight of the travel day:
+#   depart_after   the first leg leaves at or after this time
+#   depart_before  the first leg leaves at or before this time
+#   arrive_by      the last leg arrives at or before this time (>= MINUTES_PER_DAY for the next day)
+# the routing engines apply them while walking the departures, instead of filtering the
+# trips of the whole day: the first leg is a bisect of the start station's departures on
+# [depart_after, depart_before], and since times only increase along a trip, later legs are
+# only looked for among the departures up to arrive_by, and a connection arriving after
+# arrive_by is never extended. With a lower bound on the travel time left from each city
+# (ReachabilityIndex.duration_table) a journey that can't make arrive_by is dropped as
+# soon as it reaches a city from which the destination is too far.
+
+
+class TimeWindow:
+
+    __slots__ = ("depart_after", "depart_before", "arrive_by")
+
+    def __init__(self, depart_after: Optional[int] = None, depart_before: Optional[int] = None,
+                 arrive_by: Optional[int] = None):
+        self.depart_after = depart_after
+        self.depart_before = depart_before
+        self.arrive_by = arrive_by
+
+    @property
+    def key(self) -> tuple:
+        # part of the search cache key
+        return (self.depart_after, self.depart_before, self.arrive_by)
+
+    @property
+    def is_any_time(self) -> bool:
+        return self.key == (None, None, None)
+
+    def latest_departure(self, until_minutes: int) -> int:
+        # a departure after arrive_by can't arrive by arrive_by
+        return until_minutes if self.arrive_by is None else min(until_minutes, self.arrive_by)
+
+    def first_departures(self, station: Station, day_of_week: DayOfWeek) -> list[Connection]:
+        """The departures from station on day_of_week a trip can start with."""
+        if self.is_any_time:
+            return station.departures(day_of_week)
+        earliest = 0 if self.depart_after is None else self.depart_after
+        latest = MINUTES_PER_DAY if self.depart_before is None else self.depart_before
+        return station.departures_between(day_of_week, earliest - 1, self.latest_departure(latest))
+
+    def departs_in_time(self, departure_minutes: int) -> bool:
+        return (
+            (self.depart_after is None or departure_minutes >= self.depart_after)
+            and (self.depart_before is None or departure_minutes <= self.depart_before)
+            and (self.arrive_by is None or departure_minutes <= self.arrive_by)
+        )
+
+    def arrives_in_time(self, connection: Connection) -> bool:
+        return self.arrive_by is None or connection.arrival_minutes <= self.arrive_by
+
+    def can_arrive_in_time(self, min_durations: Optional[dict], city: City, arrival_minutes: int) -> bool:
+        # False if the ReachabilityIndex duration table `min_durations` of the destination says
+        # a journey in `city` at `arrival_minutes` needs longer than arrive_by leaves it
+        if self.arrive_by is None or min_durations is None:
+            return True
+        remaining = min_durations.get(city)
+        return remaining is not None and arrival_minutes + remaining <= self.arrive_by
+
+    def contains(self, trip: TripOption) -> bool:
+        return self.departs_in_time(trip.connections[0].departure_minutes) and self.arrives_in_time(trip.connections[-1])
+
+
+ANY_TIME = TimeWindow()
@@ -0,0 +1,118 @@
+import csv
+import random
+from typing import Iterator, Optional
+from transit.constants import City, TrainType
+from .route_loader import CSV_COLUMNS
+
+# synthetic timetables in the schema of eu_rail_network.csv, for testing and benchmarking
+# the searches on networks larger than the real one
+#
+# the network is hub and spoke: `hubs` cities are all linked to each other, every other city
+# is linked to one or two hubs, and some to a neighbouring city. Each link is run in both
+# directions; hub to hub links get `hub_frequency` times more services than the others.
+# A share of the services are night trains, departing in the evening and arriving the next
+# morning ("07:40 (+1d)"). The same arguments and seed always give the same timetable.
+
+DAY_PATTERNS = {"Daily": 4, "Mon-Fri": 2, "Sat-Sun": 1, "Fri-Sun": 1, "Tue,Thu": 1, "Mon,Wed,Fri": 1}
+HIGH_SPEED_TRAINS = (
+    TrainType.AVE, TrainType.EUROSTAR, TrainType.FRECCIAROSSA, TrainType.ICE, TrainType.ITALO,
+    TrainType.RAILJET, TrainType.RJX, TrainType.TGV, TrainType.THALYS,
+)
+REGIONAL_TRAINS = (
+    TrainType.EUROCITY, TrainType.IC, TrainType.INTERCITY, TrainType.INTERCITES,
+    TrainType.RE, TrainType.REGIOEXPRESS, TrainType.TER,
+)
+NIGHT_TRAIN = TrainType.NIGHTJET
+
+DEFAULT_ROUTES = 1200  # the size of eu_rail_network.csv
+
+
+def _format_time(minutes: int) -> str:
+    time = f"{minutes // 60 % 24:02d}:{minutes % 60:02d}"
+    return time + " (+1d)" if minutes >= 24 * 60 else time
+
+
+def _links(rng: random.Random, cities: list[City], hubs: int, hub_frequency: int) -> list[tuple]:
+    # (from, to, weight, typical travel minutes, high speed) for both directions of every link
+    hub_cities, spokes = cities[:hubs], cities[hubs:]
+    links = {}
+    for i, hub in enumerate(hub_cities):
+        for other in hub_cities[i + 1:]:
+            links[(hub, other)] = (hub_frequency, rng.randint(90, 420), True)
+    for spoke in spokes:
+        for hub in rng.sample(hub_cities, 2 if hubs > 1 and rng.random() < 0.3 else 1):
+            links[(spoke, hub)] = (1, rng.randint(40, 240), False)
+        if len(spokes) > 1 and rng.random() < 0.25:
+            neighbour = rng.choice([city for city in spokes if city is not spoke])
+            if (neighbour, spoke) not in links:
+                links[(spoke, neighbour)] = (1, rng.randint(30, 180), False)
+
+    return [
+        (a, b, weight, minutes, high_speed)
+        for (first, second), (weight, minutes, high_speed) in links.items()
+        for a, b in ((first, second), (second, first))
+    ]
+
+
+def generate_timetable(
+    routes: int = DEFAULT_ROUTES,
+    cities: Optional[int] = None,
+    hubs: Optional[int] = None,
+    hub_frequency: int = 4,
+    night_share: float = 0.05,
+    day_patterns: Optional[dict] = None,
+    seed: int = 342,
+) -> Iterator[dict]:
+    """
+    Yields `routes` timetable rows (dicts keyed by CSV_COLUMNS) over `cities` cities
+    (all of City by default), `hubs` of them hubs (one in 12 by default).
+    `day_patterns` maps "Days of Operation" values to their relative frequency.
+    """
+    rng = random.Random(seed)
+    all_cities = list(City)
+    cities = rng.sample(all_cities, min(cities or len(all_cities), len(all_cities)))
+    hubs = max(1, min(hubs or len(cities) // 12, len(cities) - 1))
+    day_patterns = day_patterns or DAY_PATTERNS
+    patterns, pattern_weights = list(day_patterns), list(day_patterns.values())
+
+    links = _links(rng, cities, hubs, hub_frequency)
+    # one service on every direction of every link first (while there are enough), then the
+    # rest spread by weight
+    services = links[:routes] + rng.choices(links, [link[2] for link in links], k=max(0, routes - len(links)))
+    width = max(5, len(str(routes)))
+
+    for index, (departure_city, arrival_city, _, minutes, high_speed) in enumerate(services):
+        if rng.random() < night_share:
+            departure = rng.randrange(19 * 12, 24 * 12) * 5
+            arrival = departure + max(minutes * 2, 24 * 60 - departure + rng.randrange(4 * 60, 9 * 60))
+            train_type = NIGHT_TRAIN
+        else:
+            departure = rng.randrange(5 * 12, 22 * 12) * 5
+            arrival = departure + round(minutes * rng.uniform(0.85, 1.2))
+            train_type = rng.choice(HIGH_SPEED_TRAINS if high_speed else REGIONAL_TRAINS)
+        arrival = min(arrival, departure + 23 * 60)
+
+        first_class = round((arrival - departure) / 60 * rng.uniform(25, 45)) + 15
+        yield dict(zip(CSV_COLUMNS, (
+            f"R{index + 1:0{width}d}",
+            departure_city.value,
+            arrival_city.value,
+            _format_time(departure),
+            _format_time(arrival),
+            train_type.value,
+            rng.choices(patterns, pattern_weights)[0],
+            str(first_class),
+            str(round(first_class * rng.uniform(0.55, 0.7))),
+        )))
+
+
+def write_timetable(path: str, **options) -> int:
+    """Writes generate_timetable(**options) to a CSV file at `path`. Returns the number of rows."""
+    count = 0
+    with open(path, mode='w', encoding='utf-8', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        for row in generate_timetable(**options):
+            writer.writerow(row)
+            count += 1
+    return count
@@ -0,0 +1,99 @@
+import secrets
+from datetime import date
+from typing import Callable, Iterable, Optional
+from django.core.cache import caches
+from transit.constants import DayOfWeek
+from transit.models.Connection import Connection
+from transit.models.Ticket import TripOption
+from .rail_network import connection_values
+
+# search results handed out by opaque option ID, so booking a trip found by a search
+# doesn't run the search again: the search stores each TripOption it returns under a new
+# ID, the booking sends the ID back and the trip is one cache lookup away.
+# the options live in the 'trip_options' cache (see CACHES in settings.py), which expires
+# them after TRIP_OPTION_TTL and keeps at most TRIP_OPTION_MAX_ENTRIES of them. Only the
+# legs are stored, as the values of every Connection slot (connection_values), and the
+# Connections are taken from the current network when the option is resolved; an option
+# whose connections were changed in any way (cities, times, days, train type, prices) or
+# removed by a timetable reload since the search is refused.
+
+TRIP_OPTION_CACHE = "trip_options"
+OPTION_ID_BYTES = 16  # 22 URL safe characters
+KEY_PREFIX = "trip-option:"
+
+
+class TripOptionNotFound(ValueError):
+    """Unknown option ID, or the option expired or was evicted from the cache."""
+
+
+class TripOptionChanged(ValueError):
+    """The timetable changed one of the option's connections since it was found."""
+
+
+class StoredTripOption:
+    """A TripOption found by a search for travel_date, resolved from its option ID."""
+
+    def __init__(self, option_id: str, trip: TripOption, travel_date: date):
+        self.option_id = option_id
+        self.trip = trip
+        self.travel_date = travel_date
+        # .weekday() is Mon=0...Sun=6, our enum is Sun=0...Sat=6
+        self.day_of_week = DayOfWeek((travel_date.weekday() + 1) % 7)
+
+
+class TripOptionStore:
+
+    def __init__(self, get_connection: Callable[[str], Optional[Connection]],
+                 cache_alias: str = TRIP_OPTION_CACHE, ttl: Optional[float] = None):
+        # get_connection: route ID -> Connection of the current network, None if it was removed
+        # ttl: seconds an option is kept, the cache's TIMEOUT when None
+        self.__get_connection = get_connection
+        self.__cache_alias = cache_alias
+        self.__ttl = ttl
+
+    @property
+    def cache(self):
+        # django.core.cache.caches hands out one cache object per thread
+        return caches[self.__cache_alias]
+
+    def __timeout(self) -> dict:
+        return {} if self.__ttl is None else {"timeout": self.__ttl}
+
+    @staticmethod
+    def __value(trip: TripOption, travel_date: date) -> dict:
+        return {"date": travel_date.isoformat(), "legs": [connection_values(connection) for connection in trip.connections]}
+
+    def add(self, trip: TripOption, travel_date: date) -> str:
+        """Stores a trip found for travel_date, returns its new option ID."""
+        option_id = secrets.token_urlsafe(OPTION_ID_BYTES)
+        self.cache.set(KEY_PREFIX + option_id, self.__value(trip, travel_date), **self.__timeout())
+        return option_id
+
+    def add_many(self, trips: Iterable[TripOption], travel_date: date) -> list[str]:
+        """Stores trips found for travel_date in one cache call, returns their option IDs in order."""
+        values = {secrets.token_urlsafe(OPTION_ID_BYTES): self.__value(trip, travel_date) for trip in trips}
+        self.cache.set_many({KEY_PREFIX + option_id: value for option_id, value in values.items()}, **self.__timeout())
+        return list(values)
+
+    def get(self, option_id: str) -> StoredTripOption:
+        """
+        The trip stored under option_id, with the connections of the current network.
+        Raises TripOptionNotFound if it expired or never existed, TripOptionChanged if the
+        timetable changed one of its connections since.
+        """
+        value = self.cache.get(KEY_PREFIX + option_id) if isinstance(option_id, str) else None
+        if value is None:
+            raise TripOptionNotFound(f"Error: Trip option '{option_id}' doesn't exist or has expired, search again.")
+
+        connections = []
+        for leg in value["legs"]:
+            connection = self.__get_connection(leg[0])
+            if connection is None or connection_values(connection) != tuple(leg):
+                raise TripOptionChanged(
+                    f"Error: Connection {leg[0]} of trip option '{option_id}' changed since the search, search again."
+                )
+            connections.append(connection)
+        return StoredTripOption(option_id, TripOption(connections), date.fromisoformat(value["date"]))
+
+    def discard(self, option_id: str):
+        self.cache.delete(KEY_PREFIX + option_id)
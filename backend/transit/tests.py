@@ -1,3 +1,1173 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import time
+import tempfile
+from collections import Counter
+from datetime import date, datetime, timedelta
+from unittest import skipUnless
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import AsyncClient, SimpleTestCase, TestCase
+from django.utils import timezone
+from transit.models.Client import Client
+from transit.models.Connection import Connection
+from transit.models.Station import Station
+from transit.models.Ticket import Ticket, TripOption
+from transit.models.TicketLeg import TicketLeg
+from transit.models.Trip import Trip
+from transit.models.SeatInventory import SeatInventory, FIRST_CLASS, SECOND_CLASS
+from transit.services.booking_service import BookingService, TripPage
+from transit.services.city_index import CITY_INDEX, MAX_QUERY_LENGTH
+from backend_django.apps import CSV_FILE_PATH
+from transit.constants import City, DayOfWeek, TrainType
+from transit.services.connection_table import ConnectionTable, filter_connections, numpy_available
+from transit.services.network_snapshot import HEADER, StaleSnapshotError, default_snapshot_path, load_snapshot
+from transit.services.pareto_search import pareto_filter
+from transit.services.route_loader import CSV_COLUMNS, connection_from_row, load_connections, read_csv
+from transit.services.rail_network import RailNetwork, connection_values
+from transit.services.reachability import ReachabilityIndex
+from transit.services.search_cache import SearchCache
+from transit.services.search_stats import LatencyHistogram
+from transit.services.station_network_manager import ROUTING_ENGINES, StationNetworkManager
+from transit.services.timetable_generator import generate_timetable, write_timetable
+from transit.services.time_window import TimeWindow
+from transit.services.trip_option_store import TripOptionChanged, TripOptionNotFound, TripOptionStore
+from transit.views import TRIP_OPTIONS
+from transit.services.seat_inventory import DEFAULT_CAPACITY, SEAT_AVAILABILITY, SeatAvailabilityCache, SoldOutError, reserve_seats
 
 # Create your tests here.
+
+
+def make_trip_option(*route_ids: str) -> TripOption:
+    # a direct (or multi-leg) Paris -> Lyon -> ... trip built from made-up route ids
+    connections = [
+        Connection(route_id, "Paris", "Lyon", "08:00", "10:00", "Daily", "TGV", "100", "50")
+        for route_id in route_ids
+    ]
+    return TripOption(connections)
+
+
+def write_rows(path: str, rows: list[dict]):
+    # a rail network CSV with `rows` (CSV_COLUMNS to raw values)
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def private_manager(test: SimpleTestCase, file_path: str) -> StationNetworkManager:
+    # a manager of its own over file_path, the app's one is put back after the test
+    test.addCleanup(setattr, StationNetworkManager, "_instance", StationNetworkManager._instance)
+    StationNetworkManager._instance = None
+    return StationNetworkManager(file_path)
+
+
+def make_travellers(count: int, prefix: str = "P") -> list[dict]:
+    return [
+        {"id": f"{prefix}{i}", "first_name": f"First{i}", "last_name": f"Last{i}", "age": 20 + i % 50}
+        for i in range(count)
+    ]
+
+
+class BookTripTests(TestCase):
+
+    def setUp(self):
+        self.service = BookingService()
+        self.travel_date = date(2025, 3, 10)
+
+    def test_query_count_does_not_depend_on_group_size(self):
+        # SAVEPOINT, seat rows insert, seats update, client lookup, client insert, duplicate check,
+        # trip insert, ticket insert, leg insert, RELEASE
+        for size, prefix in [(1, "A"), (5, "B"), (40, "C")]:
+            with self.subTest(size=size), self.assertNumQueries(10):
+                trip = self.service.book_trip(make_trip_option("R1"), make_travellers(size, prefix), 1, self.travel_date)
+            self.assertEqual(trip.tickets.count(), size)
+
+    def test_existing_clients_are_reused(self):
+        Client.objects.create(client_id="P0", first_name="First0", last_name="Last0", age=20)
+
+        # no client insert when every traveller already exists
+        self.service.book_trip(make_trip_option("R2"), make_travellers(1), 1, self.travel_date)
+        with self.assertNumQueries(9):
+            trip = self.service.book_trip(make_trip_option("R3"), make_travellers(1), 1, self.travel_date)
+
+        self.assertEqual(Client.objects.count(), 1)
+        self.assertEqual(trip.client_id, "P0")
+
+    def test_first_traveller_is_the_primary_booker(self):
+        trip = self.service.book_trip(make_trip_option("R1"), make_travellers(3), 1, self.travel_date)
+        self.assertEqual(trip.client_id, "P0")
+        self.assertEqual(trip.date, self.travel_date)
+
+    def test_same_traveller_twice_in_one_booking_is_rejected(self):
+        travellers = make_travellers(2) + make_travellers(1)
+        with self.assertRaises(ValueError):
+            self.service.book_trip(make_trip_option("R1"), travellers, 1, self.travel_date)
+        self.assertFalse(Trip.objects.exists())
+
+    def test_connection_already_booked_that_day_is_rejected(self):
+        self.service.book_trip(make_trip_option("R1", "R2"), make_travellers(2), 1, self.travel_date)
+
+        with self.assertRaises(ValueError):
+            self.service.book_trip(make_trip_option("R2"), make_travellers(3), 1, self.travel_date)
+
+        # nothing of the failed booking is kept, not even the trip or the new client
+        self.assertEqual(Trip.objects.count(), 1)
+        self.assertEqual(Ticket.objects.count(), 2)
+        self.assertFalse(Client.objects.filter(client_id="P2").exists())
+
+    def test_other_integrity_errors_are_not_reported_as_double_bookings(self):
+        travellers = make_travellers(1)
+        travellers[0]["age"] = None  # violates NOT NULL on Client.age
+        with self.assertRaises(IntegrityError):
+            self.service.book_trip(make_trip_option("R1"), travellers, 1, self.travel_date)
+        self.assertFalse(Trip.objects.exists())
+
+    def test_same_connection_on_another_day_is_allowed(self):
+        self.service.book_trip(make_trip_option("R1"), make_travellers(2), 1, self.travel_date)
+        self.service.book_trip(make_trip_option("R1"), make_travellers(2), 2, date(2025, 3, 11))
+        self.assertEqual(Ticket.objects.count(), 4)
+
+    def test_one_leg_is_recorded_per_connection_and_traveller(self):
+        self.service.book_trip(make_trip_option("R1", "R2"), make_travellers(3), 1, self.travel_date)
+
+        booked_on_r2 = TicketLeg.objects.filter(route_id="R2", travel_date=self.travel_date)
+        self.assertEqual(TicketLeg.objects.count(), 6)
+        self.assertEqual(sorted(booked_on_r2.values_list("client_id", flat=True)), ["P0", "P1", "P2"])
+
+    def test_database_rejects_the_same_leg_twice(self):
+        trip = self.service.book_trip(make_trip_option("R1"), make_travellers(1), 1, self.travel_date)
+        ticket = trip.tickets.get()
+        with self.assertRaises(IntegrityError):
+            TicketLeg.objects.create(ticket=ticket, client=ticket.client, route_id="R1", travel_date=self.travel_date)
+
+
+class TripHistoryTests(TestCase):
+
+    def setUp(self):
+        self.service = BookingService()
+        today = date.today()
+        # 13 upcoming (including today) and 12 past trips, two on most dates, each with two travellers
+        self.trips = []
+        for i in range(25):
+            trip_date = today + timedelta(days=i // 2 - 6)
+            travellers = [make_travellers(1, "H")[0], make_travellers(1, f"G{i}-")[0]]
+            self.trips.append(self.service.book_trip(make_trip_option(f"R{i}"), travellers, 1, trip_date))
+        # someone else's trip never shows up
+        self.service.book_trip(make_trip_option("R99"), make_travellers(1, "X"), 1, today)
+
+    def read_all_pages(self, upcoming: bool, page_size: int) -> list:
+        trips = []
+        cursor = None
+        while True:
+            page = self.service.get_trip_page("H0", "last0", upcoming, cursor=cursor, page_size=page_size)
+            trips.extend(page)
+            if page.next_cursor is None:
+                return trips
+            cursor = page.next_cursor
+
+    def test_history_query_count_is_constant(self):
+        # client, then for each section: trips (with their booker), tickets (with their clients)
+        with self.assertNumQueries(5):
+            history = self.service.get_client_trip_history("H0", "Last0", page_size=100)
+            for trip in list(history['current']) + list(history['past']):
+                str(trip)
+                for ticket in trip.tickets.all():
+                    str(ticket)
+        self.assertEqual(len(history['current']) + len(history['past']), 25)
+
+    def test_current_and_past_are_split_and_ordered(self):
+        history = self.service.get_client_trip_history("H0", "Last0", page_size=100)
+        today = date.today()
+        current = [(trip.date, trip.trip_id) for trip in history['current']]
+        past = [(trip.date, trip.trip_id) for trip in history['past']]
+
+        self.assertTrue(all(trip_date >= today for trip_date, _ in current))
+        self.assertTrue(all(trip_date < today for trip_date, _ in past))
+        self.assertEqual(current, sorted(current))
+        self.assertEqual(past, sorted(past, reverse=True))
+
+    def test_pages_cover_every_trip_once(self):
+        for upcoming in (True, False):
+            with self.subTest(upcoming=upcoming):
+                paged = self.read_all_pages(upcoming, page_size=5)
+                first_page = self.service.get_client_trip_history("H0", "Last0", page_size=100)
+                expected = first_page['current' if upcoming else 'past'].trips
+                self.assertEqual([trip.trip_id for trip in paged], [trip.trip_id for trip in expected])
+
+    def test_last_page_has_no_cursor(self):
+        page = self.service.get_trip_page("H0", "Last0", upcoming=True, page_size=13)
+        self.assertIsInstance(page, TripPage)
+        self.assertEqual(len(page), 13)
+        self.assertIsNone(page.next_cursor)
+
+    def test_wrong_last_name_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.service.get_client_trip_history("H0", "Somebody")
+
+
+class SeatInventoryTests(TestCase):
+
+    def setUp(self):
+        self.service = BookingService()
+        self.travel_date = date(2025, 3, 10)
+
+    def fill(self, route_id: str, seats_left: int, seat_class: str = SECOND_CLASS):
+        inventory, _ = SeatInventory.objects.get_or_create(
+            route_id=route_id, travel_date=self.travel_date, seat_class=seat_class, defaults={"capacity": 10}
+        )
+        inventory.seats_sold = inventory.capacity - seats_left
+        inventory.save()
+
+    def test_booking_takes_one_seat_per_traveller_on_every_leg(self):
+        self.service.book_trip(make_trip_option("R1", "R2"), make_travellers(3), 1, self.travel_date)
+        self.service.book_trip(make_trip_option("R2"), make_travellers(2, "Q"), 1, self.travel_date, seat_class=FIRST_CLASS)
+
+        sold = {
+            (row.route_id, row.seat_class): row.seats_sold
+            for row in SeatInventory.objects.filter(travel_date=self.travel_date)
+        }
+        self.assertEqual(sold, {("R1", SECOND_CLASS): 3, ("R2", SECOND_CLASS): 3, ("R2", FIRST_CLASS): 2})
+
+    def test_sold_out_leg_rejects_the_whole_booking(self):
+        self.fill("R2", seats_left=2)
+
+        with self.assertRaises(SoldOutError):
+            self.service.book_trip(make_trip_option("R1", "R2"), make_travellers(3), 1, self.travel_date)
+
+        # the seats taken on R1 before R2 was found sold out are given back
+        self.assertFalse(Trip.objects.exists())
+        self.assertFalse(SeatInventory.objects.filter(route_id="R1").exists())
+        self.assertEqual(SeatInventory.objects.get(route_id="R2").seats_left, 2)
+
+    def test_last_seats_can_be_sold(self):
+        self.fill("R1", seats_left=2)
+        reserve_seats(["R1"], self.travel_date, SECOND_CLASS, 2)
+        self.assertEqual(SeatInventory.objects.get(route_id="R1").seats_left, 0)
+        with self.assertRaises(SoldOutError):
+            reserve_seats(["R1"], self.travel_date, SECOND_CLASS, 1)
+
+    def test_availability_cache_drops_sold_out_trips_with_one_query(self):
+        self.fill("R2", seats_left=1)
+        availability = SeatAvailabilityCache()
+        trips = [make_trip_option("R1"), make_trip_option("R2"), make_trip_option("R1", "R2")]
+
+        with self.assertNumQueries(1):
+            one_seat = list(availability.available_trips(trips, self.travel_date, seats=1))
+            two_seats = list(availability.available_trips(trips, self.travel_date, seats=2))
+
+        self.assertEqual(len(one_seat), 3)
+        self.assertEqual([trip.connections[0].route_id for trip in two_seats], ["R1"])
+
+    def test_availability_cache_keeps_a_bounded_number_of_dates(self):
+        availability = SeatAvailabilityCache(max_dates=2)
+        days = [self.travel_date + timedelta(days=i) for i in range(3)]
+        for day in days:
+            availability.seats_left_on(day)
+        availability.seats_left_on(days[1])
+        self.assertEqual(availability.cached_dates(), [days[2], days[1]])
+
+        # expired dates are dropped when another one is loaded
+        availability.ttl = 0
+        availability.seats_left_on(days[0])
+        self.assertEqual(availability.cached_dates(), [days[0]])
+
+    def test_reservations_do_not_change_a_returned_map(self):
+        availability = SeatAvailabilityCache()
+        seats_left = availability.seats_left_on(self.travel_date)
+        availability.record_reservation(["R1"], self.travel_date, SECOND_CLASS, 3)
+        self.assertEqual(seats_left, {})
+        self.assertEqual(availability.seats_left("R1", self.travel_date), DEFAULT_CAPACITY[SECOND_CLASS] - 3)
+
+    async def test_search_endpoint_drops_sold_out_trips(self):
+        self.addCleanup(SEAT_AVAILABILITY.invalidate)
+        SEAT_AVAILABILITY.invalidate()
+
+        async def searched_route_ids():
+            response = await self.async_client.get(
+                "/api/search/", {"from": "Paris", "to": "Madrid", "date": self.travel_date.isoformat()}
+            )
+            trips = [json.loads(line) async for line in response.streaming_content][:-1]
+            return [[connection["route_id"] for connection in trip["connections"]] for trip in trips]
+
+        before = await searched_route_ids()
+        self.assertTrue(before)
+        sold_out = before[0][0]
+        # the seats are sold in this test's transaction, only the request's connection sees them
+        await sync_to_async(self.fill)(sold_out, seats_left=0)
+        SEAT_AVAILABILITY.invalidate()
+
+        after = await searched_route_ids()
+        self.assertEqual(after, [route_ids for route_ids in before if sold_out not in route_ids])
+
+    def test_availability_cache_follows_committed_reservations(self):
+        self.addCleanup(SEAT_AVAILABILITY.invalidate)
+        SEAT_AVAILABILITY.invalidate()
+        self.assertEqual(SEAT_AVAILABILITY.seats_left("R1", self.travel_date, FIRST_CLASS), 60)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_seats(["R1"], self.travel_date, FIRST_CLASS, 5)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(SEAT_AVAILABILITY.seats_left("R1", self.travel_date, FIRST_CLASS), 55)
+
+
+class TimetableGeneratorTests(SimpleTestCase):
+
+    def test_same_seed_gives_the_same_timetable(self):
+        self.assertEqual(list(generate_timetable(routes=300, seed=1)), list(generate_timetable(routes=300, seed=1)))
+        self.assertNotEqual(list(generate_timetable(routes=300, seed=1)), list(generate_timetable(routes=300, seed=2)))
+
+    def test_written_timetable_loads_like_the_real_one(self):
+        folder = tempfile.mkdtemp()
+        path = os.path.join(folder, "timetable.csv")
+        self.addCleanup(os.rmdir, folder)
+        self.addCleanup(os.remove, path)
+
+        self.assertEqual(write_timetable(path, routes=2000, cities=60, hubs=5), 2000)
+        with open(path, encoding="utf-8") as file:
+            self.assertEqual(file.readline().strip(), ",".join(CSV_COLUMNS))
+        connections = read_csv(path)
+
+        self.assertEqual(len(connections), 2000)
+        self.assertEqual(len({connection.route_id for connection in connections}), 2000)
+        self.assertLessEqual(len({connection.departure_city for connection in connections}), 60)
+        self.assertTrue(any(connection.day_offset == 1 for connection in connections))
+
+    def test_hubs_get_most_of_the_services(self):
+        rows = list(generate_timetable(routes=5000, cities=100, hubs=5))
+        departures = Counter(row["Departure City"] for row in rows)
+        busiest = sum(count for _, count in departures.most_common(5))
+        self.assertGreater(busiest, len(rows) / 3)
+
+
+class ConnectionTests(SimpleTestCase):
+
+    @staticmethod
+    def parsed_like_before(row: dict) -> dict:
+        # the attributes as Connection stored them before it kept minutes and a day mask
+        dummy_date = datetime(2000, 1, 1)
+        hour, minute = map(int, row["Departure Time"].split(":"))
+        departure_time = timezone.make_aware(dummy_date.replace(hour=hour, minute=minute))
+        arrival, _, offset = row["Arrival Time"].partition(" ")
+        day_offset = int(offset.strip("(+d)")) if offset else 0
+        hour, minute = map(int, arrival.split(":"))
+        arrival_time = timezone.make_aware((dummy_date + timedelta(days=day_offset)).replace(hour=hour, minute=minute))
+
+        days = row["Days of Operation"]
+        names = ["Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat"]
+        if days == "Daily":
+            days_of_operation = set(DayOfWeek)
+        elif "-" in days:
+            first, last = (names.index(name) for name in days.split("-"))
+            days_of_operation = {DayOfWeek((first + i) % 7) for i in range((last - first) % 7 + 1)}
+        else:
+            days_of_operation = {DayOfWeek(names.index(name.strip())) for name in days.split(",")}
+
+        return {
+            "departure_time": departure_time,
+            "arrival_time": arrival_time,
+            "duration": arrival_time - departure_time,
+            "day_offset": day_offset,
+            "days_of_operation": days_of_operation,
+        }
+
+    def test_computed_attributes_match_the_parsed_ones(self):
+        with open(CSV_FILE_PATH, encoding="utf-8") as file:
+            rows = list(csv.DictReader(file))[::7]
+        rows += [
+            {**rows[0], "Departure Time": "23:50", "Arrival Time": "00:10 (+1d)", "Days of Operation": "Sat-Mon"},
+            {**rows[0], "Departure Time": "00:00", "Arrival Time": "23:59", "Days of Operation": "Sun"},
+            {**rows[0], "Departure Time": "22:15", "Arrival Time": "06:05 (+2d)", "Days of Operation": "Mon, Wed,Fri"},
+        ]
+        self.assertTrue(any("(+1d)" in row["Arrival Time"] for row in rows))
+        self.assertGreaterEqual(len({row["Days of Operation"] for row in rows}), 6)
+
+        for row in rows:
+            with self.subTest(route_id=row["Route ID"], arrival=row["Arrival Time"], days=row["Days of Operation"]):
+                connection = connection_from_row(row)
+                expected = self.parsed_like_before(row)
+                self.assertEqual({name: getattr(connection, name) for name in expected}, expected)
+
+
+class StationTests(SimpleTestCase):
+
+    def setUp(self):
+        def connection(route_id, arrival_city, departure_time, days):
+            return Connection(route_id, "Paris", arrival_city, departure_time, "23:00", days, "TGV", "100", "50")
+
+        self.daily_early = connection("D1", "Lyon", "08:00", "Daily")
+        self.daily_late = connection("D2", "Lille", "12:00", "Daily")
+        self.weekdays = connection("W1", "Lyon", "10:00", "Mon-Fri")
+        self.weekend = connection("S1", "Nice", "09:00", "Sat-Sun")
+        self.station = Station(City.PARIS)
+        for added in (self.daily_late, self.weekdays, self.daily_early, self.weekend):
+            self.station.add_connection(added)
+
+    @staticmethod
+    def route_ids(connections) -> list:
+        return [connection.route_id for connection in connections]
+
+    def test_departures_are_sorted_per_day(self):
+        self.assertEqual(self.route_ids(self.station.departures(DayOfWeek.Monday)), ["D1", "W1", "D2"])
+        self.assertEqual(self.route_ids(self.station.departures(DayOfWeek.Sunday)), ["D1", "S1", "D2"])
+
+    def test_daily_connections_are_stored_once(self):
+        self.assertEqual(len(self.station), 2 + 5 + 2)
+        for day_of_week in DayOfWeek:
+            self.assertEqual(Counter(self.route_ids(self.station.departures(day_of_week)))["D1"], 1)
+
+    def test_departures_between_is_a_sorted_half_open_window(self):
+        monday = DayOfWeek.Monday
+        # after 08:00 (excluded) until 12:00 (included), the daily and weekday lists merged
+        self.assertEqual(self.route_ids(self.station.departures_between(monday, 8 * 60, 12 * 60)), ["W1", "D2"])
+        self.assertEqual(self.route_ids(self.station.departures_between(monday, 8 * 60 - 1, 12 * 60 - 1)), ["D1", "W1"])
+        self.assertEqual(self.route_ids(self.station.departures_between(DayOfWeek.Saturday, 0, 24 * 60)), ["D1", "S1", "D2"])
+        self.assertEqual(self.station.departures_between(monday, 12 * 60, 24 * 60), [])
+        for day_of_week in DayOfWeek:
+            for after, until in [(0, 24 * 60), (7 * 60, 9 * 60), (9 * 60, 11 * 60)]:
+                window = self.station.departures_between(day_of_week, after, until)
+                self.assertEqual(window, [c for c in self.station.departures(day_of_week) if after < c.departure_minutes <= until])
+                self.assertEqual(self.station.count_departures_between(day_of_week, after, until), len(window))
+
+    def test_outgoing_connections_round_trip(self):
+        outgoing = self.station.outgoing_connections
+        self.assertEqual(set(outgoing), set(DayOfWeek))
+        self.assertEqual(self.route_ids(outgoing[DayOfWeek.Tuesday][City.LYON]), ["D1", "W1"])
+        self.assertNotIn(City.NICE, outgoing[DayOfWeek.Tuesday])
+
+        rebuilt = Station(City.PARIS)
+        rebuilt.outgoing_connections = outgoing
+        for day_of_week in DayOfWeek:
+            self.assertEqual(rebuilt.departures(day_of_week), self.station.departures(day_of_week))
+
+    def test_remove_and_copy(self):
+        duplicate = self.station.copy()
+        self.station.remove_connection(self.daily_early)
+        self.station.remove_connection(self.weekend)
+        self.assertEqual(self.route_ids(self.station.departures(DayOfWeek.Sunday)), ["D2"])
+        self.assertEqual(self.route_ids(self.station.departures_between(DayOfWeek.Monday, 0, 11 * 60)), ["W1"])
+        # the copy keeps its own index
+        self.assertEqual(self.route_ids(duplicate.departures(DayOfWeek.Sunday)), ["D1", "S1", "D2"])
+
+
+class ConnectionScanTests(SimpleTestCase):
+
+    def setUp(self):
+        folder = tempfile.mkdtemp()
+        path = os.path.join(folder, "timetable.csv")
+        self.addCleanup(os.rmdir, folder)
+        self.addCleanup(os.remove, path)
+        # a small, dense timetable with night trains arriving the next day
+        write_timetable(path, routes=600, cities=15, hubs=3)
+        self.manager = private_manager(self, path)
+
+    def test_connection_scan_finds_the_trips_of_dfs_all_paths(self):
+        stations = self.manager.get_network().stations
+        cities = sorted(stations, key=lambda city: (-len(stations[city].outgoing_connections), city.value))
+        engine = self.manager.get_network().connection_scan
+        overnight = 0
+        for start_city in cities[:4]:
+            for end_city in cities:
+                for day_of_week in (DayOfWeek.Monday, DayOfWeek.Saturday):
+                    for max_legs in (1, 2, 3):
+                        with self.subTest(start=start_city, end=end_city, day=day_of_week, max_legs=max_legs):
+                            expected = self.manager.dfs_all_paths(start_city, end_city, day_of_week, max_legs=max_legs)
+                            found = engine.search(start_city, end_city, day_of_week, max_legs=max_legs)
+                            self.assertEqual(LegLimitTests.route_ids(found), LegLimitTests.route_ids(expected))
+                            overnight += sum(
+                                any(connection.day_offset for connection in trip.connections) for trip in expected
+                            )
+        self.assertGreater(overnight, 0)
+
+    def test_no_trips_from_a_city_to_itself(self):
+        city = next(iter(self.manager.get_network().stations))
+        self.assertEqual(self.manager.get_network().connection_scan.search(city, city, DayOfWeek.Monday), [])
+        self.assertEqual(self.manager.dfs_all_paths(city, city, DayOfWeek.Monday), [])
+        self.assertEqual(self.manager.dfs_all_paths(city, city, DayOfWeek.Monday, prune=True), [])
+
+
+class ParetoSearchTests(SimpleTestCase):
+
+    def setUp(self):
+        folder = tempfile.mkdtemp()
+        path = os.path.join(folder, "timetable.csv")
+        self.addCleanup(os.rmdir, folder)
+        self.addCleanup(os.remove, path)
+        # a small, dense timetable where most queries have trips that are dominated
+        write_timetable(path, routes=600, cities=15, hubs=3)
+        self.manager = private_manager(self, path)
+
+    def test_pareto_trips_are_the_non_dominated_trips_of_dfs_all_paths(self):
+        stations = self.manager.get_network().stations
+        busiest = sorted(stations, key=lambda city: (-len(stations[city].outgoing_connections), city.value))[:6]
+        with_dominated = 0
+        for start_city in busiest:
+            for end_city in busiest:
+                if start_city == end_city:
+                    continue
+                for day_of_week in (DayOfWeek.Monday, DayOfWeek.Saturday):
+                    for max_legs in (1, 2, 3, 4):
+                        with self.subTest(start=start_city, end=end_city, day=day_of_week, max_legs=max_legs):
+                            trips = self.manager.dfs_all_paths(start_city, end_city, day_of_week, max_legs=max_legs)
+                            expected = pareto_filter(trips)
+                            with_dominated += len(expected) < len(trips)
+                            found = self.manager.pareto_trips(start_city, end_city, day_of_week, max_legs=max_legs)
+                            self.assertEqual(LegLimitTests.route_ids(found), LegLimitTests.route_ids(expected))
+        self.assertGreater(with_dominated, 10)
+
+
+class SearchStatsTests(SimpleTestCase):
+
+    def setUp(self):
+        self.manager = StationNetworkManager(CSV_FILE_PATH)
+        routing_engine = self.manager.routing_engine
+        self.addCleanup(self.manager.set_routing_engine, routing_engine)
+        self.addCleanup(self.manager.enable_instrumentation, self.manager.search_stats.enabled)
+        self.addCleanup(self.manager.search_stats.reset)
+        self.manager.search_stats.reset()
+        self.manager.clear_search_cache()
+        self.manager.set_routing_engine("dfs")
+
+    def test_nothing_is_recorded_when_disabled(self):
+        self.manager.enable_instrumentation(False)
+        self.manager.find_trips(City.GRANADA, City.CORDOBA, DayOfWeek.Tuesday)
+        self.assertEqual(self.manager.search_stats.snapshot()["engines"], {})
+
+    def test_searches_and_cache_hits_are_recorded_per_engine(self):
+        self.manager.enable_instrumentation()
+        trips = self.manager.find_trips(City.GRANADA, City.CORDOBA, DayOfWeek.Tuesday)
+        self.manager.find_trips(City.GRANADA, City.CORDOBA, DayOfWeek.Tuesday)
+        self.manager.pareto_trips(City.GRANADA, City.CORDOBA, DayOfWeek.Tuesday)
+
+        snapshot = self.manager.search_stats.snapshot()
+        dfs = snapshot["engines"]["dfs"]
+        self.assertEqual((dfs["searches"], dfs["cache_hits"]), (1, 1))
+        self.assertEqual(dfs["latency"]["count"], 1)
+        self.assertGreaterEqual(dfs["counters"]["pushed"], len(trips))
+        self.assertEqual(set(dfs["counters"]), {"pushed", "pruned", "layover_rejected", "leg_limit"})
+        self.assertEqual(snapshot["engines"]["pareto"]["searches"], 1)
+
+        query = snapshot["recent"][0]
+        self.assertEqual((query["engine"], query["from"], query["to"], query["day"]), ("dfs", "Granada", "Córdoba", "Tuesday"))
+        self.assertEqual(query["trips"], len(trips))
+
+    def test_csa_and_pareto_record_their_counters(self):
+        self.manager.enable_instrumentation()
+        self.manager.set_routing_engine("csa")
+        trips = self.manager.find_trips(City.PARIS, City.MADRID, DayOfWeek.Tuesday)
+        self.manager.pareto_trips(City.PARIS, City.MADRID, DayOfWeek.Tuesday)
+
+        engines = self.manager.search_stats.snapshot()["engines"]
+        csa, pareto = engines["csa"]["counters"], engines["pareto"]["counters"]
+        self.assertEqual(set(csa), {"scanned", "pushed", "waiting", "pruned"})
+        self.assertGreaterEqual(csa["pushed"], len(trips))
+        self.assertGreater(csa["scanned"], 0)
+        self.assertEqual(set(pareto), {"pushed", "pruned", "dominated"})
+        self.assertGreater(pareto["pushed"], 0)
+
+    def test_unpruned_dfs_counts_paths_stopped_at_the_leg_limit(self):
+        self.manager.enable_instrumentation()
+        self.manager.dfs_all_paths(City.PARIS, City.BUCHAREST, DayOfWeek.Monday)
+        counters = self.manager.search_stats.snapshot()["engines"]["dfs"]["counters"]
+        self.assertEqual(counters["pruned"], 0)
+        self.assertGreater(counters["leg_limit"], 0)
+
+    def test_best_first_stopped_early_is_recorded_as_abandoned(self):
+        self.manager.set_routing_engine("best_first")
+        self.manager.enable_instrumentation()
+        trips = self.manager.iter_trips(City.GRANADA, City.CORDOBA, DayOfWeek.Tuesday)
+        next(trips)
+        del trips  # the streaming view drops the iterator the same way when the client goes away
+        best_first = self.manager.search_stats.snapshot()["engines"]["best_first"]
+        self.assertEqual(best_first["counters"], {"abandoned": 1})
+
+    def test_histogram_percentiles_are_bucket_bounds(self):
+        histogram = LatencyHistogram()
+        for milliseconds in [0.05] * 90 + [3] * 9 + [20000]:
+            histogram.add(milliseconds)
+        self.assertEqual((histogram.percentile(0.5), histogram.percentile(0.95)), (0.1, 5))
+        self.assertEqual(histogram.percentile(1), 20000)
+
+    async def test_endpoint_returns_the_snapshot(self):
+        self.manager.enable_instrumentation()
+        self.manager.find_trips(City.GRANADA, City.CORDOBA, DayOfWeek.Tuesday)
+        response = await AsyncClient().get("/api/search-stats/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["engines"]["dfs"]["searches"], 1)
+
+
+class RoutingEngineTests(TestCase):
+
+    def setUp(self):
+        self.manager = StationNetworkManager(CSV_FILE_PATH)
+        routing_engine = self.manager.routing_engine
+        self.addCleanup(self.manager.set_routing_engine, routing_engine)
+        self.addCleanup(self.manager.enable_instrumentation, self.manager.search_stats.enabled)
+        self.addCleanup(self.manager.search_stats.reset)
+        self.manager.enable_instrumentation()
+
+    async def search(self) -> list:
+        self.manager.search_stats.reset()
+        self.manager.clear_search_cache()
+        response = await AsyncClient().get("/api/search/", {"from": "Paris", "to": "Madrid", "date": "2025-03-11"})
+        return [json.loads(line) async for line in response.streaming_content][:-1]
+
+    def test_the_app_uses_the_engine_of_the_settings(self):
+        self.assertEqual(self.manager.routing_engine, settings.ROUTING_ENGINE)
+
+    async def test_the_search_endpoint_uses_the_selected_engine(self):
+        results = {}
+        for engine in ROUTING_ENGINES:
+            self.manager.set_routing_engine(engine)
+            results[engine] = await self.search()
+            with self.subTest(engine=engine):
+                self.assertEqual(set(self.manager.search_stats.snapshot()["engines"]), {engine})
+
+        def route_ids(trips):
+            return [[connection["route_id"] for connection in trip["connections"]] for trip in trips]
+
+        # every engine streams the same trips, fastest first
+        self.assertTrue(results["best_first"])
+        for engine in ("dfs", "csa"):
+            self.assertEqual(sorted(map(tuple, route_ids(results[engine]))),
+                             sorted(map(tuple, route_ids(results["best_first"]))))
+            minutes = [trip["travel_minutes"] for trip in results[engine]]
+            self.assertEqual(minutes, sorted(minutes))
+
+
+class TripOptionStoreTests(TestCase):
+
+    def setUp(self):
+        self.travel_date = date(2025, 3, 11)
+        self.trip = make_trip_option("R1", "R2")
+        self.connections = {connection.route_id: connection for connection in self.trip.connections}
+        self.store = TripOptionStore(self.connections.get)
+        self.addCleanup(self.store.cache.clear)
+
+    def test_option_resolves_to_the_stored_trip_and_date(self):
+        option_id, other_id = self.store.add_many([self.trip, make_trip_option("R1")], self.travel_date)
+        self.assertNotEqual(option_id, other_id)
+
+        option = self.store.get(option_id)
+        self.assertEqual([connection.route_id for connection in option.trip.connections], ["R1", "R2"])
+        self.assertEqual((option.travel_date, option.day_of_week), (self.travel_date, DayOfWeek.Tuesday))
+        self.assertEqual(len(self.store.get(other_id).trip.connections), 1)
+
+    def test_unknown_and_expired_options_are_not_found(self):
+        with self.assertRaises(TripOptionNotFound):
+            self.store.get("no-such-option")
+        expired = TripOptionStore(self.connections.get, ttl=0).add(self.trip, self.travel_date)
+        with self.assertRaises(TripOptionNotFound):
+            self.store.get(expired)
+
+    def test_option_changed_by_a_reload_is_refused(self):
+        option_id = self.store.add(self.trip, self.travel_date)
+        self.connections["R2"] = Connection("R2", "Paris", "Lyon", "08:00", "10:00", "Daily", "TGV", "100", "65")
+        with self.assertRaises(TripOptionChanged):
+            self.store.get(option_id)
+        # same times and prices, other cities and train
+        self.connections["R2"] = Connection("R2", "Berlin", "Munich", "08:00", "10:00", "Daily", "ICE", "100", "50")
+        with self.assertRaises(TripOptionChanged):
+            self.store.get(option_id)
+        del self.connections["R2"]
+        with self.assertRaises(TripOptionChanged):
+            self.store.get(option_id)
+
+    def test_booking_by_option_id_uses_the_searched_date(self):
+        service = BookingService(trip_options=self.store)
+        option_id = self.store.add(self.trip, self.travel_date)
+        with self.assertNumQueries(10):
+            trip = service.book_trip_option(option_id, make_travellers(2))
+        self.assertEqual(trip.date, self.travel_date)
+        self.assertEqual(trip.tickets.first().day_of_week, DayOfWeek.Tuesday.value)
+        self.assertEqual(TicketLeg.objects.filter(route_id="R2", travel_date=self.travel_date).count(), 2)
+
+    def test_booking_endpoint(self):
+        manager = StationNetworkManager(CSV_FILE_PATH)
+        trip = manager.find_trips(City.GRANADA, City.CORDOBA, DayOfWeek.Tuesday)[0]
+        option_id = TRIP_OPTIONS.add(trip, self.travel_date)
+        self.addCleanup(TRIP_OPTIONS.discard, option_id)
+
+        def post(body):
+            return self.client.post("/api/bookings/", body, content_type="application/json")
+
+        response = post({"option_id": option_id, "travellers": make_travellers(2)})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["date"], "2025-03-11")
+        self.assertAlmostEqual(response.json()["total_price"], trip.total_second_class_price * 2)
+        self.assertEqual(Trip.objects.get().trip_id, response.json()["trip_id"])
+
+        self.assertEqual(post({"option_id": option_id, "travellers": make_travellers(1)}).status_code, 409)
+
+        response = post({"option_id": option_id, "travellers": make_travellers(3, "F"), "class": FIRST_CLASS})
+        self.assertEqual(response.status_code, 201)
+        self.assertAlmostEqual(response.json()["total_price"], trip.total_first_class_price * 3)
+        self.assertNotAlmostEqual(trip.total_first_class_price, trip.total_second_class_price)
+        ticket = Ticket.objects.filter(trip_id=response.json()["trip_id"]).first()
+        self.assertAlmostEqual(float(ticket.price), trip.total_first_class_price)
+
+        self.assertEqual(post({"option_id": "no-such-option", "travellers": make_travellers(1)}).status_code, 404)
+        self.assertEqual(post({"option_id": option_id, "travellers": [{"id": "X"}]}).status_code, 400)
+
+
+class SearchOptionIdTests(TestCase):
+
+    async def test_every_streamed_trip_has_a_bookable_option_id(self):
+        response = await AsyncClient().get("/api/search/", {"from": "Granada", "to": "Córdoba", "date": "2025-03-11", "limit": 3})
+        lines = [json.loads(line) async for line in response.streaming_content]
+        trips, done = lines[:-1], lines[-1]
+        self.assertEqual(done["count"], len(trips))
+        self.assertTrue(trips)
+        for trip in trips:
+            option = TRIP_OPTIONS.get(trip["option_id"])
+            self.assertEqual(option.travel_date, date(2025, 3, 11))
+            self.assertEqual([connection.route_id for connection in option.trip.connections],
+                             [connection["route_id"] for connection in trip["connections"]])
+
+
+class TimeWindowTests(TestCase):
+
+    def setUp(self):
+        self.manager = StationNetworkManager(CSV_FILE_PATH)
+        routing_engine = self.manager.routing_engine
+        self.addCleanup(self.manager.set_routing_engine, routing_engine)
+        self.query = (City.PARIS, City.MADRID, DayOfWeek.Tuesday)
+        self.full_day = self.manager.dfs_all_paths(*self.query)
+        # leaving with the second departure of the day or later, arriving before the last arrival
+        departures = sorted(trip.connections[0].departure_minutes for trip in self.full_day)
+        arrivals = sorted(trip.connections[-1].arrival_minutes for trip in self.full_day)
+        self.window = TimeWindow(depart_after=departures[1], depart_before=departures[-1], arrive_by=arrivals[-1] - 1)
+
+    @staticmethod
+    def route_ids(trips) -> list:
+        return sorted(tuple(connection.route_id for connection in trip.connections) for trip in trips)
+
+    def test_every_engine_finds_the_trips_of_the_full_day_within_the_window(self):
+        expected = self.route_ids(trip for trip in self.full_day if self.window.contains(trip))
+        self.assertTrue(0 < len(expected) < len(self.full_day))
+
+        self.manager.set_routing_engine("best_first")
+        found = {
+            "dfs": self.manager.dfs_all_paths(*self.query, window=self.window),
+            "best_first": list(self.manager.iter_trips(*self.query, window=self.window)),
+        }
+        for engine in ("dfs", "csa"):
+            self.manager.set_routing_engine(engine)
+            found[engine] = self.manager.find_trips(*self.query, self.window)
+        for engine, trips in found.items():
+            with self.subTest(engine=engine):
+                self.assertEqual(self.route_ids(trips), expected)
+
+        for trip in self.manager.pareto_trips(*self.query, self.window):
+            self.assertTrue(self.window.contains(trip))
+
+    def test_window_outside_the_timetable_finds_nothing(self):
+        self.assertEqual(self.manager.dfs_all_paths(*self.query, window=TimeWindow(arrive_by=0)), [])
+        self.assertEqual(self.manager.find_trips(*self.query, TimeWindow(depart_after=10, depart_before=5)), [])
+
+    async def test_search_endpoint_applies_the_window(self):
+        client = AsyncClient()
+        response = await client.get(
+            "/api/search/",
+            {"from": "Paris", "to": "Madrid", "date": "2025-03-11", "depart_after": "12:00", "arrive_by": "20:00"},
+        )
+        trips = [json.loads(line) async for line in response.streaming_content][:-1]
+        self.assertTrue(trips)
+        for trip in trips:
+            self.assertGreaterEqual(trip["departure_time"], "12:00")
+            self.assertEqual(trip["arrival_day_offset"], 0)
+            self.assertLessEqual(trip["arrival_time"], "20:00")
+
+        response = await client.get(
+            "/api/search/", {"from": "Paris", "to": "Madrid", "date": "2025-03-11", "arrive_by": "25:00"}
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class LegLimitTests(SimpleTestCase):
+
+    def setUp(self):
+        self.manager = StationNetworkManager(CSV_FILE_PATH)
+        routing_engine = self.manager.routing_engine
+        self.addCleanup(self.manager.set_routing_engine, routing_engine)
+        # no trip of at most 3 legs on that day
+        self.query = (City.KRAKOW, City.KATOWICE, DayOfWeek.Tuesday)
+
+    @staticmethod
+    def route_ids(trips) -> list:
+        return sorted(tuple(connection.route_id for connection in trip.connections) for trip in trips)
+
+    def test_longer_trips_are_found_with_a_higher_leg_limit(self):
+        self.assertEqual(self.manager.find_trips(*self.query), [])
+        expected = self.route_ids(self.manager.dfs_all_paths(*self.query, max_legs=5))
+        self.assertTrue(expected)
+        self.assertGreater(min(len(route_ids) for route_ids in expected), 3)
+
+        self.manager.set_routing_engine("best_first")
+        found = {
+            "dfs": self.manager.dfs_all_paths(*self.query, prune=True, max_legs=5),
+            "best_first": list(self.manager.iter_trips(*self.query, max_legs=5)),
+            "pareto": self.manager.pareto_trips(*self.query, max_legs=5),
+        }
+        for engine in ("dfs", "csa"):
+            self.manager.set_routing_engine(engine)
+            found[engine] = self.manager.find_trips(*self.query, max_legs=5)
+        for engine, trips in found.items():
+            with self.subTest(engine=engine):
+                self.assertEqual(self.route_ids(trips), expected)
+
+    def test_latest_departure_table(self):
+        def connection(route_id, departure_city, arrival_city, departure_time, arrival_time):
+            return Connection(route_id, departure_city, arrival_city, departure_time, arrival_time,
+                              "Daily", "TGV", "100", "50")
+
+        index = ReachabilityIndex([
+            connection("R1", "Paris", "Lyon", "08:00", "09:00"),
+            connection("R2", "Paris", "Lyon", "10:30", "11:00"),  # arrives after the last useful departure
+            connection("R3", "Lyon", "Marseille", "07:00", "08:00"),
+            connection("R4", "Lyon", "Marseille", "10:00", "11:00"),
+        ])
+        latest = index.latest_departure_table(City.MARSEILLE, DayOfWeek.Monday)
+        self.assertEqual(latest, {City.LYON: 10 * 60, City.PARIS: 8 * 60})
+
+    async def test_search_endpoint_caps_the_leg_limit(self):
+        response = await AsyncClient().get(
+            "/api/search/", {"from": "Krakow", "to": "Katowice", "date": "2025-03-11", "max_legs": "7"}
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class DestinationSearchTests(SimpleTestCase):
+
+    def setUp(self):
+        self.manager = StationNetworkManager(CSV_FILE_PATH)
+
+    def test_destinations_match_the_best_trips_of_each_search(self):
+        window = TimeWindow(depart_after=7 * 60)
+        table = self.manager.destinations(City.PARIS, DayOfWeek.Tuesday, window=window)
+        self.assertTrue(table)
+        for city in City:
+            if city == City.PARIS:
+                continue
+            trips = self.manager.dfs_all_paths(City.PARIS, city, DayOfWeek.Tuesday, window=window)
+            destination = table.get(city)
+            with self.subTest(city=city):
+                if not trips:
+                    self.assertIsNone(destination)
+                    continue
+                self.assertEqual(destination.earliest_arrival, min(t.connections[-1].arrival_minutes for t in trips))
+                self.assertEqual(
+                    destination.fastest_minutes,
+                    min(t.total_travel_duration for t in trips).total_seconds() // 60,
+                )
+                self.assertAlmostEqual(destination.cheapest_price, min(t.total_second_class_price for t in trips))
+                for criterion in ("earliest", "fastest", "cheapest"):
+                    trip = table.trip(city, criterion)
+                    self.assertEqual((trip.departure_city, trip.arrival_city), (City.PARIS, city))
+                    self.assertTrue(window.contains(trip))
+
+    def test_leg_limit(self):
+        # Katowice needs more than 3 legs from Krakow on that day
+        self.assertNotIn(City.KATOWICE, self.manager.destinations(City.KRAKOW, DayOfWeek.Tuesday))
+        table = self.manager.destinations(City.KRAKOW, DayOfWeek.Tuesday, max_legs=5)
+        trips = self.manager.dfs_all_paths(City.KRAKOW, City.KATOWICE, DayOfWeek.Tuesday, max_legs=5)
+        self.assertEqual(table.get(City.KATOWICE).earliest_arrival, min(t.connections[-1].arrival_minutes for t in trips))
+        self.assertGreater(table.trip(City.KATOWICE, "earliest").num_connections, 3)
+
+    async def test_destinations_endpoint(self):
+        client = AsyncClient()
+        response = await client.get("/api/destinations/", {"from": "Paris", "date": "2025-03-11"})
+        self.assertEqual(response.status_code, 200)
+        destinations = response.json()["destinations"]
+        self.assertIn("Madrid", [destination["city"] for destination in destinations])
+
+        response = await client.get("/api/destinations/", {"from": "Paris", "to": "Madrid", "date": "2025-03-11"})
+        self.assertEqual(response.status_code, 200)
+        options = response.json()
+        self.assertEqual(set(options), {"earliest", "fastest", "cheapest"})
+        stored = TRIP_OPTIONS.get(options["fastest"]["option_id"])
+        self.assertEqual(stored.trip.arrival_city, City.MADRID)
+
+        response = await client.get("/api/destinations/", {"from": "Krakow", "to": "Katowice", "date": "2025-03-11"})
+        self.assertEqual(response.status_code, 404)
+
+
+class NetworkReloadTests(SimpleTestCase):
+
+    def setUp(self):
+        with open(CSV_FILE_PATH, encoding="utf-8") as file:
+            self.rows = list(csv.DictReader(file))
+        folder = tempfile.mkdtemp()
+        self.path = os.path.join(folder, "network.csv")
+        self.addCleanup(os.rmdir, folder)
+        self.addCleanup(lambda: os.path.exists(self.path) and os.remove(self.path))
+
+    def edited_rows(self) -> list[dict]:
+        # 5 routes removed, 1 moved to other cities and times, 1 repriced, 3 added
+        rows = [dict(row) for row in self.rows[5:]]
+        rows[10].update({"Departure City": "Berlin", "Arrival City": "Munich",
+                         "Departure Time": "06:01", "Arrival Time": "10:02"})
+        rows[11]["Second Class ticket rate (in euro)"] = "1"
+        for number, row in enumerate(self.rows[:3]):
+            rows.append({**row, "Route ID": f"NEW{number}", "Departure City": "Paris", "Days of Operation": "Mon"})
+        return rows
+
+    @staticmethod
+    def departures(network: RailNetwork) -> dict:
+        # (City, DayOfWeek) -> the departures of the day, ties in departure time by route id
+        return {
+            (city, day_of_week): sorted(
+                (connection.departure_minutes, connection.route_id, connection_values(connection))
+                for connection in station.departures(day_of_week)
+            )
+            for city, station in network.stations.items()
+            for day_of_week in DayOfWeek
+        }
+
+    def test_apply_matches_a_fresh_load_and_keeps_the_previous_version(self):
+        previous = RailNetwork(read_csv(CSV_FILE_PATH), 1)
+        before = self.departures(previous)
+
+        write_rows(self.path, self.edited_rows())
+        network, diff = previous.apply(read_csv(self.path), 2)
+
+        self.assertEqual((len(diff.added), len(diff.removed), len(diff.changed)), (3, 5, 2))
+        self.assertEqual(network.version, 2)
+        self.assertEqual(self.departures(network), self.departures(RailNetwork(read_csv(self.path), 2)))
+        for station in network.stations.values():
+            for day_of_week in DayOfWeek:
+                minutes = [connection.departure_minutes for connection in station.departures(day_of_week)]
+                self.assertEqual(minutes, sorted(minutes))
+        self.assertEqual(self.departures(previous), before)
+        self.assertEqual(previous.get_connection(self.rows[0]["Route ID"]).route_id, self.rows[0]["Route ID"])
+        self.assertIsNone(previous.get_connection("NEW0"))
+
+    def test_unchanged_timetable_returns_the_same_version(self):
+        network = RailNetwork(read_csv(CSV_FILE_PATH), 1)
+        same, diff = network.apply(read_csv(CSV_FILE_PATH), 2)
+        self.assertIs(same, network)
+        self.assertFalse(diff)
+        self.assertEqual(same.version, 1)
+
+    def test_failed_reload_keeps_the_current_version(self):
+        manager = StationNetworkManager(CSV_FILE_PATH)
+        network = manager.get_network()
+        self.assertFalse(manager.reload_network(CSV_FILE_PATH))
+        self.assertIs(manager.get_network(), network)
+
+        write_rows(self.path, [{**self.rows[0], "Departure City": "Atlantis"}])
+        with self.assertRaises(KeyError):
+            manager.reload_network(self.path)
+        self.assertIs(manager.get_network(), network)
+        self.assertEqual(manager.file_path, CSV_FILE_PATH)
+
+    def test_watcher_reloads_changes_and_skips_broken_files(self):
+        write_rows(self.path, self.rows)
+        manager = private_manager(self, self.path)
+        self.addCleanup(manager.stop_watching)
+        version = manager.network_version
+        manager.watch_network_file(interval=0.01)
+
+        def wait_for(condition):
+            deadline = time.monotonic() + 5
+            while not condition() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            return condition()
+
+        def save(rows):
+            # replaced in one go, so the watcher never reads a half written file
+            write_rows(self.path + ".tmp", rows)
+            os.replace(self.path + ".tmp", self.path)
+
+        save(self.rows + [{**self.rows[0], "Departure City": "Atlantis"}])
+        time.sleep(0.1)
+        self.assertEqual(manager.network_version, version)
+
+        save(self.edited_rows())
+        self.assertTrue(wait_for(lambda: manager.network_version == version + 1))
+        self.assertEqual(manager.get_connection("NEW0").departure_city, City.PARIS)
+        self.assertIsNone(manager.get_connection(self.rows[0]["Route ID"]))
+
+
+class NetworkSnapshotTests(SimpleTestCase):
+
+    def setUp(self):
+        folder = tempfile.mkdtemp()
+        self.csv_path = os.path.join(folder, "network.csv")
+        self.snapshot_path = default_snapshot_path(self.csv_path)
+        self.addCleanup(os.rmdir, folder)
+        for path in (self.csv_path, self.snapshot_path):
+            self.addCleanup(lambda path=path: os.path.exists(path) and os.remove(path))
+
+        with open(CSV_FILE_PATH, encoding="utf-8") as file:
+            self.rows = list(csv.DictReader(file))
+        write_rows(self.csv_path, self.rows)
+        call_command("compile_network", self.csv_path, stdout=io.StringIO())
+
+    @staticmethod
+    def values(connections) -> list:
+        return [connection_values(connection) for connection in connections]
+
+    def test_snapshot_loads_the_same_connections_as_the_csv(self):
+        self.assertTrue(os.path.exists(self.snapshot_path))
+        expected = self.values(read_csv(self.csv_path))
+        self.assertEqual(self.values(load_snapshot(self.snapshot_path, self.csv_path)), expected)
+        self.assertEqual(self.values(load_connections(self.csv_path)), expected)
+
+    def assert_csv_is_used(self):
+        with self.assertRaises(StaleSnapshotError):
+            load_snapshot(self.snapshot_path, self.csv_path)
+        self.assertEqual(self.values(load_connections(self.csv_path)), self.values(read_csv(self.csv_path)))
+
+    def test_snapshot_of_another_csv_is_ignored(self):
+        write_rows(self.csv_path, [{**row, "Second Class ticket rate (in euro)": "1"} for row in self.rows])
+        self.assert_csv_is_used()
+
+    def test_truncated_snapshot_is_ignored(self):
+        with open(self.snapshot_path, "r+b") as file:
+            file.truncate(os.path.getsize(self.snapshot_path) // 2)
+        self.assert_csv_is_used()
+
+    def test_snapshot_of_other_enums_is_ignored(self):
+        # the enum digest is the last field of the header
+        with open(self.snapshot_path, "r+b") as file:
+            file.seek(HEADER.size - 16)
+            file.write(bytes(16))
+        self.assert_csv_is_used()
+
+
+class CityIndexTests(SimpleTestCase):
+
+    def test_resolve_ignores_case_accents_and_transliteration(self):
+        for label in ("Zurich", "Zürich", "ZURICH"):
+            self.assertEqual(CITY_INDEX.resolve(label), City.ZURICH)
+        for label in ("Wroclaw", "Wrocław"):
+            self.assertEqual(CITY_INDEX.resolve(label), City.WROC_AW)
+        self.assertEqual(CITY_INDEX.resolve("Iasi"), City.IASI)
+        self.assertIsNone(CITY_INDEX.resolve("Atlantis"))
+
+    def test_complete_matches_the_start_of_any_word(self):
+        self.assertEqual(CITY_INDEX.complete("pari"), [City.PARIS])
+        self.assertEqual(CITY_INDEX.complete("napoca"), [City.CLUJ_NAPOCA])
+        self.assertEqual(CITY_INDEX.complete("wrocł"), [City.WROC_AW])
+        self.assertEqual(CITY_INDEX.complete("xyz"), [])
+
+    def test_fuzzy_finds_close_typos(self):
+        self.assertEqual(CITY_INDEX.fuzzy("Mnuich"), [City.MUNICH])
+        self.assertEqual(CITY_INDEX.fuzzy("Barcelna"), [City.BARCELONA])
+        self.assertEqual(CITY_INDEX.fuzzy("Qwertyuiop"), [])
+
+    def test_suggest_puts_exact_and_prefix_matches_before_typos(self):
+        self.assertEqual(CITY_INDEX.suggest("Pari", 2), [City.PARIS, City.BARI])
+        self.assertEqual(CITY_INDEX.suggest("Zürich", 1), [City.ZURICH])
+        self.assertEqual(CITY_INDEX.suggest("Barcelna"), [City.BARCELONA])
+
+    def test_long_queries_are_not_fuzzy_matched(self):
+        query = "".join(chr(ord("a") + i * 7 % 26) for i in range(1600))
+        started = time.perf_counter()
+        self.assertEqual(CITY_INDEX.suggest(query), [])
+        self.assertEqual(CITY_INDEX.fuzzy("Barcelona" + "x" * 3), [])
+        self.assertLess(time.perf_counter() - started, 0.5)
+
+    async def test_cities_endpoint(self):
+        client = AsyncClient()
+        response = await client.get("/api/cities/", {"q": "napoca"})
+        self.assertEqual(response.json(), {"cities": ["Cluj-Napoca"]})
+        response = await client.get("/api/cities/")
+        self.assertEqual(len(response.json()["cities"]), len(City))
+        response = await client.get("/api/cities/", {"q": "par", "limit": "0"})
+        self.assertEqual(response.status_code, 400)
+        response = await client.get("/api/cities/", {"q": "x" * MAX_QUERY_LENGTH})
+        self.assertEqual(response.json(), {"cities": []})
+        response = await client.get("/api/cities/", {"q": "x" * (MAX_QUERY_LENGTH + 1)})
+        self.assertEqual(response.status_code, 400)
+
+
+class SearchCacheTests(SimpleTestCase):
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = SearchCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        self.assertEqual((cache.get("a"), cache.get("b"), cache.get("c")), (1, None, 3))
+        self.assertEqual(cache.info()["evictions"], 1)
+
+    def test_reload_invalidates_the_cached_searches(self):
+        with open(CSV_FILE_PATH, encoding="utf-8") as file:
+            rows = list(csv.DictReader(file))
+        folder = tempfile.mkdtemp()
+        path = os.path.join(folder, "network.csv")
+        self.addCleanup(os.rmdir, folder)
+        self.addCleanup(os.remove, path)
+        write_rows(path, rows)
+        manager = private_manager(self, path)
+        query = (City.PARIS, City.MADRID, DayOfWeek.Tuesday)
+
+        trips = manager.find_trips(*query)
+        self.assertEqual(manager.find_trips(*query), trips)
+        self.assertEqual((manager.cache_info()["misses"], manager.cache_info()["hits"]), (1, 1))
+
+        # the first leg of the first trip is taken out of the timetable
+        removed = trips[0].connections[0].route_id
+        write_rows(path, [row for row in rows if row["Route ID"] != removed])
+        version = manager.network_version
+        manager.reload_network()
+        self.assertEqual(manager.network_version, version + 1)
+
+        reloaded = manager.find_trips(*query)
+        self.assertEqual(manager.cache_info()["misses"], 2)
+        self.assertTrue(all(removed not in [c.route_id for c in trip.connections] for trip in reloaded))
+        self.assertLess(len(reloaded), len(trips))
+
+
+@skipUnless(numpy_available(), "NumPy isn't installed")
+class ConnectionTableTests(SimpleTestCase):
+
+    def test_select_matches_the_python_filter(self):
+        connections = read_csv(CSV_FILE_PATH)
+        table = ConnectionTable(connections)
+        criteria = [
+            {},
+            {"origin": City.PARIS},
+            {"origin": City.PARIS, "day_of_week": DayOfWeek.Sunday, "depart_after": "10:00", "depart_before": "18:30"},
+            {"destination": City.MADRID, "max_price": 60},
+            {"train_types": [TrainType.TGV, TrainType.ICE], "max_price": 100, "first_class": True},
+            {"day_of_week": DayOfWeek.Wednesday, "depart_after": 22 * 60},
+        ]
+        for query in criteria:
+            with self.subTest(**{name: str(value) for name, value in query.items()}):
+                expected = filter_connections(connections, **query)
+                self.assertEqual(table.select(**query), expected)
+        self.assertTrue(filter_connections(connections, **criteria[2]))
+
+
+class BatchSearchTests(SimpleTestCase):
+
+    def test_workers_return_the_results_in_query_order(self):
+        manager = StationNetworkManager(CSV_FILE_PATH)
+        routing_engine = manager.routing_engine
+        self.addCleanup(manager.set_routing_engine, routing_engine)
+        manager.set_routing_engine("csa")
+        cities = sorted(manager.get_network().stations, key=lambda city: city.value)
+        queries = [(cities[i], cities[-1 - i], DayOfWeek(i % 7)) for i in range(12)]
+        queries += [(City.PARIS, City.MADRID, DayOfWeek.Tuesday), (City.GRANADA, City.CORDOBA, DayOfWeek.Tuesday)]
+
+        def route_ids(results):
+            return [[[c.route_id for c in trip.connections] for trip in trips] for trips in results]
+
+        expected = route_ids(manager.batch_search(queries, workers=1))
+        self.assertTrue(any(expected))
+        for search in ("find_trips", "pareto_trips"):
+            with self.subTest(search=search):
+                manager.clear_search_cache()
+                results = manager.batch_search(queries, workers=2, search=search)
+                single = route_ids(manager.batch_search(queries, workers=1, search=search))
+                self.assertEqual(route_ids(results), single)
+        self.assertEqual(route_ids(manager.batch_search(queries, workers=2)), expected)
@@ -3,5 +3,8 @@ from . import views
 
 urlpatterns = [
     path('cities/', views.get_cities_list_view, name='get_cities_list'),
-    path('search/', views.search_connections_view, name='search_connections')
+    path('search/', views.search_connections_view, name='search_connections'),
+    path('destinations/', views.destinations_view, name='destinations'),
+    path('search-stats/', views.search_stats_view, name='search_stats'),
+    path('bookings/', views.book_trip_option_view, name='book_trip_option')
 ]
\ No newline at end of file
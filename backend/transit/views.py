@@ -1,8 +1,361 @@
-from django.shortcuts import render
+import json
+from itertools import islice
+from datetime import date, datetime
+from typing import AsyncIterator, Optional
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from backend_django.apps import CSV_FILE_PATH
+from transit.constants import City, DayOfWeek, get_city_from_label
+from transit.models.Connection import Connection
+from transit.models.Ticket import TripOption
 from transit.services.station_network_manager import StationNetworkManager
-from django.http import JsonResponse
-from django.views.decorators.http import require_GET
+from transit.services.city_index import CITY_INDEX, DEFAULT_SUGGESTIONS, MAX_QUERY_LENGTH
+from transit.services.seat_inventory import SEAT_AVAILABILITY, SEAT_CLASSES, SECOND_CLASS
+from transit.services.booking_service import BookingService
+from transit.services.trip_option_store import TripOptionNotFound, TripOptionStore
+from transit.services.time_window import TimeWindow
+from transit.services.destination_search import CRITERIA as DESTINATION_CRITERIA, Destination
+from transit.services.layover_policy import MAX_LEGS, MAX_SEARCH_LEGS, MINUTES_PER_DAY
 
 # Create your views here.
 
+# JSON API for the frontend
+# the views are async (served by asgi.py); the searches themselves are plain Python and
+# CPU bound, so they run in a worker thread and never block the event loop.
+# search results are streamed as newline-delimited JSON (application/x-ndjson): one line
+# per trip, fastest first, then a final {"done": true, "count": N} line.
+# every trip comes with an "option_id" to book it with (POST bookings/) without searching again.
 
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+
+def get_network_manager() -> StationNetworkManager:
+    # the singleton was created when the app was loaded (see backend_django/apps.py)
+    return StationNetworkManager(CSV_FILE_PATH)
+
+
+TRIP_OPTIONS = TripOptionStore(lambda route_id: get_network_manager().get_connection(route_id))
+BOOKING_SERVICE = BookingService(trip_options=TRIP_OPTIONS)
+
+
+def format_minutes(minutes: int) -> str:
+    # "HH:MM" of a time in minutes from midnight, the day offset is reported separately
+    return f"{minutes // 60 % 24:02d}:{minutes % 60:02d}"
+
+
+def connection_to_dict(connection: Connection) -> dict:
+    return {
+        "route_id": connection.route_id,
+        "departure_city": connection.departure_city.value,
+        "arrival_city": connection.arrival_city.value,
+        "departure_time": format_minutes(connection.departure_minutes),
+        "arrival_time": format_minutes(connection.arrival_minutes),
+        "arrival_day_offset": connection.day_offset,
+        "train_type": connection.train_type.value,
+        "first_class_price": connection.first_class_price,
+        "second_class_price": connection.second_class_price,
+    }
+
+
+def trip_to_dict(trip: TripOption) -> dict:
+    return {
+        "departure_city": trip.departure_city.value,
+        "arrival_city": trip.arrival_city.value,
+        "departure_time": format_minutes(trip.connections[0].departure_minutes),
+        "arrival_time": format_minutes(trip.connections[-1].arrival_minutes),
+        "arrival_day_offset": trip.connections[-1].day_offset,
+        "travel_minutes": int(trip.total_travel_duration.total_seconds() // 60),
+        "transfer_minutes": int(trip.calculate_transfer_time().total_seconds() // 60),
+        "num_connections": trip.num_connections,
+        "first_class_price": trip.total_first_class_price,
+        "second_class_price": trip.total_second_class_price,
+        "connections": [connection_to_dict(connection) for connection in trip.connections],
+    }
+
+
+def parse_date(date_str: str) -> tuple[date, DayOfWeek]:
+    date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
+    # .weekday() is Mon=0...Sun=6, our enum is Sun=0...Sat=6
+    return date_obj, DayOfWeek((date_obj.weekday() + 1) % 7)
+
+
+def parse_time(time_str: Optional[str]) -> Optional[int]:
+    # minutes from midnight of "HH:MM", None if missing, raises ValueError if invalid
+    if time_str is None:
+        return None
+    time_obj = datetime.strptime(time_str, '%H:%M')
+    return time_obj.hour * 60 + time_obj.minute
+
+
+def parse_positive_int(value: Optional[str], default: Optional[int] = None) -> Optional[int]:
+    # raises ValueError unless value is missing or a positive integer
+    if value is None:
+        return default
+    if not value.isdigit() or int(value) < 1:
+        raise ValueError(value)
+    return int(value)
+
+
+MAX_LEGS_ERROR = f"'max_legs' must be an integer from 1 to {MAX_SEARCH_LEGS}."
+TIME_WINDOW_ERROR = "'depart_after', 'depart_before' and 'arrive_by' must be times, use HH:MM."
+
+
+def parse_max_legs(value: Optional[str]) -> int:
+    # MAX_LEGS if missing, raises ValueError unless an integer from 1 to MAX_SEARCH_LEGS
+    max_legs = parse_positive_int(value, MAX_LEGS)
+    if max_legs > MAX_SEARCH_LEGS:
+        raise ValueError(max_legs)
+    return max_legs
+
+
+def parse_window(params) -> TimeWindow:
+    # the TimeWindow of the depart_after / depart_before / arrive_by query parameters
+    return TimeWindow(
+        depart_after=parse_time(params.get("depart_after")),
+        depart_before=parse_time(params.get("depart_before")),
+        arrive_by=parse_time(params.get("arrive_by")),
+    )
+
+
+def next_trip_option(trips, travel_date: date) -> Optional[tuple[TripOption, str]]:
+    # the next trip of the search and the option ID it was stored under, None at the end
+    trip = next(trips, None)
+    return None if trip is None else (trip, TRIP_OPTIONS.add(trip, travel_date))
+
+
+async def stream_trips(trips, travel_date: date) -> AsyncIterator[str]:
+    # each call runs the search until its next trip in a worker thread
+    next_option = sync_to_async(next_trip_option, thread_sensitive=False)
+    count = 0
+    while (option := await next_option(trips, travel_date)) is not None:
+        trip, option_id = option
+        count += 1
+        yield json.dumps({"option_id": option_id, **trip_to_dict(trip)}) + "\n"
+    yield json.dumps({"done": True, "count": count}) + "\n"
+
+
+ALL_CITY_LABELS = sorted(city.value for city in City)
+
+
+# GET cities/[?q=<text>&limit=N]
+# Returns {"cities": [...]} with the labels of all cities, sorted, or with q the
+# autocomplete suggestions for q (exact match, prefix matches, then close typos)
+# q is at most MAX_QUERY_LENGTH characters
+@require_GET
+async def get_cities_list_view(request):
+    query = request.GET.get("q")
+    if query is None:
+        return JsonResponse({"cities": ALL_CITY_LABELS})
+
+    try:
+        limit = parse_positive_int(request.GET.get("limit"), DEFAULT_SUGGESTIONS)
+    except ValueError:
+        return JsonResponse({"error": "'limit' must be a positive integer."}, status=400)
+
+    if len(query) > MAX_QUERY_LENGTH:
+        return JsonResponse({"error": f"'q' must be at most {MAX_QUERY_LENGTH} characters."}, status=400)
+
+    suggestions = CITY_INDEX.suggest(query, limit)
+    return JsonResponse({"cities": [city.value for city in suggestions]})
+
+
+# GET search/?from=<city>&to=<city>&date=YYYY-MM-DD[&limit=N][&passengers=N][&class=first|second]
+#            [&depart_after=HH:MM][&depart_before=HH:MM][&arrive_by=HH:MM][&max_legs=N]
+# Streams the trips found, fastest first, as NDJSON
+# max_legs (default 3, at most 6) is the most connections a trip may take
+# depart_after / depart_before bound the departure of the first leg and arrive_by the
+# arrival of the last one on the travel date (inclusive); the search only walks that window
+# trips without `passengers` seats of `class` left on one of their connections are skipped
+@require_GET
+async def search_connections_view(request):
+    from_city = get_city_from_label(request.GET.get("from"))
+    to_city = get_city_from_label(request.GET.get("to"))
+    if from_city is None or to_city is None:
+        return JsonResponse({"error": "Unknown or missing 'from' / 'to' city."}, status=400)
+
+    try:
+        travel_date, day_of_week = parse_date(request.GET.get("date", ""))
+    except ValueError:
+        return JsonResponse({"error": "Invalid or missing 'date', use YYYY-MM-DD."}, status=400)
+
+    try:
+        limit = parse_positive_int(request.GET.get("limit"))
+        passengers = parse_positive_int(request.GET.get("passengers"), 1)
+    except ValueError:
+        return JsonResponse({"error": "'limit' and 'passengers' must be positive integers."}, status=400)
+
+    try:
+        max_legs = parse_max_legs(request.GET.get("max_legs"))
+    except ValueError:
+        return JsonResponse({"error": MAX_LEGS_ERROR}, status=400)
+
+    seat_class = request.GET.get("class", SECOND_CLASS)
+    if seat_class not in SEAT_CLASSES:
+        return JsonResponse({"error": f"'class' must be one of {', '.join(SEAT_CLASSES)}."}, status=400)
+
+    try:
+        window = parse_window(request.GET)
+    except ValueError:
+        return JsonResponse({"error": TIME_WINDOW_ERROR}, status=400)
+
+    if from_city == to_city:
+        trips = iter(())
+    else:
+        # the seats left are read here, on the request's database connection: the trips are
+        # then filtered in the search's worker thread without a query
+        seats_left = await sync_to_async(SEAT_AVAILABILITY.seats_left_on)(travel_date)
+        trips = islice(
+            SEAT_AVAILABILITY.available_trips(
+                get_network_manager().iter_trips(from_city, to_city, day_of_week, window=window, max_legs=max_legs),
+                travel_date,
+                passengers,
+                seat_class,
+                seats_left=seats_left,
+            ),
+            limit,
+        )
+
+    return StreamingHttpResponse(stream_trips(trips, travel_date), content_type=NDJSON_CONTENT_TYPE)
+
+
+def destination_to_dict(destination: Destination) -> dict:
+    return {
+        "city": destination.city.value,
+        "earliest_arrival_time": format_minutes(destination.earliest_arrival),
+        "arrival_day_offset": destination.earliest_arrival // MINUTES_PER_DAY,
+        "fastest_travel_minutes": destination.fastest_minutes,
+        "cheapest_second_class_price": destination.cheapest_price,
+    }
+
+
+def destination_trip_options(destination: Destination, travel_date: date) -> dict:
+    # the earliest, fastest and cheapest trips to destination, each with its option ID
+    options = {}
+    for criterion in DESTINATION_CRITERIA:
+        trip = destination.trip(criterion)
+        options[criterion] = {"option_id": TRIP_OPTIONS.add(trip, travel_date), **trip_to_dict(trip)}
+    return options
+
+
+# GET destinations/?from=<city>&date=YYYY-MM-DD[&to=<city>]
+#                  [&depart_after=HH:MM][&depart_before=HH:MM][&arrive_by=HH:MM][&max_legs=N]
+# "where can I go from here": without `to`, returns {"destinations": [...]} with the
+# earliest arrival, shortest travel time and lowest second class price to every city
+# reachable from `from`, earliest arrival first, all found in one search (see destination_search.py)
+# with `to`, returns {"earliest": trip, "fastest": trip, "cheapest": trip} for that city,
+# each with an "option_id" to book it with; 404 if it can't be reached
+# max_legs and the time window are those of search/
+@require_GET
+async def destinations_view(request):
+    from_city = get_city_from_label(request.GET.get("from"))
+    if from_city is None:
+        return JsonResponse({"error": "Unknown or missing 'from' city."}, status=400)
+
+    to_label = request.GET.get("to")
+    to_city = get_city_from_label(to_label) if to_label is not None else None
+    if to_label is not None and to_city is None:
+        return JsonResponse({"error": "Unknown 'to' city."}, status=400)
+
+    try:
+        travel_date, day_of_week = parse_date(request.GET.get("date", ""))
+    except ValueError:
+        return JsonResponse({"error": "Invalid or missing 'date', use YYYY-MM-DD."}, status=400)
+
+    try:
+        max_legs = parse_max_legs(request.GET.get("max_legs"))
+    except ValueError:
+        return JsonResponse({"error": MAX_LEGS_ERROR}, status=400)
+
+    try:
+        window = parse_window(request.GET)
+    except ValueError:
+        return JsonResponse({"error": TIME_WINDOW_ERROR}, status=400)
+
+    search = sync_to_async(get_network_manager().destinations, thread_sensitive=False)
+    table = await search(from_city, day_of_week, window=window, max_legs=max_legs)
+
+    if to_city is None:
+        return JsonResponse({
+            "from": from_city.value,
+            "date": travel_date.isoformat(),
+            "destinations": [destination_to_dict(destination) for destination in table],
+        })
+
+    destination = table.get(to_city)
+    if destination is None:
+        return JsonResponse({"error": f"No trips from {from_city.value} to {to_city.value} on that date."}, status=404)
+    options = await sync_to_async(destination_trip_options, thread_sensitive=False)(destination, travel_date)
+    return JsonResponse(options)
+
+
+def parse_travellers(travellers) -> list[dict]:
+    # raises ValueError unless travellers is a non-empty list of {"id", "first_name", "last_name", "age"}
+    if not isinstance(travellers, list) or not travellers:
+        raise ValueError(travellers)
+    parsed = []
+    for traveller in travellers:
+        if not isinstance(traveller, dict):
+            raise ValueError(traveller)
+        names = [traveller.get(key) for key in ("id", "first_name", "last_name")]
+        age = traveller.get("age")
+        if not all(isinstance(name, str) and name.strip() for name in names):
+            raise ValueError(traveller)
+        if not isinstance(age, int) or isinstance(age, bool) or age < 0:
+            raise ValueError(traveller)
+        parsed.append({"id": names[0].strip(), "first_name": names[1].strip(), "last_name": names[2].strip(), "age": age})
+    return parsed
+
+
+# POST bookings/ {"option_id": "...", "travellers": [{"id", "first_name", "last_name", "age"}, ...][, "class": "first"|"second"]}
+# Books the trip a search returned as option_id, for the date that was searched.
+# Returns 201 {"trip_id", "date", "travellers", "total_price"}; 404 if the option expired
+# (search again), 409 if the trip can't be booked (changed, sold out, already booked)
+# the API is called with JSON bodies and no session cookie, so Django's CSRF check doesn't apply
+@csrf_exempt
+@require_POST
+async def book_trip_option_view(request):
+    try:
+        body = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"error": "The request body must be JSON."}, status=400)
+    if not isinstance(body, dict) or not isinstance(body.get("option_id"), str):
+        return JsonResponse({"error": "Missing 'option_id'."}, status=400)
+
+    try:
+        travellers = parse_travellers(body.get("travellers"))
+    except ValueError:
+        return JsonResponse(
+            {"error": "'travellers' must be a list of {id, first_name, last_name, age}."}, status=400
+        )
+
+    seat_class = body.get("class", SECOND_CLASS)
+    if seat_class not in SEAT_CLASSES:
+        return JsonResponse({"error": f"'class' must be one of {', '.join(SEAT_CLASSES)}."}, status=400)
+
+    try:
+        trip = await sync_to_async(BOOKING_SERVICE.book_trip_option)(body["option_id"], travellers, seat_class)
+    except TripOptionNotFound as error:
+        return JsonResponse({"error": str(error)}, status=404)
+    except ValueError as error:  # TripOptionChanged, SoldOutError, traveller already booked
+        return JsonResponse({"error": str(error)}, status=409)
+
+    return JsonResponse(
+        {
+            "trip_id": trip.trip_id,
+            "date": trip.date.isoformat(),
+            "travellers": len(travellers),
+            "total_price": float(trip.total_price),
+        },
+        status=201,
+    )
+
+
+# GET search-stats/
+# Returns the search instrumentation of this process (see search_stats.py): per engine
+# counters and latency histogram, and the most recent queries
+# {"enabled": false, ...} with empty statistics unless RAILCONNECT_SEARCH_STATS=1
+@require_GET
+async def search_stats_view(request):
+    return JsonResponse(get_network_manager().search_stats.snapshot())